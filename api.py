@@ -0,0 +1,313 @@
+# =========================================================
+# API JSON AGREGAT (READ-ONLY)
+# Menyajikan KPI & seri per kategori / per periode yang sama dengan dashboard,
+# untuk sistem internal lain (tanpa scraping dashboard / menyimpan salinan Excel).
+#
+# - Data: file hasil ingest yang sama (memory-mapped), dicek ulang versinya berkala
+# - Cache: result cache yang sama dengan dashboard (cache_store)
+# - Filter: parameter sama seperti UI -> gender, crime, year (boleh diulang untuk
+#           multi-select, mis. ?crime=NARKOTIKA&crime=PENCURIAN), month,
+#           period_start & period_end ("YYYY-MM"), plus capacity untuk KPI
+# - ETag / If-None-Match: poller yang datanya belum berubah mendapat 304 murah;
+#   versi di ETag & kunci cache = revisi sel yang dicakup filter, jadi koreksi
+#   data di bulan/kategori lain tidak membatalkan respons poller
+#
+# Menjalankan lokal:
+#   python api.py                 -> http://127.0.0.1:8502
+#   uvicorn api:app --port 8502   -> alternatif (ASGI)
+#
+# Endpoint:
+#   GET /api/meta
+#   GET /api/kpi?gender=&crime=&year=&month=&period_start=&period_end=&capacity=
+#   GET /api/kategori?gender=&crime=&year=&month=&period_start=&period_end=
+#   GET /api/periode?gender=&crime=&year=&month=&period_start=&period_end=
+#   GET /api/export.csv?<filter sama>&gzip=1   -> CSV di-stream per potongan
+# =========================================================
+import hashlib
+import os
+import re
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from cache_store import cache_from_env, make_key
+from engine import (
+    ALL_CRIME, ALL_GENDER, ALL_MONTH, ALL_YEAR, KpiResult, available_periods, cache_version,
+    canonical_filters, category_series, filter_mask, filter_rows, kpi_result, open_cube, period_series,
+)
+from export import CSV_MIME, GZIP_MIME, export_frame, iter_csv, to_arrow
+from ingest import DEFAULT_SOURCE, MONTH_ORDER, PREPARED_DIR, ensure_prepared, read_clean
+
+# Kapasitas default sama dengan input di dashboard
+DEFAULT_CAPACITY = 1200
+
+# Format parameter period_start / period_end
+PERIOD_PATTERN = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+# Interval (detik) pengecekan ulang versi data hasil ingest
+RELOAD_INTERVAL = float(os.environ.get("LAPAS_API_RELOAD_SECONDS", 5))
+
+
+class BadRequest(ValueError):
+    """Parameter query tidak valid."""
+
+
+class NoData(RuntimeError):
+    """Data hasil ingest belum berisi periode apa pun."""
+
+
+# =========================================================
+# STATE DATA (dibagi semua request)
+# =========================================================
+class DataState:
+    """
+    Memegang manifest + cube (memory-mapped) versi terbaru.
+    Versi dicek paling sering tiap RELOAD_INTERVAL detik, jadi request
+    berulang tidak menyentuh disk sama sekali.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.manifest = None
+        self.cube = None
+        self._clean = None
+        self._clean_version = None
+
+    def current(self):
+        now = time.monotonic()
+        if self.cube is not None and now - self._checked_at < RELOAD_INTERVAL:
+            return self.manifest, self.cube
+        with self._lock:
+            if self.cube is None or now - self._checked_at >= RELOAD_INTERVAL:
+                manifest = ensure_prepared(DEFAULT_SOURCE)
+                if self.manifest is None or manifest["data_version"] != self.manifest["data_version"]:
+                    self.cube = open_cube(manifest["cube"], PREPARED_DIR)
+                    self.manifest = manifest
+                self._checked_at = now
+        return self.manifest, self.cube
+
+    def clean(self, manifest: dict):
+        """
+        Data bersih (memory-mapped) versi manifest untuk export; dimuat saat
+        pertama dibutuhkan.
+        """
+        with self._lock:
+            if self._clean_version != manifest["data_version"]:
+                self._clean = read_clean(manifest)
+                self._clean_version = manifest["data_version"]
+            return self._clean
+
+
+STATE = DataState()
+CACHE = cache_from_env()
+
+
+# =========================================================
+# PARAMETER FILTER
+# =========================================================
+def _values(q, name: str, all_value: str) -> list[str]:
+    """
+    Nilai parameter yang boleh diulang (multi-select); sentinel "Semua" diabaikan.
+    """
+    return [v.strip() for v in q.getlist(name) if v.strip() and v.strip() != all_value]
+
+
+def parse_filters(request, cube) -> dict:
+    """
+    Mengubah query string menjadi state filter kanonik yang sama dengan
+    filter_params() di dashboard (agar kunci cache-nya sama).
+    """
+    q = request.query_params
+    genders = [g.upper() for g in _values(q, "gender", ALL_GENDER)]
+    crimes = _values(q, "crime", ALL_CRIME)
+    month = q.get("month", ALL_MONTH).strip() or ALL_MONTH
+
+    for gender in genders:
+        if gender not in cube.genders:
+            raise BadRequest(f"gender tidak dikenal: {gender}")
+    for crime in crimes:
+        if crime not in cube.categories:
+            raise BadRequest(f"crime tidak dikenal: {crime}")
+    years = []
+    for year in _values(q, "year", ALL_YEAR):
+        try:
+            years.append(int(year))
+        except ValueError:
+            raise BadRequest(f"year harus angka: {year}") from None
+    if month != ALL_MONTH and month.upper() not in MONTH_ORDER:
+        raise BadRequest(f"month tidak dikenal: {month}")
+
+    period = None
+    start, end = q.get("period_start", "").strip(), q.get("period_end", "").strip()
+    if start or end:
+        for value in (start, end):
+            if value and not PERIOD_PATTERN.fullmatch(value):
+                raise BadRequest(f"periode harus berformat YYYY-MM: {value}")
+        if start and end and start > end:
+            raise BadRequest("period_start harus sebelum period_end")
+        periods = available_periods(cube)
+        if not periods:
+            raise NoData("belum ada periode di data")
+        # "YYYY-MM" terurut secara leksikografis, jadi bisa dibandingkan langsung
+        if start > periods[-1]:
+            raise BadRequest(f"period_start {start} setelah periode terakhir data ({periods[-1]})")
+        if end and end < periods[0]:
+            raise BadRequest(f"period_end {end} sebelum periode pertama data ({periods[0]})")
+        period = (start or periods[0], end or periods[-1])
+
+    return canonical_filters(cube, genders, crimes, years, month, period)
+
+
+def parse_capacity(request) -> int:
+    raw = request.query_params.get("capacity", str(DEFAULT_CAPACITY))
+    try:
+        capacity = int(raw)
+    except ValueError:
+        raise BadRequest(f"capacity harus angka: {raw}") from None
+    if capacity < 1:
+        raise BadRequest("capacity minimal 1")
+    return capacity
+
+
+# =========================================================
+# ETAG
+# =========================================================
+def make_etag(kind: str, data_version: str, params: dict) -> str:
+    # Respons hanya bergantung pada versi data + parameter, jadi ETag
+    # bisa dihitung tanpa menghitung agregatnya sama sekali
+    return '"' + hashlib.sha1(make_key(kind, data_version, params).encode()).hexdigest()[:24] + '"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def cached_json(request, manifest: dict, cube, kind: str, params: dict, compute) -> Response:
+    """
+    Respons JSON dengan ETag. 304 kalau If-None-Match cocok;
+    selain itu hasil diambil dari result cache (dihitung kalau belum ada).
+    """
+    version = cache_version(cube, manifest["data_version"], params)
+    etag = make_etag(kind, version, params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Data-Version": manifest["data_version"]}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = CACHE.get_or_compute(kind, version, params, compute)
+    return JSONResponse(body, headers=headers)
+
+
+def _with_data(handler):
+    """
+    Endpoint sinkron (dijalankan Starlette di threadpool, karena ingest ulang,
+    I/O cache & reduksi numpy bersifat blocking) yang menerima satu pasangan
+    (manifest, cube) per request, jadi validasi filter dan jawabannya selalu
+    memakai versi data yang sama walau ingest ulang terjadi di tengah jalan.
+    """
+    def wrapped(request):
+        try:
+            manifest, cube = STATE.current()
+            return handler(request, manifest, cube)
+        except BadRequest as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except NoData as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+    return wrapped
+
+
+# =========================================================
+# ENDPOINT
+# =========================================================
+@_with_data
+def meta(request, manifest, cube):
+    return cached_json(request, manifest, cube, "api:meta", {}, lambda: {
+        "data_version": manifest["data_version"],
+        "periode_terakhir": manifest.get("last_period"),
+        "filter": {
+            "gender": [ALL_GENDER, *cube.genders],
+            "crime": [ALL_CRIME, *cube.categories],
+            "year": [ALL_YEAR, *[int(y) for y in cube.years]],
+            "month": [ALL_MONTH, *[m.title() for m in MONTH_ORDER]],
+            "period": available_periods(cube),
+        },
+    })
+
+
+def kpi_for(manifest: dict, cube, params: dict) -> KpiResult:
+    """
+    KpiResult per state filter dari result cache yang sama dengan dashboard
+    (kunci "agg:kpi"), jadi KPI yang sudah dihitung UI langsung terpakai.
+    """
+    return CACHE.get_or_compute(
+        "agg:kpi", cache_version(cube, manifest["data_version"], params), params,
+        lambda: kpi_result(cube.masked(filter_mask(cube, **params))),
+    )
+
+
+@_with_data
+def kpi(request, manifest, cube):
+    params = parse_filters(request, cube)
+    capacity = parse_capacity(request)
+    return cached_json(
+        request, manifest, cube, "api:kpi", {**params, "capacity": capacity},
+        lambda: {"filter": params, **kpi_for(manifest, cube, params).as_dict(capacity)},
+    )
+
+
+@_with_data
+def kategori(request, manifest, cube):
+    params = parse_filters(request, cube)
+    return cached_json(
+        request, manifest, cube, "agg:kategori", params,
+        lambda: {"filter": params, "data": category_series(cube.masked(filter_mask(cube, **params)))},
+    )
+
+
+@_with_data
+def periode(request, manifest, cube):
+    params = parse_filters(request, cube)
+    return cached_json(
+        request, manifest, cube, "agg:periode", params,
+        lambda: {"filter": params, "data": period_series(cube.masked(filter_mask(cube, **params)))},
+    )
+
+
+@_with_data
+def export_csv(request, manifest, cube):
+    params = parse_filters(request, cube)
+    compress = request.query_params.get("gzip", "0").strip().lower() in ("1", "true", "ya")
+    table = to_arrow(export_frame(filter_rows(STATE.clean(manifest), **params)))
+
+    name = "lapas_cirebon.csv" + (".gz" if compress else "")
+    return StreamingResponse(
+        iter_csv(table, compress=compress),
+        media_type=GZIP_MIME if compress else CSV_MIME,
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+app = Starlette(routes=[
+    Route("/api/meta", meta),
+    Route("/api/kpi", kpi),
+    Route("/api/kategori", kategori),
+    Route("/api/periode", periode),
+    Route("/api/export.csv", export_csv),
+])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.environ.get("LAPAS_API_HOST", "127.0.0.1"),
+        port=int(os.environ.get("LAPAS_API_PORT", 8502)),
+    )
@@ -1,34 +1,40 @@
 # =========================================================
 # IMPORT LIBRARY
 # =========================================================
-import io
-# io digunakan untuk membaca dan menulis data berbentuk byte,
-# terutama saat upload file Excel dan export file (CSV / Excel)
+import hashlib
+# hashlib digunakan untuk versi (cache-busting) file CSS statis
+
+import os
+# os digunakan untuk membaca environment variable (mis. LAPAS_PROGRESSIVE)
+
+import time
+# time digunakan untuk mengukur durasi rerun dashboard
 
 import pandas as pd
 # pandas digunakan sebagai library utama untuk pengolahan data
 # seperti cleaning, grouping, agregasi, dan manipulasi DataFrame
 
-import numpy as np
-# numpy digunakan untuk perhitungan numerik,
-# seperti persentase, proporsi, dan operasi matematika sederhana
-
 import streamlit as st
 # streamlit adalah framework utama untuk membuat dashboard web interaktif
 
-import plotly.graph_objects as go
-#digunakan untuk membuat visualisasi data interaktif menggunakan 
-#Plotly di Python, khususnya ketika Anda ingin kontrol penuh terhadap 
-#elemen-elemen grafik seperti sumbu, layout, warna, anotasi, dan tipe chart khusus.
-
-import plotly.express as px
-# plotly.express digunakan untuk membuat grafik interaktif
-# seperti bar chart, line chart, pie chart, heatmap, dan treemap
+# plotly.express (px) & plotly.graph_objects (go) TIDAK diimpor di sini.
+# Keduanya diimpor di dalam fungsi yang membuat grafik (lazy import),
+# sehingga header, filter, dan kartu KPI sudah tampil sebelum plotly dimuat.
+# numpy dipakai lewat engine.py (pandas juga sudah memuatnya).
 
 from pathlib import Path
 #digunakan untuk mengelola dan memanipulasi file serta direktori di Python dengan cara yang lebih modern, konsisten, dan platform-independent dibandingkan modul os.path. Modul pathlib memperkenalkan konsep “object-oriented path”, artinya setiap file 
 #atau folder diwakili sebagai objek Path yang memiliki method dan property untuk operasi file.
 
+from instrumentation import (
+    add_payload, finish_payload, paint_mark, record, render_perf_panel, section_timer, start_run, timed,
+)
+# instrumentation mencatat durasi rerun per bagian (full maupun fragment)
+
+# Titik awal pengukuran durasi & payload full rerun
+RUN_STARTED = time.perf_counter()
+start_run()
+
 # =========================================================
 # PAGE CONFIG
 # Mengatur tampilan dasar halaman dashboard
@@ -45,773 +51,123 @@ st.set_page_config(
 # STYLING (CUSTOM CSS)
 # Digunakan untuk meningkatkan estetika dan keterbacaan UI
 # Tanpa mempengaruhi proses pengolahan data
+#
+# CSS tema ada di static/theme.css dan disajikan lewat static file serving
+# (.streamlit/config.toml: server.enableStaticServing = true). Setiap rerun
+# hanya mengirim satu tag <link> kecil; browser menyimpan file CSS di cache.
+# Kalau static serving mati, isi CSS di-inline sebagai fallback.
 # =========================================================
-st.markdown(
-    """
-    <style>
-    :root{
-        --primary:#2563eb;
-        --secondary:#0ea5e9;
-        --success:#22c55e;
-        --warning:#f59e0b;
-        --danger:#ef4444;
-        --text:#0f172a;
-        --card:#ffffff;
-        --border: rgba(15,23,42,.08);
-        --shadow: 0 12px 30px rgba(15,23,42,.08);
-    }
-
-    /* ===== FIX: TEKS DI SELECTBOX / MULTISELECT BIAR KELIHATAN ===== */
-
-/* teks value & placeholder pada selectbox */
-div[data-baseweb="select"] *{
-  color: #0f172a !important;  /* teks gelap */
-}
-
-/* area box select-nya (kalau mau tetap terang) */
-div[data-baseweb="select"] > div{
-  background: rgba(255,255,255,.92) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-/* placeholder (mis. "Semua") kadang dianggap placeholder */
-div[data-baseweb="select"] [data-testid="stMarkdownContainer"]{
-  color: #0f172a !important;
-}
-
-/* icon panah dropdown */
-div[data-baseweb="select"] svg{
-  fill: #0f172a !important;
-}
-
-/* dropdown menu */
-div[role="listbox"]{
-  background: rgba(255,255,255,.98) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-/* item option di dropdown */
-div[role="option"]{
-  color: #0f172a !important;
-}
-    /* ===== SECTION HEADER (KPI) ===== */
-.section-head{
-  position: relative;
-  display:flex;
-  align-items:flex-start;
-  justify-content:space-between;
-  gap:16px;
-
-  padding: 16px 18px;
-  border-radius: 16px;
-
-  background: linear-gradient(135deg,
-    rgba(255,255,255,.08) 0%,
-    rgba(255,255,255,.05) 50%,
-    rgba(0,0,0,.08) 100%
-  );
-
-  border: 1px solid rgba(255,255,255,.12);
-  box-shadow: 0 14px 34px rgba(0,0,0,.25);
-  backdrop-filter: blur(12px);
-  -webkit-backdrop-filter: blur(12px);
-  overflow:hidden;
-}
-
-/* glow halus biar hidup */
-.section-head::before{
-  content:"";
-  position:absolute;
-  inset:-2px;
-  background:
-    radial-gradient(520px 200px at 18% 15%,
-      rgba(56,189,248,.18), transparent 60%),
-    radial-gradient(520px 220px at 88% 35%,
-      rgba(236,72,153,.12), transparent 62%);
-  pointer-events:none;
-}
-
-.section-left{display:flex; gap:12px; align-items:flex-start;}
-.section-icon{
-  width:44px; height:44px;
-  border-radius:14px;
-  display:flex; align-items:center; justify-content:center;
-  background: rgba(255,255,255,.10);
-  border: 1px solid rgba(255,255,255,.16);
-  box-shadow: inset 0 1px 0 rgba(255,255,255,.12);
-  font-size:20px;
-}
-
-.section-title{
-  font-size: 30px;
-  font-weight: 900;
-  line-height: 1.05;
-  letter-spacing: -0.3px;
-  text-shadow: 0 2px 12px rgba(0,0,0,.35);
-  margin-top: 2px;
-}
-
-.section-title .kpi-tag{
-  font-size: 18px;
-  font-weight: 800;
-  opacity:.9;
-}
-
-.section-sub{
-  margin-top: 6px;
-  font-size: 13px;
-  color: rgba(255,255,255,.70) !important;
-}
-
-/* underline gradient tipis */
-.section-underline{
-  margin-top: 10px;
-  height: 2px;
-  width: 220px;
-  border-radius: 99px;
-  background: linear-gradient(90deg,
-    rgba(56,189,248,.95),
-    rgba(34,197,94,.65),
-    rgba(236,72,153,.75),
-    transparent
-  );
-  opacity:.85;
-}
-
-.section-right{display:flex; align-items:center; gap:10px; margin-top:2px;}
-.section-pill{
-  display:inline-flex;
-  align-items:center;
-  gap:8px;
-  padding: 8px 12px;
-  border-radius: 999px;
-  background: rgba(255,255,255,.08);
-  border: 1px solid rgba(255,255,255,.14);
-  box-shadow: 0 10px 22px rgba(0,0,0,.22);
-  font-size: 13px;
-  color: rgba(255,255,255,.88) !important;
-  white-space: nowrap;
-}
-.section-pill .dot{
-  width:9px;height:9px;border-radius:999px;
-  background:#22c55e;
-  box-shadow: 0 0 0 4px rgba(34,197,94,.18), 0 0 18px rgba(34,197,94,.35);
-}
-
-    /* ============================
-       BACKGROUND PALING BELAKANG
-       ============================ */
- /* ===== COLD GREY PREMIUM ===== */
-    html, body{
-    height: 100%;
-    background:
-        linear-gradient(
-        135deg,
-        #384c59 0%,
-        #132d3d 100%
-        ) !important;
-    background-attachment: fixed !important;
-    }
-
-[data-testid="stAppViewContainer"],
-.stApp,
-.main,
-.block-container{
-  background: transparent !important;
-}
-
-    /* Streamlit layers dibuat transparan agar background body kelihatan */
-    [data-testid="stAppViewContainer"],
-    .stApp,
-    .main,
-    .block-container{
-      background: transparent !important;
-      color: var(--text);
-    }
-
-    [data-testid="stHeader"],
-    [data-testid="stToolbar"]{
-      background: transparent !important;
-    }
-
-    /* Container spacing */
-    .block-container{
-        padding-top: 1.2rem;
-        padding-bottom: 2rem;
-    }
-
-/* ===== TEXT TERANG GLOBAL ===== */
-html, body, .stApp {
-  color: #f8fafc !important;   /* hampir putih */
-}
-
-/* Semua heading */
-h1, h2, h3, h4, h5, h6 {
-  color: #ffffff !important;
-}
-
-/* Label dan teks biasa */
-label, p {
-  color: rgba(255,255,255,0.92) !important;
-}
-
-/* KPI section title */
-.kpi-title {
-  color: rgba(255,255,255,0.85) !important;
-}
-
-/* Subtitle */
-.subtitle {
-  color: rgba(255,255,255,0.75) !important;
-}
-
-/* Tabs */
-button[role="tab"] {
-  color: rgba(255,255,255,0.85) !important;
-}
-
-/* Axis chart */
-.js-plotly-plot .xtick text,
-.js-plotly-plot .ytick text {
-  fill: rgba(255,255,255,0.85) !important;
-}
-
-    /* Hilangkan elemen default */
-    #MainMenu, footer, header{visibility:hidden;}
-
-    /* ============================
-       GLASS / CARD CONTAINER
-       ============================ */
-    .glass{
-        background: rgba(255,255,255,.72);
-        border: 1px solid var(--border);
-        border-radius: 16px;
-        padding: 20px;
-        box-shadow: var(--shadow);
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-    }
-
-    /* Header / topbar */
-    .topbar{
-        background: linear-gradient(90deg, var(--primary), var(--secondary));
-        color: white;
-        border-radius: 18px;
-        padding: 22px 26px;
-        box-shadow: 0 12px 30px rgba(37,99,235,.35);
-    }
-    .topbar, .topbar *{ color:#fff !important; }
-
-    /* ============================
-       KPI CARDS (BALIKIN YANG ILANG)
-       ============================ */
-    .cards{
-        display:grid;
-        grid-template-columns:repeat(4,1fr);
-        gap:16px;
-    }
-
-    .card{
-        border-radius:18px;
-        padding:18px;
-        color:white !important;
-        box-shadow:0 12px 28px rgba(0,0,0,.15);
-        border: 1px solid rgba(255,255,255,.18);
-    }
-
-    .card .icon{
-        font-size:16px;
-        width:28px;height:28px;
-        border-radius:10px;
-        display:flex;
-        align-items:center;
-        justify-content:center;
-        background: rgba(255,255,255,.18);
-        border: 1px solid rgba(255,255,255,.18);
-        margin-bottom: 10px;
-    }
-
-    .card .label{
-        font-size:14px;
-        font-weight:700;
-        opacity:.95;
-    }
-
-    .card .value{
-        font-size:32px;
-        font-weight:900;
-        margin-top:8px;
-        line-height:1.1;
-    }
-
-    .card .note{
-        font-size:13px;
-        opacity:.92;
-        margin-top:10px;
-    }
-
-    .card.c1{background:linear-gradient(135deg,#2563eb,#1e40af);}
-    .card.c2{background:linear-gradient(135deg,#16a34a,#15803d);}
-    .card.c3{background:linear-gradient(135deg,#ec4899,#be185d);}
-    .card.c4{background:linear-gradient(135deg,#f59e0b,#b45309);}
-
-    /* Responsive: kalau layar kecil, kartu turun baris */
-    @media (max-width: 1100px){
-      .cards{ grid-template-columns:repeat(2,1fr); }
-    }
-    @media (max-width: 640px){
-      .cards{ grid-template-columns:1fr; }
-    }
-
-    /* Sidebar */
-    section[data-testid="stSidebar"]>div{
-        background:#ffffff;
-        box-shadow:inset -1px 0 0 rgba(0,0,0,.05);
-    }
-
-    /* Judul */
-    h1,h2,h3{ letter-spacing:-0.3px; }
-    /* ===== HERO GLASS + BADGE (HEADER ATAS) ===== */
-/* ===== HERO: DARK GLASS (UPGRADED) ===== */
-.hero{
-  position: relative;
-  border-radius: 18px;
-  padding: 18px 22px;
-
-  /* base dark glass */
-  background: linear-gradient(135deg,
-    rgba(15,23,42,.55) 0%,
-    rgba(15,23,42,.35) 55%,
-    rgba(2,6,23,.25) 100%
-  );
-
-  border: 1px solid rgba(255,255,255,.10);
-  box-shadow:
-    0 18px 45px rgba(0,0,0,.35),
-    inset 0 1px 0 rgba(255,255,255,.08);  /* top highlight */
-
-  backdrop-filter: blur(14px);
-  -webkit-backdrop-filter: blur(14px);
-  overflow: hidden;
-}
-
-/* subtle accent glow (tanpa bikin norak) */
-.hero::before{
-  content:"";
-  position:absolute;
-  inset:-2px;
-  background:
-    radial-gradient(600px 220px at 20% 20%,
-      rgba(56,189,248,.18), transparent 60%),
-    radial-gradient(520px 240px at 85% 35%,
-      rgba(34,197,94,.10), transparent 62%);
-  pointer-events:none;
-}
-
-/* light sweep line biar lebih “premium” */
-.hero::after{
-  content:"";
-  position:absolute;
-  top:0; left:0; right:0;
-  height:1px;
-  background: linear-gradient(90deg, transparent, rgba(255,255,255,.20), transparent);
-  pointer-events:none;
-}
-
-.hero, .hero *{ color: rgba(255,255,255,.92) !important; }
-
-/* ===== TYPO: naikkan hierarchy ===== */
-.hero h1, .hero h2, .hero h3{
-  letter-spacing: .2px;
-  text-shadow: 0 2px 10px rgba(0,0,0,.35);
-}
-
-.hero p, .hero small{
-  color: rgba(255,255,255,.70) !important;
-}
-
-/* ===== BADGE: jadi chips modern ===== */
-.hero .badge{
-  display: inline-flex;
-  align-items: center;
-  gap: 8px;
-
-  padding: 8px 10px;
-  border-radius: 999px;
-
-  background: rgba(255,255,255,.08) !important;
-  border: 1px solid rgba(255,255,255,.14) !important;
-
-  box-shadow:
-    0 10px 24px rgba(0,0,0,.22),
-    inset 0 1px 0 rgba(255,255,255,.10);
-
-  color: rgba(255,255,255,.88) !important;
-}
-
-.hero .badge b{
-  color: rgba(255,255,255,.92) !important;
-  
-}
-/* =========================
-   FIX FILTER SELECTBOX TEXT
-   ========================= */
-
-/* Kotak selectbox (control) */
-.stSelectbox div[data-baseweb="select"] > div{
-  background: rgba(255,255,255,.92) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-/* Teks nilai yang terpilih + placeholder di dalam selectbox */
-.stSelectbox div[data-baseweb="select"] *{
-  color: #0f172a !important;         /* teks gelap */
-}
-
-/* Icon dropdown (panah) */
-.stSelectbox div[data-baseweb="select"] svg{
-  fill: #0f172a !important;
-}
-
-/* Popup dropdown menu */
-div[role="listbox"]{
-  background: rgba(255,255,255,.98) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-/* Semua teks di dalam dropdown */
-div[role="listbox"] *{
-  color: #0f172a !important;
-}
-
-/* Hover item dropdown */
-div[role="option"]:hover{
-  background: rgba(37,99,235,.10) !important;
-}
-
-/* =========================
-   FIX BUTTON RESET FILTER
-   ========================= */
-.stButton > button{
-  width: 100%;
-  border-radius: 12px !important;
-  padding: 0.55rem 0.9rem !important;
-
-  background: linear-gradient(90deg, rgba(37,99,235,.95), rgba(14,165,233,.95)) !important;
-  color: #ffffff !important;
-
-  border: 1px solid rgba(255,255,255,.18) !important;
-  box-shadow: 0 12px 26px rgba(0,0,0,.25) !important;
-  font-weight: 800 !important;
-}
-
-.stButton > button:hover{
-  filter: brightness(1.05);
-  transform: translateY(-1px);
-}
-/* =========================================
-   HARD FIX: TEKS OPTION DROPDOWN BASEWEB
-   (agar opsi "Februari" dll kelihatan)
-   ========================================= */
-
-/* 1) Control select (yang di bar filter) */
-.stSelectbox div[data-baseweb="select"] input{
-  color:#0f172a !important;
-  -webkit-text-fill-color:#0f172a !important; /* penting untuk chrome */
-}
-
-.stSelectbox div[data-baseweb="select"] > div{
-  background: rgba(255,255,255,.92) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-.stSelectbox div[data-baseweb="select"] svg{
-  fill:#0f172a !important;
-}
-
-/* 2) POPUP dropdown (BaseWeb popover/portal) */
-div[data-baseweb="popover"]{
-  z-index: 99999 !important; /* biar tidak ketutup elemen lain */
-}
-
-/* paksa semua teks di popover jadi gelap */
-div[data-baseweb="popover"] *{
-  color:#0f172a !important;
-}
-
-/* container listbox */
-div[data-baseweb="popover"] [role="listbox"]{
-  background: rgba(255,255,255,.98) !important;
-  border: 1px solid rgba(15,23,42,.18) !important;
-}
-
-/* item opsi */
-div[data-baseweb="popover"] [role="option"]{
-  background: transparent !important;
-  color:#0f172a !important;
-}
-
-/* hover dan selected biar jelas */
-div[data-baseweb="popover"] [role="option"]:hover{
-  background: rgba(37,99,235,.10) !important;
-}
-div[data-baseweb="popover"] [role="option"][aria-selected="true"]{
-  background: rgba(37,99,235,.14) !important;
-}
-/* =========================
-   FIX: DOWNLOAD BUTTON (CSV/EXCEL) BIAR KELIHATAN
-   ========================= */
-div[data-testid="stDownloadButton"] > button{
-  width: 100% !important;
-  border-radius: 12px !important;
-  padding: 0.55rem 0.9rem !important;
-
-  background: linear-gradient(90deg, rgba(37,99,235,.95), rgba(14,165,233,.95)) !important;
-  color: #ffffff !important;
-
-  border: 1px solid rgba(255,255,255,.18) !important;
-  box-shadow: 0 12px 26px rgba(0,0,0,.25) !important;
-  font-weight: 800 !important;
-}
+THEME_CSS = Path(__file__).resolve().parent / "static" / "theme.css"
 
-/* teks di dalam button */
-div[data-testid="stDownloadButton"] > button *{
-  color: #ffffff !important;
-  -webkit-text-fill-color: #ffffff !important;
-}
-
-/* icon svg */
-div[data-testid="stDownloadButton"] > button svg{
-  fill: #ffffff !important;
-}
-
-div[data-testid="stDownloadButton"] > button:hover{
-  filter: brightness(1.05);
-  transform: translateY(-1px);
-}
-
-
-/* =====================================================
-   FIX FINAL DATAFRAME REKAP
-   Menu kecil langsung muncul, icon terlihat, popup jelas
-   ===================================================== */
 
-div[data-testid="stDataFrame"] {
-  background: #ffffff !important;
-  border-radius: 10px !important;
-  overflow: visible !important;
-}
-
-div[data-testid="stDataFrame"] * {
-  color: #0f172a !important;
-  -webkit-text-fill-color: #0f172a !important;
-}
-
-div[data-testid="stDataFrame"] [role="columnheader"] *,
-div[data-testid="stDataFrame"] [role="gridcell"] * {
-  color: #0f172a !important;
-  -webkit-text-fill-color: #0f172a !important;
-}
+@st.cache_resource(show_spinner=False)
+def load_theme(mtime_ns: int) -> tuple[str, str]:
+    """
+    (versi, isi) file CSS tema. Versi = hash isi, dipakai sebagai
+    query string agar browser mengambil ulang hanya saat CSS berubah.
+    """
+    css = THEME_CSS.read_text(encoding="utf-8")
+    return hashlib.sha1(css.encode("utf-8")).hexdigest()[:10], css
 
-[data-testid="stElementToolbar"] {
-  opacity: 1 !important;
-  visibility: visible !important;
-  display: flex !important;
-  align-items: center !important;
-  gap: 4px !important;
-  background: #ffffff !important;
-  border: 1px solid rgba(15, 23, 42, 0.25) !important;
-  border-radius: 10px !important;
-  padding: 4px !important;
-  box-shadow: 0 6px 16px rgba(15, 23, 42, 0.25) !important;
-  z-index: 999999 !important;
-}
 
-[data-testid="stElementToolbar"] button,
-div[data-testid="stDataFrame"] button {
-  background: #ffffff !important;
-  border: 1px solid rgba(15, 23, 42, 0.28) !important;
-  border-radius: 7px !important;
-  color: #0f172a !important;
-  -webkit-text-fill-color: #0f172a !important;
-  width: 30px !important;
-  height: 30px !important;
-  min-width: 30px !important;
-  min-height: 30px !important;
-  padding: 4px !important;
-  display: inline-flex !important;
-  align-items: center !important;
-  justify-content: center !important;
-  box-shadow: none !important;
-  opacity: 1 !important;
-}
+def html(markup: str) -> None:
+    """
+    Render HTML mentah dan catat ukurannya ke instrumentasi (byte per rerun).
+    """
+    add_payload(len(markup.encode("utf-8")))
+    st.markdown(markup, unsafe_allow_html=True)
 
-[data-testid="stElementToolbar"] button:hover,
-div[data-testid="stDataFrame"] button:hover {
-  background: #e2e8f0 !important;
-  border-color: rgba(15, 23, 42, 0.55) !important;
-}
 
-[data-testid="stElementToolbar"] svg,
-[data-testid="stElementToolbar"] svg *,
-div[data-testid="stDataFrame"] button svg,
-div[data-testid="stDataFrame"] button svg * {
-  color: #0f172a !important;
-  stroke: #0f172a !important;
-  opacity: 1 !important;
-  visibility: visible !important;
-}
+def inject_theme() -> None:
+    version, css = load_theme(THEME_CSS.stat().st_mtime_ns)
+    if st.get_option("server.enableStaticServing"):
+        html(f'<link rel="stylesheet" href="app/static/theme.css?v={version}">')
+    else:
+        html(f"<style>{css}</style>")
 
-[data-testid="stElementToolbar"] svg path:not([fill="none"]),
-[data-testid="stElementToolbar"] svg rect:not([fill="none"]),
-[data-testid="stElementToolbar"] svg circle:not([fill="none"]),
-div[data-testid="stDataFrame"] button svg path:not([fill="none"]),
-div[data-testid="stDataFrame"] button svg rect:not([fill="none"]),
-div[data-testid="stDataFrame"] button svg circle:not([fill="none"]) {
-  fill: #0f172a !important;
-}
 
-[data-testid="stElementToolbar"] svg path,
-[data-testid="stElementToolbar"] svg rect,
-[data-testid="stElementToolbar"] svg circle,
-[data-testid="stElementToolbar"] svg line,
-[data-testid="stElementToolbar"] svg polyline,
-[data-testid="stElementToolbar"] svg polygon,
-div[data-testid="stDataFrame"] button svg path,
-div[data-testid="stDataFrame"] button svg rect,
-div[data-testid="stDataFrame"] button svg circle,
-div[data-testid="stDataFrame"] button svg line,
-div[data-testid="stDataFrame"] button svg polyline,
-div[data-testid="stDataFrame"] button svg polygon {
-  stroke: #0f172a !important;
-  stroke-width: 2 !important;
-}
+inject_theme()
 
-div[data-baseweb="popover"] {
-  background: #ffffff !important;
-  color: #0f172a !important;
-  border: 1px solid rgba(15, 23, 42, 0.20) !important;
-  border-radius: 10px !important;
-  box-shadow: 0 8px 24px rgba(15, 23, 42, 0.25) !important;
-  z-index: 999999 !important;
-}
 
-div[data-baseweb="popover"] *,
-div[data-baseweb="popover"] label,
-div[data-baseweb="popover"] span,
-div[data-baseweb="popover"] div,
-div[data-baseweb="popover"] p,
-div[data-baseweb="popover"] button {
-  color: #0f172a !important;
-  -webkit-text-fill-color: #0f172a !important;
-}
+# =========================================================
+# KOMPONEN HTML RINGKAS
+# Template tanpa indentasi/whitespace & tanpa inline style (gaya ada di
+# theme.css), supaya payload tiap rerun sekecil mungkin
+# =========================================================
+SPACER = '<div class="spacer"></div>'
+
+HERO_TEMPLATE = (
+    '<div class="hero"><div class="hero-row"><div>'
+    '<div class="hero-title">🛡️ Dashboard Lapas Cirebon</div>'
+    '<div class="hero-sub">Sistem Informasi Data Narapidana · Live Update</div>'
+    '<div class="hero-badges"><span class="badge"><span class="dot"></span>Live Update</span>'
+    '<span class="badge">🗓️ Terakhir diperbarui: <b>{last_update}</b></span></div>'
+    '</div><span class="badge">⚡ Monitoring</span></div></div>'
+)
 
-div[data-baseweb="checkbox"] div {
-  background-color: #ff4b4b !important;
-  border-color: #ff4b4b !important;
-}
+SECTION_TEMPLATE = (
+    '<div class="section-head"><div class="section-left"><div class="section-icon">{icon}</div><div>'
+    '<div class="section-title">{title}</div><div class="section-sub">{sub}</div>'
+    '<div class="section-underline"></div></div></div>'
+    '<div class="section-right"><div class="section-pill"><span class="dot"></span>{pill}</div></div>'
+    '</div>' + SPACER
+)
 
-div[data-baseweb="checkbox"] svg,
-div[data-baseweb="checkbox"] svg * {
-  color: #ffffff !important;
-  stroke: #ffffff !important;
-  fill: none !important;
-  -webkit-text-fill-color: #ffffff !important;
-}
+CARD_TEMPLATE = (
+    '<div class="card {cls}"><div class="icon">{icon}</div><div class="label">{label}</div>'
+    '<div class="value">{value}</div><div class="note">{note}</div></div>'
+)
 
-div[data-baseweb="popover"] [role="option"],
-div[data-baseweb="popover"] [role="menuitem"],
-div[data-baseweb="popover"] li,
-div[data-baseweb="popover"] button {
-  background: #ffffff !important;
-}
 
-div[data-baseweb="popover"] [role="option"]:hover,
-div[data-baseweb="popover"] [role="menuitem"]:hover,
-div[data-baseweb="popover"] li:hover,
-div[data-baseweb="popover"] button:hover {
-  background: rgba(37, 99, 235, 0.10) !important;
-}
-/* =========================
-   CUSTOM POPOVER PILIH KOLOM
-   ========================= */
-
-div[data-testid="stPopover"] button {
-  background: #ffffff !important;
-  color: #0f172a !important;
-  border: 1px solid rgba(15, 23, 42, 0.25) !important;
-  border-radius: 10px !important;
-  font-weight: 700 !important;
-}
+def hero(last_update: str) -> None:
+    html(HERO_TEMPLATE.format(last_update=last_update) + SPACER)
 
-div[data-testid="stPopover"] button * {
-  color: #0f172a !important;
-  -webkit-text-fill-color: #0f172a !important;
-}
 
-div[data-testid="stPopover"] svg {
-  color: #0f172a !important;
-  fill: #0f172a !important;
-  stroke: #0f172a !important;
-}
-/* =========================
-   FIX: WARNA TEKS SECTION KPI
-   ========================= */
-
-.section-head,
-.section-head * {
-  color: #ffffff !important;
-  -webkit-text-fill-color: #ffffff !important;
-}
+def section_header(icon: str, title: str, sub: str, pill: str) -> None:
+    html(SECTION_TEMPLATE.format(icon=icon, title=title, sub=sub, pill=pill))
 
-.section-title,
-.section-title *,
-.section-title .kpi-tag {
-  color: #ffffff !important;
-  -webkit-text-fill-color: #ffffff !important;
-}
 
-.section-sub {
-  color: rgba(255, 255, 255, 0.75) !important;
-  -webkit-text-fill-color: rgba(255, 255, 255, 0.75) !important;
-}
+def kpi_cards(cards: list[dict]) -> None:
+    """
+    cards: daftar dict berisi cls, icon, label, value, note.
+    """
+    html('<div class="cards">' + "".join(CARD_TEMPLATE.format(**c) for c in cards) + "</div>")
 
-.section-pill,
-.section-pill * {
-  color: rgba(255, 255, 255, 0.90) !important;
-  -webkit-text-fill-color: rgba(255, 255, 255, 0.90) !important;
-}
-    </style>
-   """,
-    unsafe_allow_html=True
-)
 
 # =========================================================
 # HELPERS
-# Digunakan untuk pengolahan waktu (bulan & tahun)
+# Konstanta waktu (bulan & tahun) diambil dari modul ingest
+# agar aturan normalisasi hanya didefinisikan di satu tempat
 # =========================================================
+from ingest import (
+    DEFAULT_SOURCE, FINDING_LABELS, MANIFEST_FILE_NAME, MONTH_ORDER, PREPARED_DIR,
+    IntegrityError, SchemaError, ensure_prepared, findings_count, format_findings, read_clean,
+)
+from cache_store import ResultCache, cache_from_env
+from uploads import MAX_UPLOAD_BYTES, PreparedUpload, UploadCache
+from memory import MemoryAccount, array_bytes, frame_bytes, register_metrics, render_memory_panel
+from snapshots import (
+    STATUS_ADDED, STATUS_CHANGED, STATUS_REMOVED, diff_frames, load_index, period_changes, read_snapshot,
+)
+from export import (
+    ARROW_MIME, CSV_MIME, GZIP_MIME, PARQUET_MIME, XLSX_MIME, arrow_bytes, csv_bytes, parquet_bytes, xlsx_bytes,
+)
+from engine import (
+    ALL_MONTH, AXIS_CATEGORY, COMPARE_PERIOD, COMPARE_YEAR, NORMALIZE_COL,
+    NORMALIZE_NONE, NORMALIZE_ROW, QUERY_KEYS, Cube, available_periods, cache_version,
+    canonical_filters, category_series, compare, comparison_frames, composition,
+    filters_from_query, filters_to_query,
+    KpiResult, filter_mask, filter_rows, kpi_result, anomaly_frame, open_cube, heatmap_data, month_series,
+    present, share_frame, top_by_year_frame, treemap_nodes, trend_stats,
+)
 
-# Mapping nama bulan ke angka (untuk konversi datetime)
-MONTH_MAP = {
-    "JANUARI": 1, "FEBRUARI": 2, "MARET": 3, "APRIL": 4,
-    "MEI": 5, "JUNI": 6, "JULI": 7, "AGUSTUS": 8,
-    "SEPTEMBER": 9, "OKTOBER": 10, "NOVEMBER": 11, "DESEMBER": 12
+# Label pilihan normalisasi heatmap
+HEAT_MODE_LABELS = {
+    NORMALIZE_NONE: "Jumlah",
+    NORMALIZE_ROW: "% per kategori",
+    NORMALIZE_COL: "% per bulan",
 }
 
-# Urutan bulan untuk keperluan visualisasi
-MONTH_ORDER = list(MONTH_MAP.keys())
-
-
-def safe_month_to_num(x: str) -> int:
-    """
-    Mengubah nama bulan (string) menjadi angka.
-    Jika bulan kosong atau tidak valid, default ke Januari (1).
-    """
-    if pd.isna(x):
-        return 1
-    x = str(x).strip().upper()
-    return MONTH_MAP.get(x, 1)
-
 # =========================
 # PLOTLY THEME (FIGMA-LIKE)
 # =========================
@@ -873,381 +229,526 @@ def apply_plot_theme(fig, height=360):
     )
 
     return fig
+
+
 # =========================================================
-# LOAD DATA DENGAN CACHE
-# Cache digunakan agar file tidak dibaca ulang terus-menerus
+# LOAD DATA BERSIH (HASIL INGEST)
+# Normalisasi & validasi skema sudah dilakukan sekali di ingest.py.
+# Data & cube dibuka via memory map, jadi memakai st.cache_resource
+# (objek dibagi tanpa disalin/pickle) dan di-key dengan versi data.
+# Objek ini hanya dibaca, tidak pernah diubah in-place.
+# Hanya versi terbaru + satu sebelumnya (sesi yang belum rerun) yang disimpan,
+# supaya ingest ulang / revisi snapshot tidak menumpuk data & mmap lama.
 # =========================================================
-@st.cache_data(show_spinner=False)
-def load_data_from_bytes(xlsx_bytes: bytes) -> pd.DataFrame:
+LOADED_VERSIONS = 2
+
+
+@st.cache_resource(show_spinner=False, max_entries=LOADED_VERSIONS)
+def load_clean_data(data_version: str, _manifest: dict) -> pd.DataFrame:
     """
-    Membaca file Excel dari hasil upload user (dalam bentuk byte)
+    Memuat data bersih yang sudah bertipe (kategori, int, datetime).
+    filter_rows mengiris rentang periode dengan binary search, jadi urutan
+    per periode dari ingest dijaga di sini.
     """
-    return pd.read_excel(io.BytesIO(xlsx_bytes))
+    df = read_clean(_manifest)
+    if not df["periode"].is_monotonic_increasing:
+        df = df.sort_values("periode", kind="stable", ignore_index=True)
+    return df
 
 
-@st.cache_data(show_spinner=False)
-def load_data_from_path(path: str) -> pd.DataFrame:
+@st.cache_resource(show_spinner=False, max_entries=LOADED_VERSIONS)
+def load_cube(data_version: str, _manifest: dict) -> Cube:
     """
-    Membaca file Excel dari path default
+    Cube agregat (kategori x gender x tahun x bulan) untuk satu versi data,
+    dibuka langsung dari file .npy hasil ingest (memory-mapped).
     """
-    return pd.read_excel(path)
+    return open_cube(_manifest["cube"], PREPARED_DIR)
 
 
 # =========================================================
-# MEMBENTUK KOLOM DATETIME (PERIODE)
-# Digunakan untuk analisis tren berbasis waktu
+# SIDEBAR – UPLOAD DATA
+# Workbook upload dinormalisasi seperti ingest lalu disimpan di UploadCache
+# (satu per proses, dibagi semua sesi): di-key hash isi file, LRU + TTL,
+# dengan batas memori total. Lihat uploads.py.
 # =========================================================
-def build_datetime(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
+@st.cache_resource(show_spinner=False)
+def get_upload_cache() -> UploadCache:
+    return UploadCache()
 
-    # Normalisasi kolom bulan
-    out["bulan"] = out["bulan"].astype(str).str.upper().str.strip()
 
-    # Konversi bulan ke angka
-    out["bulan_num"] = out["bulan"].apply(safe_month_to_num)
+UPLOADS = get_upload_cache()
 
-    # Pastikan kolom tahun bertipe numerik
-    out["tahun"] = pd.to_numeric(out["tahun"], errors="coerce")
 
-    # Gabungkan tahun dan bulan menjadi satu kolom datetime
-    out["periode"] = pd.to_datetime(
-        out["tahun"].fillna(2000).astype(int).astype(str)
-        + "-" + out["bulan_num"].astype(int).astype(str)
-        + "-01",
-        errors="coerce"
+def sidebar_upload() -> PreparedUpload | None:
+    """
+    Widget upload di sidebar. None kalau tidak ada upload (atau ditolak):
+    dashboard memakai data hasil ingest.
+    """
+    st.sidebar.markdown("## ⚙️ Pengaturan")
+    uploaded = st.sidebar.file_uploader(
+        "Upload data (Excel .xlsx)", type=["xlsx"], key="upload_file",
+        help=f"Maksimal {MAX_UPLOAD_BYTES // 1024 // 1024} MB. Kosongkan untuk kembali ke data utama.",
     )
+    if uploaded is None:
+        return None
+    try:
+        with section_timer("upload: siapkan data"):
+            upload = UPLOADS.get_or_prepare(uploaded.getvalue(), uploaded.name)
+    except SchemaError as e:
+        st.sidebar.error(f"Upload ditolak. {e}")
+        return None
+    st.sidebar.caption(f"Menampilkan **{uploaded.name}** ({len(upload.clean):,} baris bersih).")
+    return upload
 
-    return out
 
 
-# # =========================================================
-# # SIDEBAR – DATA SOURCE & PARAMETER
-# # =========================================================
-# st.sidebar.markdown("## ⚙️ Pengaturan")
 
-# # Upload file Excel oleh user
-# uploaded = st.sidebar.file_uploader(
-#     "Upload data (Excel .xlsx)", type=["xlsx"]
-# )
-
-
-BASE_DIR = Path(__file__).resolve().parent
-DEFAULT_FILE = BASE_DIR / "data" / "data_narapidana_cirebon_clean.xlsx"
-@st.cache_data(show_spinner=False)
-def load_excel_from_path(path: Path):
-    return pd.read_excel(path, engine="openpyxl")
+# =========================================================
+# LOAD DATA
+# Urutan dibuat agar layar pertama cepat tampil:
+# manifest (cek file) -> header -> baru data & cube (memory-mapped)
+# =========================================================
+# Cek kesegaran sumber (stat, kadang hash) tidak dijalankan tiap rerun:
+# hasilnya di-cache per mtime manifest (ingest ulang dari proses lain langsung
+# terlihat) dan sumber Excel dicek ulang paling cepat tiap SOURCE_CHECK_SECONDS.
+SOURCE_CHECK_SECONDS = float(os.environ.get("LAPAS_SOURCE_CHECK_SECONDS", 30))
 
-@st.cache_data(show_spinner=False)
-def load_excel_from_upload(uploaded_file):
-    return pd.read_excel(io.BytesIO(uploaded_file.getvalue()), engine="openpyxl")
 
+@st.cache_resource(show_spinner=False, ttl=SOURCE_CHECK_SECONDS, max_entries=1)
+def prepared_manifest(manifest_mtime_ns: int) -> dict:
+    """
+    Manifest hasil ingest terbaru (ingest dijalankan dulu kalau perlu).
+    Hanya dibaca, tidak pernah diubah in-place.
+    """
+    return ensure_prepared(DEFAULT_SOURCE)
 
-# Input kapasitas lapas untuk perhitungan tingkat hunian
-capacity = st.sidebar.number_input(
-    "Kapasitas Lapas (orang)", min_value=1, value=1200, step=50
-)
 
+def manifest_mtime_ns() -> int:
+    try:
+        return (PREPARED_DIR / MANIFEST_FILE_NAME).stat().st_mtime_ns
+    except OSError:
+        return -1
 
-# =========================================================
-# LOAD DATA
-# =========================================================
-try:
-    df_raw = load_excel_from_path(DEFAULT_FILE)
 
-except Exception as e:
+def show_load_error(e: Exception):
     st.error("Data belum bisa dibaca. Pastikan file Excel sesuai format dan kolomnya lengkap.")
-    st.write("Path default:", str(DEFAULT_FILE))
-    st.write("File ketemu?:", DEFAULT_FILE.exists())
+    st.write("Sumber data:", str(DEFAULT_SOURCE))
+    st.write("Sumber ketemu?:", DEFAULT_SOURCE.exists())
+    if isinstance(e, IntegrityError):
+        # Kebijakan reject: tampilkan contoh baris bermasalah untuk diperbaiki di workbook
+        st.dataframe(pd.DataFrame(e.report["examples"]), use_container_width=True, hide_index=True)
     st.exception(e)
     st.stop()
 
 
-# =========================================================
-# DATA PREPARATION
-# =========================================================
-# Bangun kolom periode (datetime)
-df = build_datetime(df_raw)
-
-# Filter khusus wilayah Cirebon jika kolom tersedia
-if "nama_kabupaten_kota" in df.columns:
-    df["nama_kabupaten_kota"] = (
-        df["nama_kabupaten_kota"].astype(str).str.upper().str.strip()
-    )
-    df = df[df["nama_kabupaten_kota"].str.contains("CIREBON", na=False)]
+try:
+    with section_timer("startup: manifest"):
+        manifest = prepared_manifest(manifest_mtime_ns())
+except Exception as e:
+    show_load_error(e)
 
-# Normalisasi kolom kategorikal
-df["jenis_kelamin"] = df["jenis_kelamin"].astype(str).str.upper().str.strip()
-df["kategori_kejahatan"] = df["kategori_kejahatan"].astype(str).str.strip()
+UPLOAD = sidebar_upload()
 
-# Pastikan jumlah narapidana bertipe numerik
-df["jumlah_narapidana"] = (
-    pd.to_numeric(df["jumlah_narapidana"], errors="coerce")
-    .fillna(0)
-    .astype(int)
-)
+# Manifest data yang sedang ditampilkan (upload kalau ada, selain itu ingest)
+active_manifest = UPLOAD.manifest if UPLOAD else manifest
 
-# Ambil periode terakhir untuk informasi update data
-last_period = df["periode"].max()
+# Ambil periode terakhir untuk informasi update data (dari manifest, tanpa scan data)
+last_period = pd.Timestamp(active_manifest["last_period"]) if active_manifest.get("last_period") else pd.NaT
 last_update_str = (
     last_period.strftime("%d %B %Y") if pd.notna(last_period) else "-"
 )
 
 
 # =========================================================
-# FILTER STATE
-# Digunakan agar filter tidak reset saat interaksi user
+# HEADER DASHBOARD
+# Menampilkan judul, subjudul, dan info terakhir update data
 # =========================================================
-if "filter_gender" not in st.session_state:
-    st.session_state.filter_gender = "Semua"
-if "filter_crime" not in st.session_state:
-    st.session_state.filter_crime = "Semua Kejahatan"
-if "filter_year" not in st.session_state:
-    st.session_state.filter_year = "Semua"
-if "filter_month" not in st.session_state:
-    st.session_state.filter_month = "Semua"
+hero(last_update_str)
+
+
+if UPLOAD:
+    df, cube = UPLOAD.clean, UPLOAD.cube
+else:
+    try:
+        with section_timer("startup: muat data"):
+            df = load_clean_data(manifest["data_version"], manifest)
+            cube = load_cube(manifest["data_version"], manifest)
+    except Exception as e:
+        show_load_error(e)
+
+
+DATA_VERSION = active_manifest["data_version"]
+
+# Temuan pemeriksaan integritas saat ingest (detail di panel bawah halaman)
+INTEGRITY = active_manifest["stats"].get("integrity", {})
+if findings_count(INTEGRITY):
+    st.warning(
+        f"Pemeriksaan integritas data: {format_findings(INTEGRITY)} "
+        f"(kebijakan **{INTEGRITY['policy']}**). Lihat panel Integritas Data di bawah.",
+        icon="⚠️",
+    )
+
 
 # =========================================================
-# OPSI FILTER (SELECTBOX OPTIONS)
-# Membuat daftar pilihan filter berdasarkan isi data
+# RESULT CACHE (LINTAS REPLIKA & RESTART)
+# Agregat & spesifikasi grafik disimpan di cache_store (default: SQLite lokal),
+# di-key dengan versi data + state filter, sehingga cache yang sudah hangat
+# tetap terpakai setelah restart dan dibagi oleh semua replika.
+# Versi data di kunci = revisi sel yang dicakup filter (engine.cache_version):
+# koreksi workbook hanya membatalkan hasil yang selnya ikut berubah
 # =========================================================
+@st.cache_resource(show_spinner=False)
+def get_result_cache() -> ResultCache:
+    return cache_from_env()
 
-# Opsi filter jenis kelamin:
-# - "Semua" untuk menampilkan seluruh data
-# - Nilai lainnya diambil dari kolom jenis_kelamin (unik, non-null)
-gender_opts = ["Semua"] + sorted(
-    df["jenis_kelamin"].dropna().unique().tolist()
-)
 
-# Opsi filter kategori kejahatan:
-# - "Semua Kejahatan" untuk menampilkan seluruh kategori
-# - Diambil dari nilai unik kolom kategori_kejahatan
-crime_opts = ["Semua Kejahatan"] + sorted(
-    df["kategori_kejahatan"].dropna().unique().tolist()
-)
+RESULT_CACHE = get_result_cache()
+
+
+def filter_params() -> dict:
+    """
+    State filter aktif dalam bentuk kanonik (list terurut, period None =
+    seluruh rentang), dipakai sebagai bagian dari kunci cache.
+    """
+    return canonical_filters(
+        cube,
+        gender=st.session_state.filter_gender,
+        crime=st.session_state.filter_crime,
+        year=st.session_state.filter_year,
+        month=st.session_state.filter_month,
+        period=st.session_state.get("filter_period"),
+    )
+
+
+def cached_result(kind: str, params: dict, compute):
+    """
+    Ambil hasil agregat dari result cache, hitung kalau belum ada.
+    """
+    return RESULT_CACHE.get_or_compute(kind, cache_version(cube, DATA_VERSION, params), params, compute)
+
+
+def cached_figures(kind: str, params: dict, build) -> list:
+    """
+    Seperti cached_result, tapi untuk grafik: yang disimpan adalah spesifikasi
+    plotly (dict), lalu dibentuk ulang menjadi go.Figure saat dipakai.
+    """
+    import plotly.graph_objects as go
+
+    specs = cached_result(kind, params, lambda: [fig.to_plotly_json() for fig in build()])
+    return [go.Figure(spec) for spec in specs]
+
 
-# Opsi filter tahun:
-# - "Semua" untuk menampilkan seluruh tahun
-# - Tahun dikonversi ke integer agar konsisten
-year_opts = ["Semua"] + sorted(
-    df["tahun"].dropna().astype(int).unique().tolist()
-)
 
-# Opsi filter bulan:
-# - "Semua" untuk menampilkan seluruh bulan
-# - MONTH_ORDER digunakan agar urutan bulan tetap kronologis
+
+# =========================================================
+# OPSI FILTER
+# Gender, kejahatan & tahun: multi-select (kosong = semua)
+# Bulan: satu nilai; Periode: rentang (slider) atas periode yang ada datanya
+# =========================================================
+
+# Label sumbu cube sudah unik & terurut saat ingest
+gender_opts = sorted(cube.genders)
+crime_opts = sorted(cube.categories)
+year_opts = [int(y) for y in cube.years]
+
+# MONTH_ORDER digunakan agar urutan bulan tetap kronologis
 month_opts = ["Semua"] + [m.title() for m in MONTH_ORDER]
 
+# Periode "YYYY-MM" kronologis (indeks terurut untuk binary search rentang)
+period_opts = available_periods(cube)
+if not period_opts:
+    st.warning("Data belum berisi periode apa pun. Periksa isi workbook sumber atau upload.")
+    st.stop()
+FULL_PERIOD = (period_opts[0], period_opts[-1])
+
+
+def format_period(label: str) -> str:
+    year, month = label.split("-")
+    return f"{MONTH_ORDER[int(month) - 1].title()[:3]} {year}"
+
 
 # =========================================================
-# HEADER DASHBOARD
-# Menampilkan judul, subjudul, dan info terakhir update data
+# FILTER STATE
+# Digunakan agar filter tidak reset saat interaksi user
 # =========================================================
-st.markdown(f"""
-<div class="hero">
-  <div style="display:flex;justify-content:space-between;gap:12px;align-items:flex-start;">
-    <div>
-      <div style="font-size:32px;font-weight:900;letter-spacing:-.3px;">🛡️ Dashboard Lapas Cirebon</div>
-      <div style="opacity:.78;margin-top:4px;">Sistem Informasi Data Narapidana · Live Update</div>
-      <div style="margin-top:10px;display:flex;gap:10px;flex-wrap:wrap;">
-        <span class="badge"><span class="dot"></span>Live Update</span>
-        <span class="badge">🗓️ Terakhir diperbarui: <b>{last_update_str}</b></span>
-      </div>
-    </div>
-    <span class="badge">⚡ Monitoring</span>
-  </div>
-</div>
-""", unsafe_allow_html=True)
-
-st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
+FILTER_DEFAULTS = {
+    "gender": [],
+    "crime": [],
+    "year": [],
+    "month": "Semua",
+    "period": None,
+}
+
+
+def apply_filter_state(state: dict) -> None:
+    """
+    Mengisi widget filter dari state kanonik (lihat filter_params).
+    """
+    for name, value in state.items():
+        if name == "period":
+            value = tuple(value) if value else FULL_PERIOD
+        elif isinstance(value, list):
+            value = list(value)
+        st.session_state[f"filter_{name}"] = value
+
+
+# Tautan yang dibagikan (?crime=...&year=...) mengisi filter sekali saat sesi
+# dibuka; setelah itu URL mengikuti widget (lihat sync_query_params)
+if "_url_filters" not in st.session_state:
+    st.session_state["_url_filters"] = True
+    if any(key in st.query_params for key in QUERY_KEYS):
+        apply_filter_state(filters_from_query(cube, {key: st.query_params.get_all(key) for key in QUERY_KEYS}))
+
+# Rentang periode tidak di-seed: slider memakai value=FULL_PERIOD sebagai default
+# (select_slider hanya mengenali mode rentang dari argumen value)
+for name, value in FILTER_DEFAULTS.items():
+    if name != "period" and f"filter_{name}" not in st.session_state:
+        apply_filter_state({name: value})
+
+# Rentang periode lama bisa tidak valid lagi setelah data diperbarui
+if not set(st.session_state.get("filter_period", FULL_PERIOD)) <= set(period_opts):
+    st.session_state.filter_period = FULL_PERIOD
+
+# Pilihan lama yang tidak ada di data aktif (mis. setelah upload workbook lain) dibuang
+for name, opts in (("gender", gender_opts), ("crime", crime_opts), ("year", year_opts)):
+    if not set(st.session_state[f"filter_{name}"]) <= set(opts):
+        st.session_state[f"filter_{name}"] = [v for v in st.session_state[f"filter_{name}"] if v in opts]
+
+
+def apply_pending_drill() -> None:
+    """
+    Menerapkan langkah drill dari klik grafik pada run sebelumnya.
+    """
+    step = st.session_state.pop("_drill_pending", None)
+    if step is None:
+        return
+    apply_filter_state(step["after"])
+    st.session_state.setdefault("_drill_stack", []).append(step)
+    st.session_state["_drill_seq"] = st.session_state.get("_drill_seq", 0) + 1
+
+
+# Dipanggil sebelum widget filter dibuat (lihat DRILL-DOWN)
+apply_pending_drill()
+
 
 def reset_filters():
-    st.session_state["filter_gender"] = "Semua"
-    st.session_state["filter_crime"]  = "Semua Kejahatan"
-    st.session_state["filter_year"]   = "Semua"
-    st.session_state["filter_month"]  = "Semua"
+    apply_filter_state(FILTER_DEFAULTS)
+    st.session_state["_drill_stack"] = []
 
-# Layout filter menggunakan kolom
-f1, f2, f3, f4, f5 = st.columns([1,2,1,1,1], vertical_alignment="bottom")
 
-# Pastikan default state ada
-st.session_state.setdefault("filter_gender", "Semua")
-st.session_state.setdefault("filter_crime",  "Semua Kejahatan")
-st.session_state.setdefault("filter_year",   "Semua")
-st.session_state.setdefault("filter_month",  "Semua")
+def single_crime(state: dict) -> str:
+    """
+    Nama kategori kalau tepat satu kejahatan dipilih, selain itu "Semua Kejahatan"
+    (grafik utama beralih ke tampilan per kategori tunggal hanya pada kasus ini).
+    """
+    return state["crime"][0] if len(state["crime"]) == 1 else "Semua Kejahatan"
+
 
+# Layout filter menggunakan kolom
 f1, f2, f3, f4, f5 = st.columns([1,2,1,1,1], vertical_alignment="bottom")
 
 with f1:
-    st.selectbox("Jenis Kelamin", gender_opts, key="filter_gender")
+    st.multiselect("Jenis Kelamin", gender_opts, key="filter_gender", placeholder="Semua")
 
 with f2:
-    st.selectbox("Jenis Kejahatan", crime_opts, key="filter_crime")
+    st.multiselect("Jenis Kejahatan", crime_opts, key="filter_crime", placeholder="Semua Kejahatan")
 
 with f3:
-    st.selectbox("Tahun", year_opts, key="filter_year")
+    st.multiselect("Tahun", year_opts, key="filter_year", placeholder="Semua")
 
 with f4:
     st.selectbox("Bulan", month_opts, key="filter_month")
 
 with f5:
-    st.markdown("<div style='height: 28px;'></div>", unsafe_allow_html=True)
     st.button("Reset Filter", use_container_width=True, on_click=reset_filters)
 
+if len(period_opts) > 1:
+    st.select_slider(
+        "Rentang Periode",
+        options=period_opts,
+        value=FULL_PERIOD,
+        format_func=format_period,
+        key="filter_period",
+    )
+
 # =========================================================
-# APPLY FILTER
-# Menerapkan filter user ke dataset
+# DRILL-DOWN (CROSS-FILTER DARI GRAFIK)
+# Klik batang / sel / kotak pada grafik komposisi, heatmap & treemap mengisi
+# filter_crime / filter_month / filter_year (+ gender dari treemap bertingkat).
+# Hasilnya dijawab dari cube (mask per sumbu) + result cache, tanpa scan baris.
+# Setiap langkah disimpan di _drill_stack (filter sebelum & sesudah) untuk
+# breadcrumb, sehingga user bisa naik kembali ke tingkat mana pun.
+#
+# Grafik ada di dalam fragment, sedangkan widget filter tidak boleh diubah
+# setelah dibuat pada run yang sama. Jadi klik grafik hanya mencatat langkahnya
+# (_drill_pending) lalu meminta rerun penuh; langkah itu diterapkan di awal
+# rerun penuh tersebut, sebelum widget filter dibuat (lihat FILTER STATE).
 # =========================================================
-df_f = df.copy()
+def _drill_stack() -> list:
+    return st.session_state.setdefault("_drill_stack", [])
 
-# Filter jenis kelamin
-if st.session_state.filter_gender != "Semua":
-    df_f = df_f[df_f["jenis_kelamin"] == st.session_state.filter_gender]
 
-# Filter kategori kejahatan
-if st.session_state.filter_crime != "Semua Kejahatan":
-    df_f = df_f[df_f["kategori_kejahatan"] == st.session_state.filter_crime]
+def drill_to(label: str, **changes) -> None:
+    """
+    Satu langkah drill-down (dipanggil lewat on_point di drill_chart).
+    changes: nama filter (gender/crime/year/month) -> nilai baru.
+    Kalau filter berubah: langkah dicatat lalu rerun penuh (tidak kembali).
+    """
+    before = filter_params()
+    after = canonical_filters(cube, **{**before, **changes})
+    if after == before:
+        return
+    st.session_state["_drill_pending"] = {"label": label, "before": before, "after": after}
+    st.rerun(scope="app")
+
 
-# Filter tahun
-if st.session_state.filter_year != "Semua":
-    df_f = df_f[df_f["tahun"].astype(int) == int(st.session_state.filter_year)]
+def drill_back(level: int) -> None:
+    """
+    Kembali ke keadaan filter sebelum langkah ke-`level` (0 = awal).
+    """
+    stack = _drill_stack()
+    apply_filter_state(stack[level]["before"])
+    del stack[level:]
+    st.session_state["_drill_seq"] = st.session_state.get("_drill_seq", 0) + 1
 
-# Filter bulan
-if st.session_state.filter_month != "Semua":
-    df_f = df_f[df_f["bulan"].str.upper() == st.session_state.filter_month.upper()]
 
-# ========================================================
-# PERHITUNGAN KPI UTAMA
-# =========================================================
+def drill_chart(fig, name: str, on_point) -> None:
+    """
+    Render grafik plotly yang bisa diklik untuk drill-down.
+    on_point(point) menerjemahkan titik terpilih menjadi panggilan drill_to.
+    Key memuat nomor langkah drill, jadi seleksi lama tidak terbawa.
+    """
+    event = st.plotly_chart(
+        fig,
+        use_container_width=True,
+        config=PLOT_CONFIG,
+        key=f"drill_{name}_{st.session_state.get('_drill_seq', 0)}",
+        on_select="rerun",
+        selection_mode="points",
+    )
+    points = ((event or {}).get("selection") or {}).get("points") or []
+    if points:
+        on_point(points[0])
 
-# Total narapidana sesuai filter aktif
-total_kpi = int(df_f["jumlah_narapidana"].sum()) if len(df_f) else 0
 
-# Agregasi jumlah narapidana per kategori kejahatan
-crime_agg_kpi = (
-    df_f.groupby("kategori_kejahatan", as_index=False)["jumlah_narapidana"]
-       .sum()
-       .sort_values("jumlah_narapidana", ascending=False)
-)
+def render_breadcrumb() -> None:
+    """
+    Jejak drill-down: tombol untuk setiap tingkat di atasnya + tingkat aktif.
+    Kalau filter diubah manual lewat selectbox, jejak dianggap selesai.
+    """
+    stack = _drill_stack()
+    if stack and stack[-1]["after"] != filter_params():
+        stack.clear()
+    if not stack:
+        return
+
+    cols = st.columns([1] * (len(stack) + 1) + [2], vertical_alignment="center")
+    for level, col in enumerate(cols[:len(stack)]):
+        with col:
+            st.button(
+                "🏠 Awal" if level == 0 else f"‹ {stack[level - 1]['label']}",
+                key=f"crumb_{level}",
+                on_click=drill_back,
+                args=(level,),
+                use_container_width=True,
+            )
+    with cols[len(stack)]:
+        st.markdown(f"**› {stack[-1]['label']}**")
 
-# Kategori kejahatan dengan jumlah terbanyak
-top_crime = crime_agg_kpi.iloc[0]["kategori_kejahatan"] if len(crime_agg_kpi) else "-"
 
-# Agregasi jumlah narapidana per periode (bulan-tahun)
-period_agg = (
-    df_f.groupby("periode", as_index=False)["jumlah_narapidana"]
-       .sum()
-       .sort_values("jumlah_narapidana", ascending=False)
-)
+render_breadcrumb()
 
-# Periode dengan jumlah narapidana tertinggi
-densest_period = period_agg.iloc[0]["periode"] if len(period_agg) else pd.NaT
-
-# Nama bulan terpadat
-densest_month = "-"
-if pd.notna(densest_period):
-    tmp = df_f[df_f["periode"] == densest_period]
-    densest_month = (
-        str(tmp.iloc[0]["bulan"]).upper().strip()
-        if len(tmp)
-        else densest_period.strftime("%B").upper()
-    )
+# =========================================================
+# APPLY FILTER
+# Menerapkan filter user ke dataset: rentang periode diiris dengan binary
+# search (data terurut per periode), multi-select memakai bitmap kode kategori
+# =========================================================
+def sync_query_params(params: dict) -> None:
+    """
+    Menulis state filter kanonik ke URL (parameter lain dibiarkan), hanya
+    kalau berubah. Pilihan yang setara -> URL sama -> kunci cache sama,
+    jadi pembuka tautan yang sama langsung memakai hasil yang sudah di-cache.
+    """
+    query = {k: v if isinstance(v, list) else [v] for k, v in filters_to_query(params).items()}
+    current = {k: st.query_params.get_all(k) for k in QUERY_KEYS if k in st.query_params}
+    if current != query:
+        others = {k: st.query_params.get_all(k) for k in st.query_params if k not in QUERY_KEYS}
+        st.query_params.from_dict({**others, **query})
+
+
+FILTERS = filter_params()
+sync_query_params(FILTERS)
+df_f = filter_rows(df, **FILTERS)
 
+# Filter yang sama diterapkan ke cube (mask per sumbu, tanpa scan baris)
+cube_f = cube.masked(filter_mask(cube, **FILTERS))
 
 # =========================================================
-# TAMPILAN KPI RINGKAS
+# PERHITUNGAN KPI UTAMA
+# Semua nilai kartu diturunkan sekali dari cube terfilter (engine.kpi_result)
+# dan di-cache per state filter; kapasitas baru diterapkan saat render
+# =========================================================
+KPI = cached_result("agg:kpi", FILTERS, lambda: kpi_result(cube_f))
 
-# ===== SECTION KPI =====
-st.markdown(
-    """
-    <div class="section-head">
-      <div class="section-left">
-        <div class="section-icon">📊</div>
-        <div>
-          <div class="section-title">
-            Ringkasan Utama <span class="kpi-tag">(KPI)</span>
-          </div>
-          <div class="section-sub">Kondisi terkini berdasarkan periode terakhir</div>
-          <div class="section-underline"></div>
-        </div>
-      </div>
-
-      <div class="section-right">
-        <div class="section-pill">
-          <span class="dot"></span>
-          KPI Summary
-        </div>
-      </div>
-    </div>
-    <div style="height:10px"></div>
-    """,
-    unsafe_allow_html=True
-)
+# Kapasitas awal input KPI (sama dengan default API); juga dipakai
+# sheet ringkasan export Excel
+DEFAULT_CAPACITY = 1200
 
 
 # =========================================================
-# KPI CARDS (WARNA)
-# Menampilkan ringkasan statistik utama secara visual
+# KPI (FRAGMENT)
+# Dibungkus st.fragment: input kapasitas hanya merender ulang bagian ini
 # =========================================================
+@st.fragment
+@timed("kpi")
+def render_kpi_section(kpi: KpiResult):
+    # =========================================================
+    # TAMPILAN KPI RINGKAS
+
+    # ===== SECTION KPI =====
+    section_header(
+        "📊",
+        'Ringkasan Utama <span class="kpi-tag">(KPI)</span>',
+        "Kondisi terkini berdasarkan periode terakhir",
+        "KPI Summary",
+    )
 
-# Total narapidana
-total = int(df_f["jumlah_narapidana"].sum())
 
-# Jumlah narapidana laki-laki
-male = int(
-    df_f.loc[
-        df_f["jenis_kelamin"].str.contains("LAKI", na=False),
-        "jumlah_narapidana"
-    ].sum()
-)
+    # Input kapasitas lapas untuk perhitungan tingkat hunian.
+    # Diletakkan di dalam fragment KPI (bukan sidebar) agar perubahan kapasitas
+    # hanya merender ulang kartu KPI, bukan seluruh dashboard.
+    cap_col, _ = st.columns([1, 3])
+    with cap_col:
+        capacity = st.number_input(
+            "Kapasitas Lapas (orang)", min_value=1, value=DEFAULT_CAPACITY, step=50, key="capacity"
+        )
 
-# ===== KPI berbasis periode terbaru (lebih masuk akal untuk hunian) =====
-last_p = df_f["periode"].max() if len(df_f) else pd.NaT
-df_last = df_f[df_f["periode"] == last_p] if pd.notna(last_p) else df_f.iloc[0:0]
-
-total = int(df_last["jumlah_narapidana"].sum()) if len(df_last) else 0
-
-male = int(
-    df_last.loc[df_last["jenis_kelamin"].str.contains("LAKI", na=False), "jumlah_narapidana"].sum()
-) if len(df_last) else 0
-
-female = int(
-    df_last.loc[df_last["jenis_kelamin"].str.contains("PEREMPUAN", na=False), "jumlah_narapidana"].sum()
-) if len(df_last) else 0
-
-occupancy = (total / capacity) * 100 if capacity else 0.0
-
-# HTML untuk menampilkan kartu KPI berwarna
-cards_html = f"""
-<div class="cards">
-  <div class="card c1">
-    <div class="icon">👥</div>
-    <div class="label">Total Narapidana</div>
-    <div class="value">{total:,}</div>
-    <div class="note">Kapasitas: {capacity:,} ({occupancy:.1f}%)</div>
-  </div>
-  <div class="card c2">
-    <div class="icon">♂️</div>
-    <div class="label">Laki-laki</div>
-    <div class="value">{male:,}</div>
-    <div class="note">{(male/total*100 if total else 0):.1f}% dari total</div>
-  </div>
-  <div class="card c3">
-    <div class="icon">♀️</div>
-    <div class="label">Perempuan</div>
-    <div class="value">{female:,}</div>
-    <div class="note">{(female/total*100 if total else 0):.1f}% dari total</div>
-  </div>
-  <div class="card c4">
-    <div class="icon">📈</div>
-    <div class="label">Tingkat Hunian</div>
-    <div class="value">{occupancy:.1f}%</div>
-    <div class="note">Dari kapasitas maksimal</div>
-  </div>
-</div>
-"""
-
-# Render KPI cards ke dashboard
-st.markdown(cards_html, unsafe_allow_html=True)
+    # =========================================================
+    # KPI CARDS (WARNA)
+    # Menampilkan ringkasan statistik utama secara visual.
+    # Total, laki-laki & perempuan memakai periode terbaru (lebih masuk akal
+    # untuk hunian); nilainya sudah dihitung di KpiResult
+    # =========================================================
+    total, male, female = kpi.total_narapidana, kpi.laki_laki, kpi.perempuan
+    occupancy = kpi.tingkat_hunian(capacity)
+
+    # Render KPI cards ke dashboard (template ringkas)
+    kpi_cards([
+        {"cls": "c1", "icon": "👥", "label": "Total Narapidana", "value": f"{total:,}",
+         "note": f"Kapasitas: {capacity:,} ({occupancy:.1f}%)"},
+        {"cls": "c2", "icon": "♂️", "label": "Laki-laki", "value": f"{male:,}",
+         "note": f"{(male/total*100 if total else 0):.1f}% dari total"},
+        {"cls": "c3", "icon": "♀️", "label": "Perempuan", "value": f"{female:,}",
+         "note": f"{(female/total*100 if total else 0):.1f}% dari total"},
+        {"cls": "c4", "icon": "📈", "label": "Tingkat Hunian", "value": f"{occupancy:.1f}%",
+         "note": "Dari kapasitas maksimal"},
+    ])
+
+
+render_kpi_section(KPI)
+
+# Header, filter & kartu KPI sudah terkirim ke browser
+paint_mark("kpi", first_meaningful=True)
 
 def polish(fig, height=360):
     fig.update_layout(
@@ -1265,24 +766,53 @@ def polish(fig, height=360):
 # =========================================================
 # TAB UNTUK VISUALISASI
 # =========================================================
-tab1, tab2, tab3 = st.tabs(
-    ["Grafik Utama", "Analisis Lanjutan", "Komposisi"]
+# Setiap tab dirender oleh fragment sendiri (lihat fungsi render_tab_*),
+# sehingga widget di dalam satu tab tidak memicu rerun seluruh dashboard
+if df_f.empty:
+    st.warning("Tidak ada data untuk kombinasi filter ini. Coba longgarkan filter.")
+    st.stop()
+
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["Grafik Utama", "Analisis Lanjutan", "Komposisi", "Perbandingan"]
 )
 
+# =========================================================
+# RENDER PROGRESIF
+# Slot tiap tab & tabel rekap dibuat lebih dulu berisi skeleton, lalu diisi
+# satu per satu (lihat bagian ISI SLOT di bawah). Browser sudah menampilkan
+# header + KPI + kerangka halaman sementara grafik masih dihitung.
+# LAPAS_PROGRESSIVE=0 -> urutan lama (tanpa skeleton)
+# =========================================================
+PROGRESSIVE = os.environ.get("LAPAS_PROGRESSIVE", "1") != "0"
+SKELETON_TEMPLATE = '<div class="skeleton">⏳ {label}</div>'
+
+SLOTS = {
+    "grafik utama": tab1.empty(),
+    "analisis lanjutan": tab2.empty(),
+    "komposisi": tab3.empty(),
+    "perbandingan": tab4.empty(),
+}
+SLOTS["rekap"] = st.empty()
+
+if PROGRESSIVE:
+    for name, slot in SLOTS.items():
+        with slot:
+            html(SKELETON_TEMPLATE.format(label=f"Menyiapkan {name}…"))
+
 # =========================================================
 # TAB 1: GRAFIK UTAMA (CLEAN & AKADEMIS)
 # Semua grafik menggunakan df_f (hasil filter)
 # =========================================================
-with tab1:
-    if df_f.empty:
-        st.warning("Tidak ada data untuk kombinasi filter ini. Coba longgarkan filter.")
-        st.stop()
+def build_grafik_utama_figures(df_f: pd.DataFrame, cube_f: Cube, filter_crime: str, filter_month: str):
+    """
+    Membangun 4 grafik tab Grafik Utama (dipisah dari render agar bisa di-cache).
+    Grafik komposisi (fig1) diambil dari cube karena menjadi titik awal drill-down.
+    """
+    import plotly.express as px
 
     # Flags
-    crime_locked = st.session_state.filter_crime != "Semua Kejahatan"
-    month_locked = st.session_state.filter_month != "Semua"
-
-    c1, c2 = st.columns(2)
+    crime_locked = filter_crime != "Semua Kejahatan"
+    month_locked = filter_month != "Semua"
 
     # =====================================================
     # (A) KIRI ATAS: Struktur / Komposisi
@@ -1290,11 +820,7 @@ with tab1:
     # - Kalau crime dipilih: Distribusi bulan untuk crime terpilih
     # =====================================================
     if not crime_locked:
-        comp = (
-            df_f.groupby("kategori_kejahatan", as_index=False)["jumlah_narapidana"]
-                .sum()
-                .sort_values("jumlah_narapidana", ascending=False)
-        )
+        comp = pd.DataFrame(category_series(cube_f))
 
         top10 = comp.head(10).copy()
         other_sum = comp.iloc[10:]["jumlah_narapidana"].sum()
@@ -1318,20 +844,13 @@ with tab1:
             hovertemplate="<b>%{y}</b><br>Jumlah: %{x:,}<extra></extra>"
         )
     else:
-        by_month = (
-            df_f.groupby("bulan", as_index=False)["jumlah_narapidana"]
-                .sum()
-        )
-        by_month["bulan"] = pd.Categorical(
-            by_month["bulan"].str.upper(), categories=MONTH_ORDER, ordered=True
-        )
-        by_month = by_month.sort_values("bulan")
+        by_month = pd.DataFrame(month_series(cube_f))
 
         fig1 = px.bar(
             by_month,
             x="bulan",
             y="jumlah_narapidana",
-            title=f"Distribusi Bulan — {st.session_state.filter_crime} (sesuai filter)",
+            title=f"Distribusi Bulan — {filter_crime} (sesuai filter)",
             labels={"bulan": "Bulan", "jumlah_narapidana": "Jumlah"},
         )
         fig1.update_traces(
@@ -1364,7 +883,7 @@ with tab1:
             x="periode",
             y="kumulatif",
             markers=True,
-            title=f"Tren Kumulatif — {st.session_state.filter_crime} (sesuai filter)",
+            title=f"Tren Kumulatif — {filter_crime} (sesuai filter)",
             labels={"periode": "", "kumulatif": "Total Kumulatif"},
         )
         fig2.update_traces(
@@ -1375,12 +894,9 @@ with tab1:
         # kalau user sudah mengunci bulan, pindah ke distribusi per tahun agar tetap informatif
         if not month_locked:
             agg = (
-                df_f.groupby("bulan", as_index=False)["jumlah_narapidana"]
+                df_f.groupby("bulan", as_index=False, observed=True)["jumlah_narapidana"]
                     .sum()
             )
-            agg["bulan"] = pd.Categorical(
-                agg["bulan"].str.upper(), categories=MONTH_ORDER, ordered=True
-            )
             agg = agg.sort_values("bulan")
 
             fig2 = px.bar(
@@ -1400,7 +916,7 @@ with tab1:
                 agg,
                 x="tahun",
                 y="jumlah_narapidana",
-                title=f"Distribusi per Tahun (bulan = {st.session_state.filter_month}) — sesuai filter",
+                title=f"Distribusi per Tahun (bulan = {filter_month}) — sesuai filter",
                 labels={"tahun": "Tahun", "jumlah_narapidana": "Jumlah"},
             )
 
@@ -1416,13 +932,6 @@ with tab1:
         title_font=dict(size=18),
     )
 
-    with c1:
-        st.plotly_chart(fig1, use_container_width=True, config=PLOT_CONFIG)
-
-    with c2:
-        st.plotly_chart(fig2, use_container_width=True, config=PLOT_CONFIG)
-
-    c3, c4 = st.columns(2)
 
     # =====================================================
     # (C) KIRI BAWAH: Tren (filtered)
@@ -1459,7 +968,7 @@ with tab1:
     # =====================================================
     if not crime_locked:
         top4 = (
-            df_f.groupby("kategori_kejahatan")["jumlah_narapidana"]
+            df_f.groupby("kategori_kejahatan", observed=True)["jumlah_narapidana"]
                 .sum()
                 .sort_values(ascending=False)
                 .head(4)
@@ -1469,7 +978,7 @@ with tab1:
 
         area = (
             df_f[df_f["kategori_kejahatan"].isin(top4)]
-                .groupby(["periode", "kategori_kejahatan"], as_index=False)["jumlah_narapidana"]
+                .groupby(["periode", "kategori_kejahatan"], as_index=False, observed=True)["jumlah_narapidana"]
                 .sum()
                 .sort_values("periode")
         )
@@ -1492,7 +1001,7 @@ with tab1:
             area,
             x="periode",
             y="jumlah_narapidana",
-            title=f"Pola Waktu (Area) — {st.session_state.filter_crime} (sesuai filter)",
+            title=f"Pola Waktu (Area) — {filter_crime} (sesuai filter)",
             labels={"periode": "", "jumlah_narapidana": "Jumlah"},
         )
 
@@ -1502,6 +1011,38 @@ with tab1:
         title_font=dict(size=18),
     )
 
+    return fig1, fig2, fig3, fig4
+
+
+@st.fragment
+@timed("tab grafik utama")
+def render_tab_grafik_utama(df_f: pd.DataFrame, cube_f: Cube):
+    fig1, fig2, fig3, fig4 = cached_figures(
+        "fig:grafik_utama",
+        filter_params(),
+        lambda: build_grafik_utama_figures(
+            df_f, cube_f, single_crime(FILTERS), FILTERS["month"]
+        ),
+    )
+
+    def on_fig1(point):
+        # Top 10 kategori -> pilih kategori; distribusi bulan (satu kategori) -> pilih bulan
+        if single_crime(filter_params()) == "Semua Kejahatan":
+            crime = point.get("y")
+            if crime in cube.categories:
+                drill_to(crime, crime=[crime])
+        elif point.get("x"):
+            month = str(point["x"]).title()
+            drill_to(month, month=month)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        drill_chart(fig1, "komposisi", on_fig1)
+
+    with c2:
+        st.plotly_chart(fig2, use_container_width=True, config=PLOT_CONFIG)
+
+    c3, c4 = st.columns(2)
     with c3:
         st.plotly_chart(fig3, use_container_width=True, config=PLOT_CONFIG)
 
@@ -1513,65 +1054,96 @@ with tab1:
 # TAB 2: ANALISIS LANJUTAN
 # Heatmap, perbandingan tahunan, dan tren kumulatif
 # =========================================================
-with tab2:
+@st.fragment
+@timed("tab analisis lanjutan")
+def render_tab_analisis_lanjutan(cube_f: Cube):
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     # -----------------------------------------------------
-    # HEATMAP: Bulan vs Kategori (Top 15)
+    # HEATMAP: Bulan vs Kategori (Top N)
+    # Matriks kategori x bulan & kategori x tahun diturunkan dari cube
+    # (satu pass bincount), top-N dipilih dengan argpartition
     # -----------------------------------------------------
+    n_categories = int(present(cube_f, AXIS_CATEGORY).sum())
+
+    h1, h2 = st.columns([1, 2])
+    with h1:
+        if n_categories > 1:
+            # Nilai slider dijaga tetap dalam rentang saat filter mengubah jumlah kategori
+            st.session_state.setdefault("heat_top_n", 15)
+            st.session_state.heat_top_n = min(st.session_state.heat_top_n, n_categories)
+            top_heat = st.slider(
+                "Jumlah kategori (Top N)",
+                min_value=1,
+                max_value=n_categories,
+                key="heat_top_n",
+            )
+        else:
+            top_heat = n_categories
+    with h2:
+        heat_mode = st.radio(
+            "Normalisasi heatmap",
+            options=[NORMALIZE_NONE, NORMALIZE_ROW, NORMALIZE_COL],
+            format_func=lambda m: HEAT_MODE_LABELS[m],
+            horizontal=True,
+            key="heat_mode",
+        )
 
-    heat = (
-        df_f.groupby(["bulan", "kategori_kejahatan"], as_index=False)["jumlah_narapidana"]
-            .sum()
-    )
-    heat["bulan"] = pd.Categorical(
-        heat["bulan"].str.upper(), categories=MONTH_ORDER, ordered=True
+    heat = cached_result(
+        "agg:heatmap",
+        {**filter_params(), "top_n": top_heat, "mode": heat_mode},
+        lambda: heatmap_data(cube_f, top_heat, heat_mode),
     )
+    is_pct = heat_mode != NORMALIZE_NONE
 
-    top15 = (
-        df_f.groupby("kategori_kejahatan")["jumlah_narapidana"]
-            .sum()
-            .sort_values(ascending=False)
-            .head(15)
-            .index
-    )
-    heat = heat[heat["kategori_kejahatan"].isin(top15)]
-
-    heat_pivot = heat.pivot_table(
-        index="kategori_kejahatan",
-        columns="bulan",
-        values="jumlah_narapidana",
-        aggfunc="sum",
-        fill_value=0
-    )
     fig_heat = go.Figure(
         data=go.Heatmap(
-            z=heat_pivot.values,
-            x=list(heat_pivot.columns),
-            y=list(heat_pivot.index),
-            colorbar=dict(title="Jumlah")
+            z=heat["z"],
+            x=heat["x"],
+            y=heat["y"],
+            colorbar=dict(title="%" if is_pct else "Jumlah"),
+            hoverinfo="skip",
+        )
+    )
+    # Heatmap plotly tidak mendukung seleksi titik, jadi klik ditangkap oleh
+    # lapisan scatter transparan di tengah setiap sel (hover juga dari sini)
+    cells_y, cells_x = np.meshgrid(heat["y"], heat["x"], indexing="ij")
+    fig_heat.add_trace(
+        go.Scatter(
+            x=cells_x.ravel(),
+            y=cells_y.ravel(),
+            customdata=np.asarray(heat["z"]).ravel(),
+            mode="markers",
+            marker=dict(symbol="square", size=18, opacity=0),
+            showlegend=False,
+            hovertemplate=(
+                "<b>%{y}</b><br>%{x}: %{customdata:.1f}%<extra></extra>" if is_pct
+                else "<b>%{y}</b><br>%{x}: %{customdata:,.0f}<extra></extra>"
+            ),
         )
     )
-    fig_heat.update_layout(title="Heatmap: Kategori Kejahatan vs Bulan (Top 15)")
-    fig_heat = apply_plot_theme(fig_heat, height=420)
+    fig_heat.update_layout(
+        title=f"Heatmap: Kategori Kejahatan vs Bulan (Top {len(heat['y'])}, {HEAT_MODE_LABELS[heat_mode]})"
+    )
+    fig_heat = apply_plot_theme(fig_heat, height=max(420, 28 * len(heat["y"]) + 140))
+
+    def on_heat(point):
+        crime, month = point.get("y"), point.get("x")
+        if crime in cube.categories and month:
+            month = str(month).title()
+            drill_to(f"{crime} · {month}", crime=[crime], month=month)
 
-    st.plotly_chart(fig_heat, use_container_width=True, config=PLOT_CONFIG)
+    drill_chart(fig_heat, "heatmap", on_heat)
 
     
     # -----------------------------------------------------
     # GROUPED BAR: Top 5 Kategori per Tahun
+    # Memakai matriks kategori x tahun dari cube yang sama
     # -----------------------------------------------------
-     
-    top5 = (
-        df_f.groupby("kategori_kejahatan")["jumlah_narapidana"]
-            .sum()
-            .sort_values(ascending=False)
-            .head(5)
-            .index
-    )
-    by_year = (
-        df_f[df_f["kategori_kejahatan"].isin(top5)]
-            .groupby(["tahun", "kategori_kejahatan"], as_index=False)["jumlah_narapidana"]
-            .sum()
-            .sort_values(["tahun", "jumlah_narapidana"], ascending=[True, False])
+    by_year = cached_result(
+        "agg:top_by_year", {**filter_params(), "top_n": 5}, lambda: top_by_year_frame(cube_f, 5)
     )
 
     fig_year = px.bar(
@@ -1587,6 +1159,9 @@ with tab2:
     fig_year = apply_plot_theme(fig_year, height=420)
     st.plotly_chart(fig_year, use_container_width=True, config=PLOT_CONFIG)
 
+    st.markdown("---")
+    render_trend_panel()
+
     # # -----------------------------------------------------
     # # LINE CHART: Tren Kumulatif
     # # -----------------------------------------------------
@@ -1656,31 +1231,216 @@ with tab2:
     # st.plotly_chart(fig_yoy, use_container_width=True, config=PLOT_CONFIG)
 
 
+# -----------------------------------------------------
+# TREN & ANOMALI PER KATEGORI
+# MA, rolling z-score & flag anomali dihitung sekali untuk semua kategori
+# (seluruh data, di-cache per versi data); filter hanya membatasi tampilan
+# -----------------------------------------------------
+def render_trend_panel():
+    import numpy as np
+    import plotly.graph_objects as go
+
+    st.subheader("Tren & Anomali per Kategori")
+    t1, t2 = st.columns(2)
+    with t1:
+        window = st.slider("Jendela rata-rata bergulir (bulan)", 3, 12, 6, key="trend_window")
+    with t2:
+        threshold = st.select_slider(
+            "Ambang anomali (|z-score|)", options=[2.0, 2.5, 3.0, 3.5], value=2.5, key="trend_z"
+        )
+
+    stats = cached_result(
+        "agg:trend", {"window": window, "threshold": threshold},
+        lambda: trend_stats(cube, window, threshold),
+    )
+    anomalies = anomaly_frame(stats, crimes=FILTERS["crime"], period=FILTERS["period"])
+
+    # Kategori default: kejahatan yang difilter, atau anomali terkuat
+    candidates = [c for c in stats.categories if not FILTERS["crime"] or c in FILTERS["crime"]]
+    if not candidates:
+        st.info("Tidak ada seri kategori untuk filter ini.")
+        return
+    default = anomalies["kategori_kejahatan"].iloc[0] if len(anomalies) else candidates[0]
+    category = st.selectbox(
+        "Kategori", candidates, index=candidates.index(default), key="trend_category"
+    )
+
+    i = stats.categories.index(category)
+    flagged = stats.anomaly[i]
+    fig_trend = go.Figure([
+        go.Scatter(x=stats.periods, y=stats.values[i], mode="lines+markers", name="Jumlah"),
+        go.Scatter(x=stats.periods, y=stats.ma[i], mode="lines", name=f"MA {stats.window} bulan",
+                   line=dict(dash="dash")),
+        go.Scatter(
+            x=np.asarray(stats.periods)[flagged], y=stats.values[i][flagged], mode="markers",
+            name="Anomali", marker=dict(color="#ef4444", size=12, symbol="circle-open", line=dict(width=3)),
+            customdata=stats.z[i][flagged],
+            hovertemplate="%{x}<br>Jumlah: %{y:,}<br>z: %{customdata:.2f}<extra></extra>",
+        ),
+    ])
+    fig_trend = apply_plot_theme(fig_trend, height=380)
+    fig_trend.update_layout(title=dict(text=f"Tren & Anomali — {category}"))
+    st.plotly_chart(fig_trend, use_container_width=True, config=PLOT_CONFIG)
+
+    st.caption(
+        f"{len(anomalies)} titik anomali (|z| ≥ {threshold}) sesuai filter kejahatan & rentang periode. "
+        f"z-score dibandingkan dengan {stats.window} bulan sebelumnya."
+    )
+    if len(anomalies):
+        st.dataframe(anomalies, use_container_width=True, hide_index=True)
+
+
 # TAB 3: KOMPOSISI (COPY-PASTE FULL)
 # =========================
 # =========================
 # TAB 3: KOMPOSISI (SIAP COPAS) — JUDUL DI DALAM KOTAK, TANPA "undefined"
 # =========================
-with tab3:
+# =========================
+# TAB 4: PERBANDINGAN (YoY / MoM / DUA PERIODE BEBAS)
+# Mengikuti filter gender & kejahatan; tahun/bulan dipilih di tab ini.
+# Selisih total, gender & semua kategori dihitung sekaligus dari cube.
+# =========================
+COMPARE_MODE_LABELS = {COMPARE_YEAR: "Dua tahun (YoY)", COMPARE_PERIOD: "Dua periode (MoM)"}
+
+
+def _fmt_delta(row) -> str:
+    pct = "" if pd.isna(row["selisih_pct"]) else f" ({row['selisih_pct']:+.1f}%)"
+    return f"{int(row['selisih']):+,}{pct}"
+
+
+@st.fragment
+@timed("tab perbandingan")
+def render_tab_perbandingan():
+    import plotly.express as px
+
+    mode = st.radio(
+        "Mode perbandingan",
+        options=[COMPARE_YEAR, COMPARE_PERIOD],
+        format_func=lambda m: COMPARE_MODE_LABELS[m],
+        horizontal=True,
+        key="cmp_mode",
+    )
+    options = [int(y) for y in cube.years] if mode == COMPARE_YEAR else available_periods(cube)
+    if len(options) < 2:
+        st.info("Butuh minimal dua tahun / periode untuk dibandingkan.")
+        return
+
+    # Default: dua tahun / periode terakhir (YoY / MoM)
+    p1, p2 = st.columns(2)
+    with p1:
+        side_a = st.selectbox("Pembanding (A)", options, index=len(options) - 2, key=f"cmp_a_{mode}")
+    with p2:
+        side_b = st.selectbox("Acuan (B)", options, index=len(options) - 1, key=f"cmp_b_{mode}")
+
+    params = {**FILTERS, "year": [], "month": ALL_MONTH, "period": None}
+    frames = cached_result(
+        "agg:compare",
+        {**params, "mode": mode, "a": side_a, "b": side_b},
+        lambda: comparison_frames(
+            compare(cube.masked(filter_mask(cube, **params)), mode, side_a, side_b)
+        ),
+    )
+
+    # Kartu selisih: total + tiap jenis kelamin (nilai B, delta terhadap A)
+    cards = pd.concat([frames["total"], frames["gender"]], ignore_index=True)
+    for col, (_, row) in zip(st.columns(len(cards)), cards.iterrows()):
+        with col:
+            st.metric(
+                row["label"].title(),
+                f"{int(row['b']):,}",
+                delta=_fmt_delta(row),
+                delta_color="inverse" if row["selisih"] else "off",
+            )
+    st.caption(
+        f"B = {side_b}, A = {side_a}. Naik ditandai merah (jumlah narapidana bertambah)."
+        + (
+            f" Perbandingan tahun menjumlahkan bulan berdata "
+            f"(A: {frames['bulan']['a']} bulan, B: {frames['bulan']['b']} bulan)."
+            if mode == COMPARE_YEAR else ""
+        )
+    )
+
+    by_cat = frames["kategori"]
+    if by_cat.empty:
+        st.info("Tidak ada data kategori pada kedua sisi perbandingan.")
+        return
+
+    plot = by_cat.sort_values("selisih")
+    fig_delta = px.bar(
+        plot,
+        x="selisih",
+        y="label",
+        orientation="h",
+        color=plot["selisih"] > 0,
+        color_discrete_map={True: "#ef4444", False: "#19a0e9"},
+        custom_data=["a", "b", "selisih_pct"],
+        labels={"selisih": f"Selisih ({side_b} − {side_a})", "label": ""},
+    )
+    fig_delta.update_traces(
+        hovertemplate=(
+            "<b>%{y}</b><br>A: %{customdata[0]:,}<br>B: %{customdata[1]:,}"
+            "<br>Selisih: %{x:+,} (%{customdata[2]:+.1f}%)<extra></extra>"
+        )
+    )
+    fig_delta = apply_plot_theme(fig_delta, height=max(360, 24 * len(plot) + 120))
+    fig_delta.update_layout(
+        title=dict(text=f"Selisih per Kategori Kejahatan: {side_b} vs {side_a}"),
+        showlegend=False,
+    )
+    st.plotly_chart(fig_delta, use_container_width=True, config=PLOT_CONFIG)
+
+    st.dataframe(
+        by_cat.rename(columns={
+            "label": "Kategori Kejahatan",
+            "a": f"A ({side_a})",
+            "b": f"B ({side_b})",
+            "selisih": "Selisih",
+            "selisih_pct": "Selisih (%)",
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Selisih (%)": st.column_config.NumberColumn(format="%+.1f%%")},
+    )
+
+
+@st.fragment
+@timed("tab komposisi")
+def render_tab_komposisi(cube_f: Cube):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    # Semua metrik komposisi (jumlah, % per tahun, % total, Top 6 + LAINNYA)
+    # dihitung sekali dari matriks tahun x kategori milik cube
+    comp = cached_result(
+        "agg:composition", {**filter_params(), "top_k": 6}, lambda: composition(cube_f, top_k=6)
+    )
 
     # =========================
     # 1) TREEMAP (FULL WIDTH)
     # =========================
-    tree = (
-        df_f.groupby("kategori_kejahatan", as_index=False)["jumlah_narapidana"]
-        .sum()
-        .sort_values("jumlah_narapidana", ascending=False)
+    tree_hier = st.toggle(
+        "Treemap bertingkat (kategori → jenis kelamin → tahun)",
+        key="tree_hierarchical",
+    )
+    nodes = cached_result(
+        "agg:treemap",
+        {**filter_params(), "hierarchical": tree_hier},
+        lambda: treemap_nodes(cube_f, hierarchical=tree_hier),
     )
 
-    fig_tree = px.treemap(
-        tree,
-        path=["kategori_kejahatan"],
-        values="jumlah_narapidana",
+    fig_tree = go.Figure(
+        go.Treemap(
+            ids=nodes["ids"],
+            labels=nodes["labels"],
+            parents=nodes["parents"],
+            values=nodes["values"],
+            branchvalues="total",
+        )
     )
 
     # (opsional) hover lebih jelas
     fig_tree.update_traces(
-        hovertemplate="<b>%{label}</b><br>Jumlah: %{value:,}<extra></extra>"
+        hovertemplate="<b>%{label}</b><br>Jumlah: %{value:,}<br>%{percentRoot:.1%} dari total<extra></extra>"
     )
 
     # ✅ apply theme dulu
@@ -1693,38 +1453,27 @@ with tab3:
         ),
     )
 
-    st.plotly_chart(fig_tree, use_container_width=True, config=PLOT_CONFIG)
+    def on_tree(point):
+        # id node: "KATEGORI" / "KATEGORI/GENDER" / "KATEGORI/GENDER/TAHUN";
+        # nama kategori bisa memuat "/", jadi tingkat dibaca dari label & parent
+        label, parent = point.get("label"), point.get("parent") or ""
+        if not parent:
+            drill_to(label, crime=[label])
+        elif parent in cube.categories:
+            drill_to(f"{parent} · {label}", crime=[parent], gender=[label])
+        else:
+            crime, gender = parent.rsplit("/", 1)
+            drill_to(f"{crime} · {gender} · {label}", crime=[crime], gender=[gender], year=[int(label)])
+
+    drill_chart(fig_tree, "treemap", on_tree)
 
     st.markdown("---")
 
     # =========================
     # 2) STRUKTUR KATEGORI PER TAHUN (%) (FULL WIDTH, RAPI)
+    # ✅ biar legend gak rame: Top 6 + LAINNYA (sudah dibucket di composition)
     # =========================
-    share_year = (
-        df_f.groupby(["tahun", "kategori_kejahatan"], as_index=False)["jumlah_narapidana"]
-        .sum()
-    )
-    share_year["total_tahun"] = share_year.groupby("tahun")["jumlah_narapidana"].transform("sum")
-    share_year["proporsi_pct"] = (share_year["jumlah_narapidana"] / share_year["total_tahun"]) * 100
-
-    # ✅ biar legend gak rame: Top 6 + LAINNYA
-    topN = (
-        df_f.groupby("kategori_kejahatan")["jumlah_narapidana"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(6)
-        .index
-    )
-    share_year["kategori_plot"] = share_year["kategori_kejahatan"].where(
-        share_year["kategori_kejahatan"].isin(topN),
-        "LAINNYA"
-    )
-
-    share_plot = (
-        share_year.groupby(["tahun", "kategori_plot"], as_index=False)["proporsi_pct"]
-        .sum()
-        .sort_values(["tahun", "proporsi_pct"], ascending=[True, False])
-    )
+    share_plot = share_frame(comp)
 
     fig_comp = px.bar(
         share_plot,
@@ -1750,116 +1499,296 @@ with tab3:
     st.plotly_chart(fig_comp, use_container_width=True, config=PLOT_CONFIG)
 
 
+
+
 # TABEL DATA + EXPORT
 # Menyediakan tabel rekap dan opsi unduh CSV/Excel
+# Dibungkus st.fragment: pencarian & export hanya merender ulang bagian ini
+@st.fragment
+@timed("rekap")
+def render_rekap_section(df_f: pd.DataFrame):
+
+    st.subheader("Data Narapidana (Rekap)", anchor=False)
+    st.caption(
+        "Tabel ini menampilkan rekap jumlah narapidana per kategori kejahatan, "
+        "jenis kelamin, dan periode (bulan-tahun)."
+    )
 
+    # Input pencarian kategori
+    q = st.text_input("Cari kategori kejahatan (opsional)", "", key="rekap_search")
 
-st.subheader("Data Narapidana (Rekap)", anchor=False)
-st.caption(
-    "Tabel ini menampilkan rekap jumlah narapidana per kategori kejahatan, "
-    "jenis kelamin, dan periode (bulan-tahun)."
-)
+    # Kolom yang ditampilkan
+    cols = ["kategori_kejahatan", "jenis_kelamin", "jumlah_narapidana", "bulan", "tahun", "periode"]
+    if "nama_kabupaten_kota" in df_f.columns:
+        cols = ["nama_kabupaten_kota"] + cols
+
+    table = df_f[cols].copy()
 
-# Input pencarian kategori
-q = st.text_input("Cari kategori kejahatan (opsional)", "")
+    # Terapkan pencarian teks
+    if q.strip():
+        table = table[table["kategori_kejahatan"].str.contains(q, case=False, na=False)]
 
-# Kolom yang ditampilkan
-cols = ["kategori_kejahatan", "jenis_kelamin", "jumlah_narapidana", "bulan", "tahun", "periode"]
-if "nama_kabupaten_kota" in df_f.columns:
-    cols = ["nama_kabupaten_kota"] + cols
+    # Urutkan data
+    table = table.sort_values(
+        ["periode", "kategori_kejahatan", "jenis_kelamin"],
+        ascending=[False, True, True]
+    )
 
-table = df_f[cols].copy()
+    # Tampilkan tabel
+    # =========================
+    # MENU KOLOM TABEL REKAP
+    # =========================
 
-# Terapkan pencarian teks
-if q.strip():
-    table = table[table["kategori_kejahatan"].str.contains(q, case=False, na=False)]
+    display_table = table.drop(columns=["periode"])
 
-# Urutkan data
-table = table.sort_values(
-    ["periode", "kategori_kejahatan", "jenis_kelamin"],
-    ascending=[False, True, True]
-)
+    st.write(f"Total baris: **{len(display_table):,}**")
 
-# Tampilkan tabel
-# =========================
-# MENU KOLOM TABEL REKAP
-# =========================
+    all_columns = display_table.columns.tolist()
 
-display_table = table.drop(columns=["periode"])
+    if "selected_table_columns" not in st.session_state:
+        st.session_state.selected_table_columns = all_columns
 
-st.write(f"Total baris: **{len(display_table):,}**")
+    # with st.popover("👁️ Pilih Kolom Tabel"):
+    #     st.markdown("**Tampilkan kolom:**")
 
-all_columns = display_table.columns.tolist()
+    #     select_all = st.checkbox(
+    #         "Pilih semua kolom",
+    #         value=len(st.session_state.selected_table_columns) == len(all_columns)
+    #     )
 
-if "selected_table_columns" not in st.session_state:
-    st.session_state.selected_table_columns = all_columns
+    #     if select_all:
+    #         st.session_state.selected_table_columns = all_columns
 
-# with st.popover("👁️ Pilih Kolom Tabel"):
-#     st.markdown("**Tampilkan kolom:**")
+    #     selected_columns = st.multiselect(
+    #         "Kolom yang ditampilkan",
+    #         options=all_columns,
+    #         default=st.session_state.selected_table_columns,
+    #         label_visibility="collapsed"
+    #     )
 
-#     select_all = st.checkbox(
-#         "Pilih semua kolom",
-#         value=len(st.session_state.selected_table_columns) == len(all_columns)
-#     )
+    #     if selected_columns:
+    #         st.session_state.selected_table_columns = selected_columns
+    #     else:
+    #         st.warning("Minimal pilih satu kolom.")
 
-#     if select_all:
-#         st.session_state.selected_table_columns = all_columns
+    # Tampilkan tabel berdasarkan kolom yang dipilih
+    st.dataframe(
+        display_table[st.session_state.selected_table_columns],
+        use_container_width=True,
+        height=360
+    )
 
-#     selected_columns = st.multiselect(
-#         "Kolom yang ditampilkan",
-#         options=all_columns,
-#         default=st.session_state.selected_table_columns,
-#         label_visibility="collapsed"
-#     )
+    # ---------------------------------------------------------
+    # EXPORT DATA
+    # Semua file dibuat saat tombol diklik (callable), bukan tiap rerun.
+    # CSV ditulis per potongan dari kolom Arrow ke file sementara di disk lalu
+    # diserahkan sebagai bytes; gzip opsional untuk data besar
+    # ---------------------------------------------------------
+    export_table = table.drop(columns=["periode"])
+
+    x1, x2, x4, x5, x3 = st.columns([1.2, 1.2, 1.2, 1.2, 3.2], vertical_alignment="center")
+    with x3:
+        gzip_csv = st.checkbox("Kompres CSV (gzip)", key="export_gzip")
+    with x1:
+        st.download_button(
+            "⬇️ Export CSV",
+            data=lambda: csv_bytes(export_table, compress=gzip_csv),
+            file_name="dashboard_lapas_cirebon_filtered.csv" + (".gz" if gzip_csv else ""),
+            mime=GZIP_MIME if gzip_csv else CSV_MIME,
+            use_container_width=True
+        )
+    with x2:
+        st.download_button(
+            "⬇️ Export Excel",
+            data=lambda: xlsx_bytes(
+                export_table, summary=KPI.as_dict(st.session_state.get("capacity", DEFAULT_CAPACITY))
+            ),
+            file_name="dashboard_lapas_cirebon_filtered.xlsx",
+            mime=XLSX_MIME,
+            use_container_width=True
+        )
+    # Format bertipe untuk analis: kategori dictionary-encoded, periode = date,
+    # tahun = integer (tidak perlu parsing ulang seperti CSV/Excel)
+    with x4:
+        st.download_button(
+            "⬇️ Parquet",
+            data=lambda: parquet_bytes(table),
+            file_name="dashboard_lapas_cirebon_filtered.parquet",
+            mime=PARQUET_MIME,
+            use_container_width=True
+        )
+    with x5:
+        st.download_button(
+            "⬇️ Arrow",
+            data=lambda: arrow_bytes(table),
+            file_name="dashboard_lapas_cirebon_filtered.arrow",
+            mime=ARROW_MIME,
+            use_container_width=True
+        )
 
-#     if selected_columns:
-#         st.session_state.selected_table_columns = selected_columns
-#     else:
-#         st.warning("Minimal pilih satu kolom.")
 
-# Tampilkan tabel berdasarkan kolom yang dipilih
-st.dataframe(
-    display_table[st.session_state.selected_table_columns],
-    use_container_width=True,
-    height=360
+# =========================================================
+# ISI SLOT
+# Mode progresif: tab yang terlihat lebih dulu (Grafik Utama), lalu tabel
+# rekap, baru tab lain yang tersembunyi di balik header tab
+# =========================================================
+SECTION_RENDERERS = {
+    "grafik utama": lambda: render_tab_grafik_utama(df_f, cube_f),
+    "analisis lanjutan": lambda: render_tab_analisis_lanjutan(cube_f),
+    "komposisi": lambda: render_tab_komposisi(cube_f),
+    "perbandingan": render_tab_perbandingan,
+    "rekap": lambda: render_rekap_section(df_f),
+}
+FILL_ORDER = (
+    ["grafik utama", "rekap", "analisis lanjutan", "komposisi", "perbandingan"]
+    if PROGRESSIVE else list(SECTION_RENDERERS)
 )
 
-# ---------------------------------------------------------
-# EXPORT DATA
-# ---------------------------------------------------------
-csv_bytes = table.drop(columns=["periode"]).to_csv(index=False).encode("utf-8")
+for name in FILL_ORDER:
+    with SLOTS[name].container():
+        SECTION_RENDERERS[name]()
+    paint_mark(name)
 
-xlsx_buffer = io.BytesIO()
-with pd.ExcelWriter(xlsx_buffer, engine="openpyxl") as writer:
-    table.drop(columns=["periode"]).to_excel(
-        writer, index=False, sheet_name="filtered"
-    )
 
-x1, x2, x3 = st.columns([1.2, 1.2, 6])
-with x1:
-    st.download_button(
-        "⬇️ Export CSV",
-        data=csv_bytes,
-        file_name="dashboard_lapas_cirebon_filtered.csv",
-        mime="text/csv",
-        use_container_width=True
-    )
-with x2:
-    st.download_button(
-        "⬇️ Export Excel",
-        data=xlsx_buffer.getvalue(),
-        file_name="dashboard_lapas_cirebon_filtered.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        use_container_width=True
-    )
+# =========================================================
+# RIWAYAT VERSI DATA ("APA YANG BERUBAH")
+# Setiap ingest menyimpan snapshot data bersih (snapshots.py); bagian ini
+# membandingkan dua versi baris demi baris. Diff disimpan untuk beberapa
+# pasangan versi terakhir saja (frame diff bisa sebesar datanya sendiri).
+# =========================================================
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def load_version_diff(old_version: str, new_version: str) -> pd.DataFrame | None:
+    """
+    Diff baris dua snapshot (None kalau salah satu snapshot sudah tidak ada).
+    """
+    old, new = read_snapshot(old_version, PREPARED_DIR), read_snapshot(new_version, PREPARED_DIR)
+    if old is None or new is None:
+        return None
+    return diff_frames(old, new)
+
+
+@st.fragment
+@timed("riwayat versi")
+def render_changes_section():
+    import plotly.express as px
+
+    with st.expander("🕘 Riwayat Versi Data & Perubahan", expanded=False):
+        index = load_index(PREPARED_DIR)
+        if len(index) < 2:
+            st.caption(
+                "Belum ada versi sebelumnya untuk dibandingkan. Snapshot disimpan "
+                "setiap kali workbook baru di-ingest."
+            )
+            return
+
+        versions = [e["data_version"] for e in reversed(index)]
+        labels = {
+            e["data_version"]: f"r{e.get('revision') or '-'} · {e['created_at'][:16].replace('T', ' ')} · "
+                               f"{e['source']} ({e['rows']:,} baris)"
+            for e in index
+        }
+        v1, v2 = st.columns(2)
+        with v1:
+            old = st.selectbox("Versi lama", versions, index=1, format_func=labels.get, key="diff_old")
+        with v2:
+            new = st.selectbox("Versi baru", versions, index=0, format_func=labels.get, key="diff_new")
+        if old == new:
+            st.info("Pilih dua versi yang berbeda.")
+            return
+
+        diff = load_version_diff(old, new)
+        if diff is None:
+            st.warning("Snapshot salah satu versi sudah tidak tersedia.")
+            return
+
+        status = diff["status"].value_counts()
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Baris baru", f"{int(status.get(STATUS_ADDED, 0)):,}")
+        m2.metric("Baris dihapus", f"{int(status.get(STATUS_REMOVED, 0)):,}")
+        m3.metric("Baris berubah", f"{int(status.get(STATUS_CHANGED, 0)):,}")
+        m4.metric("Selisih narapidana", f"{int(diff['selisih'].sum()):+,}")
+
+        if diff.empty:
+            st.caption("Isi data kedua versi sama.")
+            return
+        if new == DATA_VERSION and manifest["cube"].get("previous_version") == old and manifest["cube"].get("diff"):
+            cells = manifest["cube"]["diff"]["cells"]
+            st.caption(
+                f"{cells:,} dari {cube.values.size:,} sel agregat tersentuh; hasil cache "
+                "untuk filter di luar sel tersebut tetap dipakai."
+            )
+
+        per_period = period_changes(diff)
+        fig = px.bar(
+            per_period, x="periode", y="selisih", hover_data=["baris"],
+            labels={"periode": "Periode", "selisih": "Selisih jumlah", "baris": "Baris berubah"},
+        )
+        fig = apply_plot_theme(fig, height=280)
+        fig.update_layout(title=dict(text="Perubahan per Periode"))
+        st.plotly_chart(fig, use_container_width=True, config=PLOT_CONFIG)
+
+        st.dataframe(
+            diff.assign(periode=diff["periode"].dt.strftime("%Y-%m")),
+            use_container_width=True, hide_index=True, height=280,
+        )
+
+
+render_changes_section()
 
-st.markdown("</div>", unsafe_allow_html=True)
+
+# =========================================================
+# INTEGRITAS DATA
+# Hasil pemeriksaan saat ingest (kunci ganda, jumlah tidak valid, tahun
+# di luar rentang) beserta contoh baris workbook yang bermasalah
+# =========================================================
+def render_integrity_panel():
+    n = findings_count(INTEGRITY)
+    with st.expander(f"🧪 Integritas Data ({'lolos' if n == 0 else f'{n:,} temuan'})", expanded=False):
+        checks = pd.DataFrame({
+            "pemeriksaan": list(FINDING_LABELS.values()),
+            "temuan": [int(INTEGRITY.get(k, 0)) for k in FINDING_LABELS],
+        })
+        st.caption(
+            f"Kebijakan: **{INTEGRITY.get('policy', '-')}** (atur lewat LAPAS_INTEGRITY_POLICY: "
+            "keep_last / sum / reject). Baris kembar diselesaikan sesuai kebijakan; baris dengan "
+            "jumlah atau tahun tidak valid dibuang."
+        )
+        st.dataframe(checks, use_container_width=True, hide_index=True)
+        if INTEGRITY.get("examples"):
+            st.markdown("**Contoh baris bermasalah** (nomor baris sesuai workbook)")
+            st.dataframe(pd.DataFrame(INTEGRITY["examples"]), use_container_width=True, hide_index=True)
+
+
+render_integrity_panel()
 
 # Catatan kaki
-st.markdown(
-    "<div style='opacity:0.7; font-size:12px; margin-top:12px;'>"
-    "Catatan: Semua grafik mengikuti filter (Gender, Kejahatan, Tahun, Bulan). "
-    "Tingkat hunian dihitung dari total data (sesuai filter) dibanding kapasitas yang diisi di sidebar."
-    "</div>",
-    unsafe_allow_html=True
+html(
+    '<div class="footnote">'
+    "Catatan: Semua grafik mengikuti filter (Gender, Kejahatan, Tahun, Bulan, Rentang Periode). "
+    "Tingkat hunian dihitung dari total data periode terakhir (sesuai filter) dibanding kapasitas yang diisi di bagian KPI."
+    "</div>"
 )
+
+# =========================================================
+# AKUNTANSI MEMORI
+# Satu MemoryAccount per proses (juga diekspor ke /_stcore/metrics);
+# panel sidebar hanya untuk admin (LAPAS_ADMIN=1). Lihat memory.py.
+# =========================================================
+@st.cache_resource(show_spinner=False)
+def get_memory_account() -> MemoryAccount:
+    account = MemoryAccount()
+    register_metrics(account)
+    return account
+
+
+MEMORY = get_memory_account()
+if not UPLOAD:
+    MEMORY.track("data bersih (ingest)", lambda data=df: frame_bytes(data))
+    MEMORY.track("cube (ingest)", lambda c=cube: array_bytes(c.values, c.rows, c.revision))
+MEMORY.track("cache upload", lambda: UPLOADS.nbytes)
+
+# Catat durasi & payload HTML full rerun, lalu tampilkan panel di sidebar
+record("app (full)", (time.perf_counter() - RUN_STARTED) * 1000)
+finish_payload()
+render_perf_panel()
+render_memory_panel(MEMORY, {"upload": UPLOAD.nbytes if UPLOAD else 0})
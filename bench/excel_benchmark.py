@@ -0,0 +1,103 @@
+# =========================================================
+# BENCHMARK ENGINE PEMBACA EXCEL
+# Workbook bawaan diperbanyak (--scale kali, semua kolom asli) lalu di-parse
+# dengan tiap engine di ingest.read_workbook: calamine (kalau terpasang),
+# stream (openpyxl read-only) dan openpyxl (pandas, cara lama).
+#
+# Dilaporkan waktu parse terbaik dari --repeat kali dan kesetaraan hasil
+# terhadap openpyxl: data mentah (kolom yang dibaca) dan data bersih hasil
+# clean_frame + ringkasan temuannya harus identik. Exit code 1 kalau ada
+# engine yang hasilnya berbeda.
+#
+# Cara pakai (dari root repo):
+#   python bench/excel_benchmark.py
+#   python bench/excel_benchmark.py --scale 1,10,30 --repeat 3
+# =========================================================
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd  # noqa: E402
+
+from ingest import (  # noqa: E402
+    DEFAULT_FILE, ENGINE_CALAMINE, ENGINE_OPENPYXL, ENGINE_STREAM, clean_frame, read_workbook,
+)
+
+ENGINES = [ENGINE_CALAMINE, ENGINE_STREAM, ENGINE_OPENPYXL]
+
+
+def scaled_workbook(scale: int, out: Path) -> int:
+    """
+    Menulis workbook bawaan yang diulang `scale` kali ke out; mengembalikan jumlah baris.
+    """
+    from openpyxl import Workbook
+
+    base = pd.read_excel(DEFAULT_FILE, engine="openpyxl")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append(list(base.columns))
+    rows = [[None if pd.isna(v) else v for v in row] for row in base.itertuples(index=False)]
+    for _ in range(scale):
+        for row in rows:
+            ws.append(row)
+    wb.save(out)
+    return len(base) * scale
+
+
+def timed_read(path: Path, engine: str, repeat: int) -> tuple[float, pd.DataFrame]:
+    best, df = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = read_workbook(path, engine)
+        best = min(best, time.perf_counter() - t0)
+    return best, df
+
+
+def parity(df: pd.DataFrame, ref: pd.DataFrame, ref_clean: tuple) -> str:
+    """
+    "ok" kalau data mentah & hasil clean_frame sama dengan openpyxl.
+    """
+    try:
+        pd.testing.assert_frame_equal(df, ref)
+        clean, stats = clean_frame(df)
+        pd.testing.assert_frame_equal(clean, ref_clean[0])
+    except AssertionError as e:
+        return "BEDA: " + str(e).splitlines()[0]
+    return "ok" if stats == ref_clean[1] else "BEDA: ringkasan temuan"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark engine pembaca Excel untuk ingest")
+    parser.add_argument("--scale", default="1,10", help="kelipatan workbook bawaan, dipisah koma")
+    parser.add_argument("--repeat", type=int, default=3, help="jumlah pengulangan per engine (diambil tercepat)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'baris':>9} {'engine':<9} {'detik':>7} {'x openpyxl':>10}  kesetaraan")
+    for scale in [int(s) for s in args.scale.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"narapidana_x{scale}.xlsx"
+            rows = scaled_workbook(scale, path)
+            ref_time, ref = timed_read(path, ENGINE_OPENPYXL, args.repeat)
+            ref_clean = clean_frame(ref)
+            for engine in ENGINES:
+                if engine == ENGINE_OPENPYXL:
+                    seconds, result = ref_time, "acuan"
+                else:
+                    seconds, df = timed_read(path, engine, args.repeat)
+                    if df.attrs["excel_engine"] != engine:
+                        print(f"{rows:>9,} {engine:<9} {'-':>7} {'-':>10}  tidak tersedia (jatuh ke {df.attrs['excel_engine']})")
+                        continue
+                    result = parity(df, ref, ref_clean)
+                    failed |= result != "ok"
+                print(f"{rows:>9,} {engine:<9} {seconds:>7.2f} {ref_time / seconds:>9.1f}x  {result}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
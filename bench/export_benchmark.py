@@ -0,0 +1,191 @@
+# =========================================================
+# BENCHMARK EXPORT CSV: MEMORI PUNCAK & WAKTU
+# Membandingkan cara lama (df.to_csv() -> str -> .encode() bytes) dengan
+# jalur tombol "Export CSV" dashboard: export.csv_bytes (CSV bertahap dari
+# Arrow ke file sementara, lalu bytes), dengan & tanpa gzip. Hasil tiap metode
+# dilewatkan ke konversi data st.download_button yang sama dengan dashboard,
+# jadi salinan yang dipegang Streamlit ikut terukur.
+#
+# Data bersih diperbanyak (diulang) sampai --rows baris untuk meniru data
+# tingkat provinsi. Setiap metode dijalankan di proses terpisah; RSS proses
+# di-sampling selama export, yang dilaporkan = kenaikan RSS puncak di atas
+# RSS sebelum export dimulai.
+#
+# Mode --formats membandingkan ukuran file, waktu tulis & waktu baca ulang
+# (pandas) untuk CSV, CSV gzip, XLSX, Parquet dan Arrow IPC.
+#
+# Cara pakai (dari root repo):
+#   python bench/export_benchmark.py
+#   python bench/export_benchmark.py --rows 500000,2000000,5000000
+#   python bench/export_benchmark.py --formats --rows 100000
+# =========================================================
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+METHODS = ["pandas", "dashboard", "dashboard-gzip"]
+
+# Batas baris satu sheet Excel (termasuk header)
+XLSX_MAX_ROWS = 1_048_575
+
+
+def current_rss() -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class PeakSampler:
+    """
+    Thread yang mencatat RSS tertinggi selama blok `with` berjalan.
+    """
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def sample_frame(rows: int, with_period: bool = False):
+    """
+    Data bersih (kolom export) yang diulang sampai `rows` baris.
+    """
+    import numpy as np
+
+    from export import export_frame
+    from ingest import DEFAULT_FILE, ensure_prepared, read_clean
+
+    clean = read_clean(ensure_prepared(DEFAULT_FILE))
+    base = export_frame(clean)
+    if with_period:
+        base = base.assign(periode=clean["periode"])
+    return base.iloc[np.resize(np.arange(len(base)), rows)].reset_index(drop=True)
+
+
+def child(method: str, rows: int) -> dict:
+    """
+    Dijalankan di proses anak: siapkan data, ukur satu metode export.
+    """
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    from export import csv_bytes
+
+    df = sample_frame(rows)
+
+    before = current_rss()
+    t0 = time.perf_counter()
+    with PeakSampler() as sampler:
+        if method == "pandas":
+            data = df.to_csv(index=False).encode("utf-8")
+        else:
+            data = csv_bytes(df, compress=method == "dashboard-gzip")
+        data, _ = convert_data_to_bytes_and_infer_mime(data, TypeError(type(data)))
+        size = len(data)
+        del data
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "method": method,
+        "rows": rows,
+        "bytes": size,
+        "seconds": elapsed,
+        "peak_delta_mb": (sampler.peak - before) / 1024 / 1024,
+    }
+
+
+def compare_formats(rows: int) -> None:
+    """
+    Ukuran, waktu tulis & waktu baca ulang (pandas) per format export.
+    """
+    import io
+
+    import pandas as pd
+
+    from export import arrow_bytes, csv_bytes, parquet_bytes, xlsx_bytes
+
+    df = sample_frame(rows, with_period=True)
+
+    formats = [
+        ("csv", lambda: csv_bytes(df.drop(columns=["periode"])), pd.read_csv),
+        ("csv.gz", lambda: csv_bytes(df.drop(columns=["periode"]), compress=True),
+         lambda f: pd.read_csv(f, compression="gzip")),
+        ("xlsx", lambda: xlsx_bytes(df.drop(columns=["periode"])), pd.read_excel),
+        ("parquet", lambda: parquet_bytes(df), pd.read_parquet),
+        ("arrow", lambda: arrow_bytes(df), pd.read_feather),
+    ]
+
+    print(f"\nFORMAT EXPORT ({rows:,} baris)")
+    print(f"  {'format':<9} {'ukuran MB':>10} {'tulis s':>8} {'baca s':>8}  tipe hasil baca (tahun / periode)")
+    for name, write, read in formats:
+        if name == "xlsx" and rows > XLSX_MAX_ROWS:
+            print(f"  {name:<9} {'-':>10} {'-':>8} {'-':>8}  melebihi batas baris Excel")
+            continue
+        t0 = time.perf_counter()
+        data = write()
+        t_write = time.perf_counter() - t0
+        size = len(data)
+        f = io.BytesIO(data)
+        t0 = time.perf_counter()
+        back = read(f)
+        t_read = time.perf_counter() - t0
+        kinds = f"{back['tahun'].dtype} / {back['periode'].dtype if 'periode' in back else '-'}"
+        print(f"  {name:<9} {size / 1024 / 1024:>10.2f} {t_write:>8.2f} {t_read:>8.2f}  {kinds}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark memori puncak export CSV")
+    parser.add_argument("--rows", default="200000,1000000,3000000", help="daftar jumlah baris, dipisah koma")
+    parser.add_argument("--formats", action="store_true", help="bandingkan format CSV/XLSX/Parquet/Arrow")
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child(args.child[0], int(args.child[1]))))
+        return 0
+    if args.formats:
+        for rows in [int(r) for r in args.rows.split(",")]:
+            compare_formats(rows)
+        return 0
+
+    print(f"{'baris':>10} {'metode':<12} {'ukuran MB':>10} {'detik':>8} {'+RSS puncak MB':>15}")
+    for rows in [int(r) for r in args.rows.split(",")]:
+        for method in METHODS:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", method, str(rows)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            )
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{r['rows']:>10,} {r['method']:<12} {r['bytes'] / 1024 / 1024:>10.1f} "
+                f"{r['seconds']:>8.2f} {r['peak_delta_mb']:>15.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# =========================================================
+# LOAD TEST DASHBOARD (STREAMLIT APPTEST)
+# Mensimulasikan N sesi bersamaan yang mengganti filter gender / kejahatan /
+# tahun (multi-select) / bulan / rentang periode, kapasitas lapas, dan kotak pencarian rekap, lalu melaporkan
+# latensi rerun (p50/p95/p99), throughput, dan RSS proses saat N bertambah.
+#
+# Setiap sesi = satu objek AppTest yang menjalankan app.py di proses ini,
+# sehingga semua sesi berbagi cache, GIL, dan memori seperti pada satu
+# server Streamlit sungguhan. Catatan: AppTest selalu menjalankan ulang
+# seluruh script (rerun fragment tidak disimulasikan), jadi angka ini
+# adalah batas atas biaya per interaksi.
+#
+# Cara pakai (dari root repo):
+#   python bench/loadtest.py --sessions 1,2,4,8 --iterations 20
+#   python bench/loadtest.py --sessions 4 --iterations 50 --json hasil.json
+# =========================================================
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_FILE = ROOT / "app.py"
+sys.path.insert(0, str(ROOT))
+
+from ingest import MONTH_ORDER  # noqa: E402
+SEARCH_TERMS = ["", "narko", "pencurian", "anak", "korupsi", "pen"]
+
+
+def rss_bytes() -> int:
+    """
+    RSS proses saat ini (psutil kalau ada, fallback ke /proc atau getrusage).
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss = puncak (KB di Linux), bukan RSS saat ini
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def period_value(display: str) -> str:
+    """
+    "Jan 2022" -> "2022-01" (kebalikan format_period di app.py).
+    """
+    month, year = display.split()
+    abbrevs = [m.title()[:3] for m in MONTH_ORDER]
+    return f"{year}-{abbrevs.index(month) + 1:02d}"
+
+
+def random_action(at: AppTest, rng: random.Random) -> str:
+    """
+    Menerapkan satu interaksi acak ke sesi (belum menjalankan rerun).
+    """
+    action = rng.choice(["gender", "crime", "year", "month", "period", "capacity", "search"])
+    if action in ("capacity", "search") and not at.text_input:
+        # Kombinasi filter kosong: dashboard berhenti sebelum KPI/rekap, jadi reset dulu
+        next(b for b in at.button if b.label == "Reset Filter").click()
+        return "reset"
+    if action == "capacity":
+        at.number_input(key="capacity").set_value(rng.randrange(500, 3000, 50))
+    elif action == "search":
+        at.text_input(key="rekap_search").set_value(rng.choice(SEARCH_TERMS))
+    elif action == "month":
+        box = at.selectbox(key="filter_month")
+        box.set_value(rng.choice(box.options))
+    elif action == "period":
+        # Opsi slider berupa label tampilan ("Jan 2022"); set_value butuh nilai asli ("2022-01")
+        slider = at.select_slider(key="filter_period")
+        start, end = sorted(rng.sample(range(len(slider.options)), 2))
+        slider.set_value((period_value(slider.options[start]), period_value(slider.options[end])))
+    else:
+        # Multi-select: 0 (= semua) sampai 3 nilai acak
+        box = at.multiselect(key=f"filter_{action}")
+        options = [int(o) for o in box.options] if action == "year" else list(box.options)
+        box.set_value(rng.sample(options, rng.randint(0, min(3, len(options)))))
+    return action
+
+
+def run_session(seed: int, iterations: int, latencies: list, errors: list, timeout: float) -> None:
+    rng = random.Random(seed)
+    at = AppTest.from_file(str(APP_FILE), default_timeout=timeout)
+    at.run()
+    for _ in range(iterations):
+        action = random_action(at, rng)
+        t0 = time.perf_counter()
+        at.run()
+        latencies.append((action, time.perf_counter() - t0))
+        if at.exception:
+            errors.append(f"{action}: {at.exception[0].value}")
+            at = AppTest.from_file(str(APP_FILE), default_timeout=timeout)
+            at.run()
+
+
+def run_level(n_sessions: int, iterations: int, seed: int, timeout: float) -> dict:
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=run_session, args=(seed + i, iterations, latencies, errors, timeout))
+        for i in range(n_sessions)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    lat_ms = np.array([s for _, s in latencies]) * 1000
+    by_action = {}
+    for action, s in latencies:
+        by_action.setdefault(action, []).append(s * 1000)
+
+    return {
+        "sessions": n_sessions,
+        "reruns": len(lat_ms),
+        "errors": errors,
+        "p50_ms": float(np.percentile(lat_ms, 50)) if len(lat_ms) else None,
+        "p95_ms": float(np.percentile(lat_ms, 95)) if len(lat_ms) else None,
+        "p99_ms": float(np.percentile(lat_ms, 99)) if len(lat_ms) else None,
+        "throughput_rps": len(lat_ms) / wall if wall else 0.0,
+        "rss_mb": rss_bytes() / 1024 / 1024,
+        "p50_by_action_ms": {a: float(np.median(v)) for a, v in sorted(by_action.items())},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test dashboard via Streamlit AppTest")
+    parser.add_argument("--sessions", default="1,2,4,8", help="daftar N sesi, dipisah koma")
+    parser.add_argument("--iterations", type=int, default=20, help="interaksi per sesi")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="batas waktu satu rerun (detik)")
+    parser.add_argument("--json", help="simpan hasil mentah ke file JSON")
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+    results = []
+
+    print(f"{'N':>4} {'rerun':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rerun/s':>8} {'RSS MB':>8} {'error':>6}")
+    for n in levels:
+        r = run_level(n, args.iterations, args.seed, args.timeout)
+        results.append(r)
+        print(
+            f"{r['sessions']:>4} {r['reruns']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+            f"{r['p99_ms']:>9.1f} {r['throughput_rps']:>8.2f} {r['rss_mb']:>8.1f} {len(r['errors']):>6}"
+        )
+        for err in r["errors"][:3]:
+            print(f"       ! {err}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
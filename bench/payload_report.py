@@ -0,0 +1,61 @@
+# =========================================================
+# LAPORAN UKURAN PAYLOAD PER RERUN
+# Menjalankan app.py lewat AppTest lalu menjumlahkan ukuran protobuf
+# tiap elemen (byte yang dikirim server ke browser) per jenis elemen,
+# ditambah total HTML mentah yang dicatat instrumentasi dashboard.
+#
+# Cara pakai (dari root repo):
+#   python bench/payload_report.py
+#   python bench/payload_report.py --reruns 3
+# =========================================================
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def element_bytes(node, out: Counter) -> Counter:
+    """
+    Menelusuri pohon elemen AppTest dan menjumlahkan ByteSize() protobuf
+    elemen daun per jenis (markdown, plotly_chart, dataframe, ...).
+    """
+    children = getattr(node, "children", None)
+    if isinstance(children, dict) and children:
+        for child in children.values():
+            element_bytes(child, out)
+        return out
+    proto = getattr(node, "proto", None)
+    if proto is not None:
+        out[node.type] += proto.ByteSize()
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ukuran payload elemen per rerun dashboard")
+    parser.add_argument("--reruns", type=int, default=1, help="jumlah rerun setelah run pertama")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(ROOT))
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120)
+    at.run()
+    for _ in range(args.reruns):
+        at.run()
+
+    sizes = element_bytes(at._tree, Counter())
+    total = sum(sizes.values())
+    print(f"PAYLOAD ELEMEN PER RERUN: {total:,} byte")
+    for kind, n in sizes.most_common():
+        print(f"  {kind:<20} {n:>10,} byte  {n / total * 100:5.1f}%")
+
+    html_bytes = at.session_state["_payload_last"] if "_payload_last" in at.session_state else None
+    if html_bytes is not None:
+        print(f"\nHTML mentah (st.markdown unsafe) per full rerun: {html_bytes:,} byte")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# =========================================================
+# LAPORAN WAKTU STARTUP DASHBOARD
+# 1) Waktu import modul (python -X importtime) untuk modul yang dimuat
+#    saat startup vs modul yang ditunda (lazy import, mis. plotly),
+#    diurutkan dari kontributor terbesar.
+# 2) Rincian fase cold run app.py (AppTest) dari instrumentasi dashboard:
+#    startup: manifest, startup: muat data, kpi, tab..., app (full).
+# 3) Urutan tampil (render progresif): kapan header + KPI (first meaningful
+#    paint) dan tiap slot grafik/rekap selesai dikirim, cold run & rerun hangat.
+#
+# Cara pakai (dari root repo):
+#   python bench/startup_report.py
+#   python bench/startup_report.py --top 20
+# =========================================================
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modul yang dimuat sebelum layar pertama (urutan import app.py)
+STARTUP_IMPORTS = ["streamlit", "pandas", "instrumentation", "ingest", "cache_store", "engine"]
+
+# Modul yang sengaja ditunda sampai grafik pertama dibuat
+DEFERRED_IMPORTS = ["plotly.express", "plotly.graph_objects"]
+
+
+def import_times(modules: list[str], preload: list[str] | None = None) -> list[tuple[str, int, int]]:
+    """
+    Menjalankan interpreter baru dengan -X importtime dan mengembalikan
+    (modul, self_us, cumulative_us) untuk modul tingkat teratas.
+    Modul di preload diimpor dulu (tidak ikut dihitung).
+    """
+    code = "".join(f"import {m};" for m in (preload or [])) + "import sys; sys.stderr.write('--mulai--\\n');"
+    code += "".join(f"import {m};" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    lines = proc.stderr.split("--mulai--\n", 1)[-1].splitlines()
+
+    out = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # baris judul kolom
+        # Modul tingkat teratas hanya diawali satu spasi; submodul lebih menjorok
+        if parts[2].startswith("  "):
+            continue
+        out.append((parts[2].strip(), self_us, cum_us))
+    return sorted(out, key=lambda r: r[2], reverse=True)
+
+
+def print_imports(title: str, rows, top: int) -> None:
+    total = sum(r[2] for r in rows)
+    print(f"\n{title}  (total {total / 1000:.1f} ms)")
+    print(f"  {'modul':<40} {'kumulatif ms':>13} {'self ms':>9}")
+    for name, self_us, cum_us in rows[:top]:
+        print(f"  {name:<40} {cum_us / 1000:>13.1f} {self_us / 1000:>9.1f}")
+
+
+def app_phases() -> tuple[float, list[dict], list[dict], list[dict]]:
+    """
+    Cold run app.py lewat AppTest dan ambil catatan fase dari instrumentasi,
+    plus urutan tampil cold run & satu rerun hangat.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120)
+    t0 = time.perf_counter()
+    at.run()
+    wall = (time.perf_counter() - t0) * 1000
+    log = list(at.session_state["_perf_log"]) if "_perf_log" in at.session_state else []
+    cold_marks = list(at.session_state["_paint_marks"]) if "_paint_marks" in at.session_state else []
+    at.run()
+    warm_marks = list(at.session_state["_paint_marks"]) if "_paint_marks" in at.session_state else []
+    return wall, log, cold_marks, warm_marks
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Laporan waktu startup dashboard")
+    parser.add_argument("--top", type=int, default=12, help="jumlah kontributor teratas")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(ROOT))
+
+    startup = import_times(STARTUP_IMPORTS)
+    print_imports("IMPORT SAAT STARTUP", startup, args.top)
+
+    deferred = import_times(DEFERRED_IMPORTS, preload=STARTUP_IMPORTS)
+    print_imports("IMPORT DITUNDA (LAZY, dimuat saat grafik pertama)", deferred, args.top)
+
+    wall, log, cold_marks, warm_marks = app_phases()
+    print(f"\nCOLD RUN app.py (AppTest): {wall:.1f} ms")
+    for rec in sorted(log, key=lambda r: r["ms"], reverse=True):
+        print(f"  {rec['bagian']:<40} {rec['ms']:>10.1f} ms")
+
+    print("\nURUTAN TAMPIL (ms sejak awal rerun; kpi = first meaningful paint)")
+    print(f"  {'bagian':<24} {'cold':>10} {'hangat':>10}")
+    warm = {m["bagian"]: m["ms"] for m in warm_marks}
+    for mark in cold_marks:
+        print(f"  {mark['bagian']:<24} {mark['ms']:>10.1f} {warm.get(mark['bagian'], float('nan')):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
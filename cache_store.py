@@ -0,0 +1,438 @@
+# =========================================================
+# RESULT CACHE LINTAS PROSES / LINTAS REPLIKA
+# st.cache_data hanya hidup di memori satu proses, sehingga setiap replika
+# dan setiap restart menghitung ulang agregat & grafik yang sama.
+#
+# Modul ini menyediakan cache hasil yang bisa dipasang (pluggable):
+# - SQLiteBackend : file lokal, dipakai bersama oleh semua replika di satu host
+# - RedisBackend  : server ber-protokol Redis (opsional, butuh paket `redis`)
+# - NullBackend   : cache dimatikan
+#
+# Kunci entri = versi kode + jenis hasil + versi data + state filter (JSON
+# kanonik), dengan TTL dan batas ukuran (eviction LRU) supaya tidak tumbuh
+# tanpa batas. Versi kode membuat hasil build lama (kode agregat / grafik
+# berbeda) tidak terpakai lagi setelah deploy, walau cache-nya persisten.
+#
+# Konfigurasi lewat environment variable:
+#   LAPAS_CACHE_BACKEND  = sqlite (default) | redis | none
+#   LAPAS_CACHE_PATH     = path file SQLite (default data/prepared/result_cache.sqlite)
+#   LAPAS_CACHE_TTL      = TTL default dalam detik (default 86400)
+#   LAPAS_CACHE_MAX_MB   = batas ukuran cache SQLite dalam MB (default 256)
+#   LAPAS_REDIS_URL      = mis. redis://localhost:6379/0
+#   LAPAS_CACHE_CODE_VERSION = versi kode di kunci (default hash sumber modul
+#                          yang menghasilkan nilai cache, lihat CODE_FILES)
+#   LAPAS_CACHE_SECRET   = kunci HMAC untuk menandatangani nilai cache
+#
+# Nilai disimpan sebagai pickle yang ditandatangani HMAC-SHA256 (atas kunci
+# entri + isi). Blob tanpa tanda tangan yang sah dianggap miss dan tidak pernah
+# di-unpickle, jadi pihak lain yang bisa menulis ke Redis / file cache tidak
+# bisa menjalankan kode lewat pickle. Tanpa LAPAS_CACHE_SECRET, backend SQLite
+# memakai kunci acak di samping file cache (dibagi semua proses di host itu);
+# backend lain memakai kunci acak per proses (cache tidak dibagi antar replika).
+# =========================================================
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_CACHE_PATH = BASE_DIR / "data" / "prepared" / "result_cache.sqlite"
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Naikkan kalau format nilai / kunci cache berubah tanpa perubahan CODE_FILES
+CACHE_SCHEMA_VERSION = 3
+
+# Modul yang menghitung / membentuk nilai yang di-cache (agregat, KPI, grafik)
+CODE_FILES = ("engine.py", "app.py", "api.py", "cache_store.py")
+
+# SQLite: accessed_at (urutan LRU) ditulis ulang paling sering tiap sekian
+# detik per entri, supaya hit cache tidak selalu menjadi operasi tulis
+ACCESS_RESOLUTION = 60.0
+
+# SQLite: entri kedaluwarsa dibersihkan paling sering tiap sekian detik
+PURGE_INTERVAL = 60.0
+
+
+def _code_version() -> str:
+    override = os.environ.get("LAPAS_CACHE_CODE_VERSION", "").strip()
+    if override:
+        return f"{CACHE_SCHEMA_VERSION}-{override}"
+    digest = hashlib.sha1()
+    for name in CODE_FILES:
+        path = BASE_DIR / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    return f"{CACHE_SCHEMA_VERSION}-{digest.hexdigest()[:10]}"
+
+
+CODE_VERSION = _code_version()
+
+# Penanda "tidak ada di cache" (beda dengan nilai None yang sah)
+MISSING = object()
+
+SIGNATURE_BYTES = hashlib.sha256().digest_size
+
+
+def file_secret(path: Path) -> bytes:
+    """
+    Kunci HMAC acak yang disimpan di file (mode 0600). Dibuat sekali oleh
+    proses pertama; proses lain yang berlomba membaca file yang sama.
+    """
+    path = Path(path)
+    try:
+        return bytes.fromhex(path.read_text(encoding="ascii").strip())
+    except FileNotFoundError:
+        pass
+    secret = os.urandom(32)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{secret[:6].hex()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as fh:
+        fh.write(secret.hex())
+    try:
+        # link() gagal kalau file sudah ada: pemenang lomba yang dipakai semua proses
+        os.link(tmp, path)
+    except FileExistsError:
+        secret = bytes.fromhex(path.read_text(encoding="ascii").strip())
+    finally:
+        tmp.unlink()
+    return secret
+
+
+def make_key(kind: str, data_version: str, params: dict | None = None) -> str:
+    """
+    Kunci cache deterministik. params di-serialisasi sebagai JSON kanonik
+    (kunci diurutkan) sehingga urutan argumen tidak memengaruhi kunci.
+    Diawali CODE_VERSION agar hasil dari build lain tidak terpakai.
+    """
+    payload = json.dumps(params or {}, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+    return f"{CODE_VERSION}:{kind}:{data_version}:{digest}"
+
+
+# =========================================================
+# BACKEND
+# =========================================================
+class NullBackend:
+    """Backend kosong: selalu miss, tidak menyimpan apa pun."""
+
+    name = "none"
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, blob: bytes, ttl: float) -> None:
+        pass
+
+    def delete(self, keys) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "entries": 0, "bytes": 0}
+
+
+class SQLiteBackend:
+    """
+    Cache di file SQLite (mode WAL agar aman dibaca/ditulis banyak proses).
+    Entri kedaluwarsa dibuang saat dibaca / saat eviction; kalau total ukuran
+    melewati max_bytes, entri yang paling lama tidak diakses dibuang lebih dulu.
+
+    Total ukuran dijaga trigger di tabel cache_size (tanpa SUM per tulis), dan
+    accessed_at hanya diperbarui kalau sudah lebih lama dari ACCESS_RESOLUTION.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._purged_at = 0.0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_expires ON entries(expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0)")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN"
+                " UPDATE cache_size SET total = total + new.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN"
+                " UPDATE cache_size SET total = total - old.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN"
+                " UPDATE cache_size SET total = total - old.size + new.size WHERE id = 0; END"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # Satu koneksi per thread (Streamlit menjalankan tiap sesi di thread sendiri)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        if now - row[2] >= ACCESS_RESOLUTION:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, blob: bytes, ttl: float) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        # Upsert (bukan INSERT OR REPLACE) supaya trigger ukuran ikut berjalan
+        conn.execute(
+            "INSERT INTO entries (key, value, size, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+            " expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+            (key, sqlite3.Binary(blob), len(blob), now + ttl, now),
+        )
+        self._evict(conn, now)
+
+    def _total(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        total = self._total(conn)
+        if total > self.max_bytes or now - self._purged_at >= PURGE_INTERVAL:
+            self._purged_at = now
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            total = self._total(conn)
+        if total <= self.max_bytes:
+            return
+
+        # Buang entri LRU sampai total ukuran kembali di bawah batas
+        excess = total - self.max_bytes
+        doomed, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def delete(self, keys) -> int:
+        keys = [(k,) for k in keys]
+        if not keys:
+            return 0
+        conn = self._conn()
+        before = conn.total_changes
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        return conn.total_changes - before
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        n = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = self._total(conn)
+        return {
+            "backend": self.name,
+            "path": str(self.path),
+            "entries": int(n),
+            "bytes": int(size),
+            "max_bytes": self.max_bytes,
+        }
+
+
+class RedisBackend:
+    """
+    Cache di server ber-protokol Redis (Redis, Valkey, KeyDB, ...).
+    TTL memakai expiry bawaan server; eviction ukuran diserahkan ke
+    kebijakan maxmemory server (disarankan allkeys-lru).
+
+    client: objek kompatibel redis-py (opsional) — berguna untuk menguji
+    dengan stand-in lokal seperti fakeredis tanpa server sungguhan.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "lapas:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "Backend redis butuh paket 'redis' (pip install redis)"
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, blob: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, blob, px=max(int(ttl * 1000), 1))
+
+    def delete(self, keys) -> int:
+        keys = [self.prefix + k for k in keys]
+        return int(self.client.delete(*keys)) if keys else 0
+
+    def _scan(self):
+        return self.client.scan_iter(match=self.prefix + "*", count=500)
+
+    def clear(self) -> None:
+        keys = list(self._scan())
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "entries": sum(1 for _ in self._scan()), "bytes": None}
+
+
+# =========================================================
+# RESULT CACHE
+# =========================================================
+class ResultCache:
+    """
+    Lapisan di atas backend: serialisasi (pickle bertanda tangan HMAC),
+    kunci kanonik, statistik hit/miss, dan pola get_or_compute.
+    Kesalahan backend (mis. server mati) tidak pernah menggagalkan dashboard;
+    hasil cukup dihitung ulang.
+
+    secret: kunci HMAC; None = kunci acak per proses.
+    """
+
+    def __init__(self, backend=None, ttl: float = DEFAULT_TTL, secret: bytes | None = None):
+        self.backend = backend or NullBackend()
+        self.ttl = float(ttl)
+        self._secret = secret or os.urandom(32)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def _sign(self, key: str, payload: bytes) -> bytes:
+        # Kunci entri ikut ditandatangani: blob sah tidak bisa dipindah ke kunci lain
+        return hmac.new(self._secret, key.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()
+
+    def get(self, key: str):
+        try:
+            blob = self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            return MISSING
+        if blob is None:
+            return MISSING
+        blob = bytes(blob)
+        signature, payload = blob[:SIGNATURE_BYTES], blob[SIGNATURE_BYTES:]
+        if not hmac.compare_digest(signature, self._sign(key, payload)):
+            self.rejected += 1
+            return MISSING
+        try:
+            return pickle.loads(payload)
+        except Exception:
+            self.errors += 1
+            return MISSING
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            blob = self._sign(key, payload) + payload
+            self.backend.set(key, blob, self.ttl if ttl is None else float(ttl))
+        except Exception:
+            self.errors += 1
+
+    def get_or_compute(self, kind: str, data_version: str, params: dict | None, compute, ttl: float | None = None):
+        """
+        Ambil hasil dari cache; kalau belum ada, hitung dengan compute() lalu simpan.
+        """
+        key = make_key(kind, data_version, params)
+        value = self.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.set(key, value, ttl)
+        return value
+
+    def delete(self, keys) -> int:
+        try:
+            return self.backend.delete(list(keys))
+        except Exception:
+            self.errors += 1
+            return 0
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        try:
+            out = dict(self.backend.stats())
+        except Exception:
+            out = {"backend": self.backend.name}
+        out.update({
+            "hits": self.hits, "misses": self.misses, "errors": self.errors, "rejected": self.rejected,
+        })
+        return out
+
+
+def cache_from_env() -> ResultCache:
+    """
+    Membuat ResultCache sesuai environment variable (lihat header modul).
+    Backend yang gagal diinisialisasi jatuh ke NullBackend agar dashboard tetap jalan.
+    """
+    kind = os.environ.get("LAPAS_CACHE_BACKEND", "sqlite").strip().lower()
+    ttl = float(os.environ.get("LAPAS_CACHE_TTL", DEFAULT_TTL))
+    secret = os.environ.get("LAPAS_CACHE_SECRET", "").encode("utf-8") or None
+    try:
+        if kind == "sqlite":
+            backend = SQLiteBackend(
+                Path(os.environ.get("LAPAS_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                max_bytes=int(float(os.environ.get("LAPAS_CACHE_MAX_MB", 256)) * 1024 * 1024),
+            )
+            secret = secret or file_secret(backend.path.with_name(backend.path.name + ".key"))
+        elif kind == "redis":
+            backend = RedisBackend(os.environ.get("LAPAS_REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            backend = NullBackend()
+    except Exception:
+        backend = NullBackend()
+    return ResultCache(backend, ttl=ttl, secret=secret)
@@ -0,0 +1,973 @@
+# =========================================================
+# ENGINE AGREGASI BERBASIS KODE INTEGER
+# Seluruh data bersih diringkas menjadi satu "cube" padat:
+#   kategori_kejahatan x jenis_kelamin x tahun x bulan
+# dibangun dengan SATU kali np.bincount atas kode integer tiap baris.
+#
+# Semua agregat dashboard (heatmap, top-N, per tahun, dst.) cukup
+# diturunkan dari cube ini dengan operasi numpy (sum / mask / argpartition),
+# tanpa groupby atau pivot_table berulang.
+#
+# Modul ini sengaja tidak bergantung pada streamlit supaya bisa
+# dipakai ulang di luar dashboard.
+# =========================================================
+import hashlib
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingest import MONTH_ORDER, temp_path
+
+N_MONTHS = len(MONTH_ORDER)
+
+# Sumbu cube
+AXIS_CATEGORY, AXIS_GENDER, AXIS_YEAR, AXIS_MONTH = 0, 1, 2, 3
+
+# Nilai "semua" pada filter dashboard. Dipakai juga oleh API agar
+# parameter filternya identik dengan UI (dan berbagi kunci cache yang sama).
+ALL_GENDER = "Semua"
+ALL_CRIME = "Semua Kejahatan"
+ALL_YEAR = "Semua"
+ALL_MONTH = "Semua"
+
+# Nama file cube di folder data/prepared (format .npy agar bisa di-memory-map)
+CUBE_VALUES_FILE = "cube_values.npy"
+CUBE_ROWS_FILE = "cube_rows.npy"
+CUBE_REVISION_FILE = "cube_revision.npy"
+
+# Kunci state filter di params cache (lihat canonical_filters)
+FILTER_KEYS = ("gender", "crime", "year", "month", "period")
+
+# Mode normalisasi matriks (heatmap)
+NORMALIZE_NONE = "jumlah"
+NORMALIZE_ROW = "baris"
+NORMALIZE_COL = "kolom"
+
+
+@dataclass(frozen=True)
+class Cube:
+    """
+    Agregat padat jumlah narapidana.
+
+    values   : jumlah narapidana, shape (kategori, gender, tahun, bulan)
+    rows     : banyaknya baris sumber per sel (untuk tahu sel mana yang "ada datanya")
+    revision : nomor revisi terakhir tiap sel berubah antar versi data (lihat
+               snapshots.revise); None kalau cube tidak berasal dari ingest
+    """
+    categories: tuple
+    genders: tuple
+    years: np.ndarray
+    values: np.ndarray
+    rows: np.ndarray
+    revision: np.ndarray | None = None
+    lineage: str = ""
+    axes_revision: int = 0
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def masked(self, mask: np.ndarray) -> "Cube":
+        """
+        Cube baru dengan sel di luar mask di-nol-kan (bentuk tetap sama).
+        """
+        return replace(
+            self,
+            values=np.where(mask, self.values, 0),
+            rows=np.where(mask, self.rows, 0),
+        )
+
+    def total(self) -> int:
+        return int(self.values.sum())
+
+
+def _codes(s: pd.Series) -> tuple[np.ndarray, list]:
+    """
+    Kode integer + label unik (urut) sebuah kolom.
+    Kolom kategori dari tahap ingest langsung memakai kodenya (tanpa scan string).
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(dtype=np.int64), list(s.cat.categories)
+    codes, uniques = pd.factorize(s, sort=True)
+    return codes.astype(np.int64), list(uniques)
+
+
+def build_cube(df: pd.DataFrame) -> Cube:
+    """
+    Membangun cube dari DataFrame bersih dengan satu pass np.bincount.
+    """
+    cat, categories = _codes(df["kategori_kejahatan"])
+    gender, genders = _codes(df["jenis_kelamin"])
+    tahun = df["tahun"].to_numpy(dtype=np.int64)
+    years = np.unique(tahun)
+    year = np.searchsorted(years, tahun)
+    month = df["bulan_num"].to_numpy(dtype=np.int64) - 1
+
+    shape = (len(categories), len(genders), len(years), N_MONTHS)
+    flat = np.ravel_multi_index((cat, gender, year, month), shape)
+    size = int(np.prod(shape))
+
+    weights = df["jumlah_narapidana"].to_numpy(dtype=np.float64)
+    values = np.bincount(flat, weights=weights, minlength=size)
+    rows = np.bincount(flat, minlength=size)
+
+    return Cube(
+        categories=tuple(categories),
+        genders=tuple(genders),
+        years=years,
+        values=np.rint(values).astype(np.int64).reshape(shape),
+        rows=rows.astype(np.int64).reshape(shape),
+    )
+
+
+def save_cube(cube: Cube, out_dir: Path) -> dict:
+    """
+    Menyimpan array cube sebagai .npy dan mengembalikan metadata untuk manifest.
+    File ditulis ke nama sementara lalu di-rename (atomic), sehingga proses lain
+    yang sedang me-memory-map versi lama tetap aman.
+    """
+    out_dir = Path(out_dir)
+    arrays = [(CUBE_VALUES_FILE, cube.values), (CUBE_ROWS_FILE, cube.rows)]
+    if cube.revision is not None:
+        arrays.append((CUBE_REVISION_FILE, cube.revision))
+    for name, arr in arrays:
+        tmp = temp_path(out_dir / name)
+        with open(tmp, "wb") as fh:
+            np.save(fh, np.ascontiguousarray(arr))
+        tmp.replace(out_dir / name)
+
+    meta = {
+        "values_file": CUBE_VALUES_FILE,
+        "rows_file": CUBE_ROWS_FILE,
+        "categories": list(cube.categories),
+        "genders": list(cube.genders),
+        "years": [int(y) for y in cube.years],
+    }
+    if cube.revision is not None:
+        meta.update({
+            "revision_file": CUBE_REVISION_FILE,
+            "lineage": cube.lineage,
+            "revision": int(cube.revision.max(initial=cube.axes_revision)),
+            "axes_revision": cube.axes_revision,
+        })
+    return meta
+
+
+def open_cube(meta: dict, out_dir: Path) -> Cube:
+    """
+    Membuka cube hasil ingest via memory map (read-only).
+    Semua proses yang membuka file yang sama berbagi satu salinan di page cache OS.
+    """
+    out_dir = Path(out_dir)
+    revision = None
+    if meta.get("revision_file"):
+        revision = np.load(out_dir / meta["revision_file"], mmap_mode="r")
+    return Cube(
+        categories=tuple(meta["categories"]),
+        genders=tuple(meta["genders"]),
+        years=np.asarray(meta["years"], dtype=np.int64),
+        values=np.load(out_dir / meta["values_file"], mmap_mode="r"),
+        rows=np.load(out_dir / meta["rows_file"], mmap_mode="r"),
+        revision=revision,
+        lineage=meta.get("lineage", ""),
+        axes_revision=int(meta.get("axes_revision", 0)),
+    )
+
+
+def cache_version(cube: Cube, data_version: str, params: dict | None = None) -> str:
+    """
+    Versi untuk kunci result cache: lineage data + revisi tertinggi di sel
+    yang dicakup filter dalam params (tanpa kunci filter = seluruh cube),
+    ditambah hash isi sel tersebut. Koreksi data yang tidak menyentuh sel itu
+    tidak mengubah versinya, sehingga hasil lama tetap terpakai; hash isi
+    menjaga agar lineage + revisi yang sama dari riwayat lain (data/prepared
+    direset, host lain di Redis yang sama) tidak memakai hasil yang salah.
+    Tanpa info revisi -> data_version.
+    """
+    if cube.revision is None:
+        return data_version
+    scope = {k: params[k] for k in FILTER_KEYS if params and k in params}
+    mask = filter_mask(cube, **scope) if scope else slice(None)
+    revision = cube.revision[mask]
+    digest = hashlib.sha1(repr((cube.categories, cube.genders, cube.years.tolist())).encode())
+    for values in (revision, cube.values[mask], cube.rows[mask]):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    rev = max(int(revision.max(initial=0)), cube.axes_revision)
+    return f"{cube.lineage}.r{rev}.{digest.hexdigest()[:12]}"
+
+
+def _axis_mask(labels, chosen) -> np.ndarray:
+    """
+    Mask boolean satu sumbu. chosen=None berarti semua label.
+    """
+    if chosen is None:
+        return np.ones(len(labels), dtype=bool)
+    chosen = set(chosen)
+    return np.fromiter((lab in chosen for lab in labels), dtype=bool, count=len(labels))
+
+
+def selection_mask(
+    cube: Cube,
+    crimes=None,
+    genders=None,
+    years=None,
+    months=None,
+) -> np.ndarray:
+    """
+    Mask 4D untuk kombinasi filter. Tiap argumen berupa daftar nilai
+    yang dipilih, atau None untuk "semua".
+    months memakai nomor bulan 1..12.
+    """
+    m_cat = _axis_mask(cube.categories, crimes)
+    m_gender = _axis_mask(cube.genders, genders)
+    m_year = _axis_mask([int(y) for y in cube.years], None if years is None else [int(y) for y in years])
+    m_month = _axis_mask(range(1, N_MONTHS + 1), months)
+    return (
+        m_cat[:, None, None, None]
+        & m_gender[None, :, None, None]
+        & m_year[None, None, :, None]
+        & m_month[None, None, None, :]
+    )
+
+
+def _as_list(value, all_value) -> list | None:
+    """
+    Nilai filter -> daftar nilai terpilih, atau None untuk "semua".
+    Menerima sentinel ("Semua"), satu nilai, atau list/tuple (multi-select).
+    """
+    if value is None or (isinstance(value, str) and value == all_value):
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return list(value) or None
+    return [value]
+
+
+def period_key(label: str) -> int:
+    """
+    "YYYY-MM" -> bilangan urut YYYY*100+MM (bisa dibandingkan & di-searchsorted).
+    """
+    year, month = str(label)[:7].split("-")
+    return int(year) * 100 + int(month)
+
+
+def period_range_mask(cube: Cube, period) -> np.ndarray:
+    """
+    Mask (tahun, bulan) untuk rentang periode inklusif (awal, akhir) "YYYY-MM".
+    Sel tahun x bulan cube sudah terurut kronologis saat diratakan, jadi batas
+    rentang dicari dengan binary search (np.searchsorted), bukan scan.
+    """
+    keys = (np.asarray(cube.years, dtype=np.int64)[:, None] * 100 + np.arange(1, N_MONTHS + 1)).ravel()
+    flat = np.zeros(keys.size, dtype=bool)
+    if period is None:
+        flat[:] = True
+    else:
+        lo = np.searchsorted(keys, period_key(period[0]), side="left")
+        hi = np.searchsorted(keys, period_key(period[1]), side="right")
+        flat[lo:hi] = True
+    return flat.reshape(len(cube.years), N_MONTHS)
+
+
+def filter_mask(
+    cube: Cube,
+    gender=ALL_GENDER,
+    crime=ALL_CRIME,
+    year=ALL_YEAR,
+    month: str = ALL_MONTH,
+    period=None,
+) -> np.ndarray:
+    """
+    Mask cube dari nilai filter ala dashboard. gender/crime/year boleh satu
+    nilai, list (multi-select; gabungan/union) atau sentinel "Semua".
+    Bulan berupa nama (tidak peka huruf besar/kecil); period = (awal, akhir)
+    "YYYY-MM" inklusif atau None.
+    """
+    years = _as_list(year, ALL_YEAR)
+    mask = selection_mask(
+        cube,
+        crimes=_as_list(crime, ALL_CRIME),
+        genders=_as_list(gender, ALL_GENDER),
+        years=None if years is None else [int(y) for y in years],
+        months=None if month == ALL_MONTH else [MONTH_ORDER.index(str(month).upper()) + 1],
+    )
+    if period is not None:
+        mask = mask & period_range_mask(cube, period)[None, None, :, :]
+    return mask
+
+
+def canonical_filters(cube: Cube, gender=ALL_GENDER, crime=ALL_CRIME, year=ALL_YEAR,
+                      month=ALL_MONTH, period=None) -> dict:
+    """
+    Bentuk kanonik state filter (dipakai sebagai kunci cache oleh dashboard & API):
+    gender/crime/year = list terurut ([] = semua), month = nama bulan atau "Semua",
+    period = [awal, akhir] atau None kalau mencakup seluruh periode cube.
+    Memilih semua opsi sama dengan tidak memilih ([]), supaya kuncinya sama.
+    """
+    def selection(values, options) -> list:
+        values = sorted(set(values or []))
+        return [] if values == sorted(options) else values
+
+    periods = available_periods(cube)
+    if period is not None:
+        start, end = str(period[0])[:7], str(period[1])[:7]
+        if not periods or (period_key(start) <= period_key(periods[0])
+                           and period_key(end) >= period_key(periods[-1])):
+            period = None
+        else:
+            period = [start, end]
+    return {
+        "gender": selection(_as_list(gender, ALL_GENDER), cube.genders),
+        "crime": selection(_as_list(crime, ALL_CRIME), cube.categories),
+        "year": selection([int(y) for y in (_as_list(year, ALL_YEAR) or [])], [int(y) for y in cube.years]),
+        "month": ALL_MONTH if month == ALL_MONTH else str(month).title(),
+        "period": period,
+    }
+
+
+# =========================================================
+# FILTER <-> QUERY STRING
+# Nama parameter sama dengan API (?gender=&crime=&year=&month=&period_start=
+# &period_end=, berulang untuk multi-select). Ditulis dari state kanonik:
+# nilai terurut, nilai default tidak ditulis, sehingga pilihan yang setara
+# selalu menghasilkan URL (dan kunci cache) yang sama.
+# =========================================================
+QUERY_KEYS = ("gender", "crime", "year", "month", "period_start", "period_end")
+
+
+def filters_to_query(params: dict) -> dict:
+    """
+    State filter kanonik -> parameter URL {nama: nilai atau list nilai}.
+    """
+    query = {}
+    if params["gender"]:
+        query["gender"] = list(params["gender"])
+    if params["crime"]:
+        query["crime"] = list(params["crime"])
+    if params["year"]:
+        query["year"] = [str(y) for y in params["year"]]
+    if params["month"] != ALL_MONTH:
+        query["month"] = params["month"]
+    if params["period"]:
+        query["period_start"], query["period_end"] = params["period"]
+    return query
+
+
+def filters_from_query(cube: Cube, query: dict) -> dict:
+    """
+    Parameter URL {nama: list nilai} -> state filter kanonik. Nilai yang tidak
+    ada di cube diabaikan, jadi tautan lama tetap terbuka setelah data berubah.
+    """
+    def values(name: str) -> list[str]:
+        return [v.strip() for v in query.get(name, []) if v and v.strip()]
+
+    years = {int(y) for y in cube.years}
+    month = next(iter(values("month")), ALL_MONTH)
+    periods = available_periods(cube)
+    period = None
+    start, end = next(iter(values("period_start")), None), next(iter(values("period_end")), None)
+    if (start or end) and periods:
+        start = start if start in periods else periods[0]
+        end = end if end in periods else periods[-1]
+        if period_key(start) <= period_key(end):
+            period = (start, end)
+
+    return canonical_filters(
+        cube,
+        gender=[g for g in (v.upper() for v in values("gender")) if g in cube.genders],
+        crime=[c for c in values("crime") if c in cube.categories],
+        year=[int(y) for y in values("year") if y.isdigit() and int(y) in years],
+        month=month.title() if month.upper() in MONTH_ORDER else ALL_MONTH,
+        period=period,
+    )
+
+
+# =========================================================
+# FILTER BARIS (DATA BERSIH)
+# Data bersih terurut per periode sejak ingest, jadi rentang periode cukup
+# diiris dengan binary search. Multi-select memakai bitmap per kode
+# kategori (lookup array boolean), satu pass untuk berapa pun nilai terpilih.
+# =========================================================
+def _code_bitmap(codes: np.ndarray, labels, chosen) -> np.ndarray:
+    """
+    Mask baris: kode kategori (pandas .cat.codes) yang labelnya terpilih.
+    """
+    lut = np.zeros(len(labels) + 1, dtype=bool)   # slot terakhir untuk kode -1 (NaN)
+    lut[:-1] = _axis_mask(labels, chosen)
+    return lut[codes]
+
+
+def filter_rows(df: pd.DataFrame, gender=ALL_GENDER, crime=ALL_CRIME, year=ALL_YEAR,
+                month=ALL_MONTH, period=None) -> pd.DataFrame:
+    """
+    Baris data bersih yang lolos filter (argumen sama dengan filter_mask).
+    df harus terurut menurut kolom periode (dijamin oleh ingest).
+    """
+    view = df
+    if period is not None:
+        values = df["periode"].to_numpy()
+        start = np.datetime64(f"{str(period[0])[:7]}-01", "ns")
+        end = np.datetime64(f"{str(period[1])[:7]}-01", "ns")
+        view = df.iloc[np.searchsorted(values, start, "left"):np.searchsorted(values, end, "right")]
+
+    keep = np.ones(len(view), dtype=bool)
+    for col, value, all_value in (
+        ("jenis_kelamin", gender, ALL_GENDER),
+        ("kategori_kejahatan", crime, ALL_CRIME),
+    ):
+        chosen = _as_list(value, all_value)
+        if chosen is not None:
+            keep &= _code_bitmap(view[col].cat.codes.to_numpy(), view[col].cat.categories, chosen)
+
+    years = _as_list(year, ALL_YEAR)
+    if years is not None and len(view):
+        # Bitmap tahun dengan offset dari tahun terkecil
+        tahun = view["tahun"].to_numpy().astype(np.int64)
+        base, top = int(tahun.min()), int(tahun.max())
+        lut = np.zeros(top - base + 1, dtype=bool)
+        lut[[int(y) - base for y in years if base <= int(y) <= top]] = True
+        keep &= lut[tahun - base]
+    if month != ALL_MONTH:
+        keep &= view["bulan_num"].to_numpy() == MONTH_ORDER.index(str(month).upper()) + 1
+
+    return view if keep.all() else view[keep]
+
+
+# =========================================================
+# TURUNAN CUBE
+# =========================================================
+def category_time_matrices(cube: Cube) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Matriks kategori x bulan dan kategori x tahun dari satu cube.
+    """
+    by_cat_year_month = cube.values.sum(axis=AXIS_GENDER)
+    return by_cat_year_month.sum(axis=1), by_cat_year_month.sum(axis=2)
+
+
+def present(cube: Cube, axis: int) -> np.ndarray:
+    """
+    Mask label pada satu sumbu yang memiliki minimal satu baris data.
+    """
+    other = tuple(a for a in range(cube.rows.ndim) if a != axis)
+    return cube.rows.sum(axis=other) > 0
+
+
+def top_n(totals: np.ndarray, n: int, candidates: np.ndarray | None = None) -> np.ndarray:
+    """
+    Indeks N nilai terbesar (urut menurun) memakai argpartition,
+    tanpa mengurutkan seluruh array.
+    candidates: mask opsional, hanya indeks bertanda True yang boleh terpilih.
+    """
+    idx = np.arange(len(totals)) if candidates is None else np.flatnonzero(candidates)
+    n = min(int(n), len(idx))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    sub = totals[idx]
+    if n < len(idx):
+        part = np.argpartition(-sub, n - 1)[:n]
+    else:
+        part = np.arange(len(idx))
+    order = np.argsort(-sub[part], kind="stable")
+    return idx[part[order]]
+
+
+def normalize(matrix: np.ndarray, mode: str = NORMALIZE_NONE) -> np.ndarray:
+    """
+    Normalisasi matriks: jumlah apa adanya, % per baris, atau % per kolom.
+    Pembagi nol menghasilkan 0 (bukan NaN).
+    """
+    if mode == NORMALIZE_NONE:
+        return matrix.astype(np.float64)
+    axis = 1 if mode == NORMALIZE_ROW else 0
+    denom = matrix.sum(axis=axis, keepdims=True).astype(np.float64)
+    return np.divide(
+        matrix * 100.0, denom,
+        out=np.zeros(matrix.shape, dtype=np.float64),
+        where=denom > 0,
+    )
+
+
+def heatmap_data(cube: Cube, n: int, mode: str = NORMALIZE_NONE) -> dict:
+    """
+    Data heatmap kategori x bulan untuk Top-N kategori.
+
+    Matriks dihitung untuk semua kategori sekaligus; top-N dan normalisasi
+    hanya memilih baris / membagi matriks yang sama.
+    """
+    cat_month, _ = category_time_matrices(cube)
+    cat_ok = present(cube, AXIS_CATEGORY)
+    month_ok = present(cube, AXIS_MONTH)
+
+    top = top_n(cat_month.sum(axis=1), n, candidates=cat_ok)
+    matrix = cat_month[np.ix_(top, np.flatnonzero(month_ok))]
+
+    return {
+        "z": normalize(matrix, mode),
+        "x": [MONTH_ORDER[i] for i in np.flatnonzero(month_ok)],
+        "y": [cube.categories[i] for i in top],
+    }
+
+
+def top_by_year_frame(cube: Cube, n: int) -> pd.DataFrame:
+    """
+    Long-format Top-N kategori per tahun (siap dipakai plotly express).
+    """
+    _, cat_year = category_time_matrices(cube)
+    top = top_n(cat_year.sum(axis=1), n, candidates=present(cube, AXIS_CATEGORY))
+    year_ok = np.flatnonzero(present(cube, AXIS_YEAR))
+
+    # Hanya pasangan (tahun, kategori) yang memang punya baris data
+    rows_cat_year = cube.rows.sum(axis=(AXIS_GENDER, AXIS_MONTH))
+    ci, yi = np.nonzero(rows_cat_year[np.ix_(top, year_ok)])
+    out = pd.DataFrame({
+        "tahun": cube.years[year_ok[yi]].astype(int),
+        "kategori_kejahatan": [cube.categories[top[i]] for i in ci],
+        "jumlah_narapidana": cat_year[top[ci], year_ok[yi]],
+    })
+    return out.sort_values(
+        ["tahun", "jumlah_narapidana"], ascending=[True, False]
+    ).reset_index(drop=True)
+
+
+# =========================================================
+# KOMPOSISI (TAB 3)
+# =========================================================
+@dataclass(frozen=True)
+class Composition:
+    """
+    Metrik komposisi kategori per tahun, semuanya berbentuk (tahun, kategori).
+
+    absolute    : jumlah narapidana
+    share_year  : % terhadap total tahun yang sama
+    share_total : % terhadap total keseluruhan
+    top         : indeks kategori terbesar (urut menurun)
+    bucket_*    : versi "Top-K + LAINNYA" dari share_year
+    """
+    categories: tuple
+    years: np.ndarray
+    absolute: np.ndarray
+    share_year: np.ndarray
+    share_total: np.ndarray
+    present: np.ndarray
+    top: np.ndarray
+    bucket_labels: tuple
+    bucket_share_year: np.ndarray
+    bucket_present: np.ndarray
+
+
+def composition(cube: Cube, top_k: int = 6, others_label: str = "LAINNYA") -> Composition:
+    """
+    Semua metrik komposisi dari satu matriks tahun x kategori (vektorisasi penuh).
+    """
+    year_ok = np.flatnonzero(present(cube, AXIS_YEAR))
+    absolute = cube.values.sum(axis=(AXIS_GENDER, AXIS_MONTH)).T[year_ok]
+    rows = cube.rows.sum(axis=(AXIS_GENDER, AXIS_MONTH)).T[year_ok] > 0
+
+    per_year = absolute.sum(axis=1, keepdims=True).astype(np.float64)
+    grand = float(absolute.sum())
+    share_year = np.divide(
+        absolute * 100.0, per_year,
+        out=np.zeros(absolute.shape, dtype=np.float64),
+        where=per_year > 0,
+    )
+    share_total = absolute * (100.0 / grand) if grand else np.zeros(absolute.shape)
+
+    top = top_n(absolute.sum(axis=0), top_k, candidates=rows.any(axis=0))
+    rest = np.ones(len(cube.categories), dtype=bool)
+    rest[top] = False
+
+    # Kolom terakhir = LAINNYA (gabungan kategori di luar top-K)
+    bucket_share = np.column_stack([share_year[:, top], share_year[:, rest].sum(axis=1)])
+    bucket_present = np.column_stack([rows[:, top], rows[:, rest].any(axis=1)])
+
+    return Composition(
+        categories=cube.categories,
+        years=cube.years[year_ok],
+        absolute=absolute,
+        share_year=share_year,
+        share_total=share_total,
+        present=rows,
+        top=top,
+        bucket_labels=tuple(cube.categories[i] for i in top) + (others_label,),
+        bucket_share_year=bucket_share,
+        bucket_present=bucket_present,
+    )
+
+
+def share_frame(comp: Composition) -> pd.DataFrame:
+    """
+    Long-format proporsi per tahun (Top-K + LAINNYA) untuk stacked bar.
+    """
+    yi, bi = np.nonzero(comp.bucket_present)
+    out = pd.DataFrame({
+        "tahun": comp.years[yi].astype(int),
+        "kategori_plot": [comp.bucket_labels[i] for i in bi],
+        "proporsi_pct": comp.bucket_share_year[yi, bi],
+    })
+    return out.sort_values(
+        ["tahun", "proporsi_pct"], ascending=[True, False]
+    ).reset_index(drop=True)
+
+
+def treemap_nodes(cube: Cube, hierarchical: bool = False) -> dict:
+    """
+    Node treemap (ids, labels, parents, values) langsung dari cube.
+
+    hierarchical=False : satu tingkat (kategori)
+    hierarchical=True  : kategori -> jenis kelamin -> tahun
+    Nilai induk = jumlah anak (branchvalues="total"), sehingga plotly
+    tidak perlu mengelompokkan ulang data mentah.
+    """
+    values = cube.values.sum(axis=AXIS_MONTH)            # (kategori, gender, tahun)
+    rows = cube.rows.sum(axis=AXIS_MONTH) > 0
+
+    ids, labels, parents, vals = [], [], [], []
+
+    def add(node_id, label, parent, value):
+        ids.append(node_id)
+        labels.append(label)
+        parents.append(parent)
+        vals.append(int(value))
+
+    cat_totals = values.sum(axis=(1, 2))
+    for c in np.flatnonzero(rows.any(axis=(1, 2))):
+        cat = cube.categories[c]
+        add(cat, cat, "", cat_totals[c])
+        if not hierarchical:
+            continue
+        for g in np.flatnonzero(rows[c].any(axis=1)):
+            g_id = f"{cat}/{cube.genders[g]}"
+            add(g_id, cube.genders[g], cat, values[c, g].sum())
+            for y in np.flatnonzero(rows[c, g]):
+                add(f"{g_id}/{int(cube.years[y])}", str(int(cube.years[y])), g_id, values[c, g, y])
+
+    return {"ids": ids, "labels": labels, "parents": parents, "values": vals}
+
+
+# =========================================================
+# KPI & SERI (dipakai API)
+# =========================================================
+def _period_label(flat_idx: int, years: np.ndarray) -> str:
+    y, m = divmod(int(flat_idx), N_MONTHS)
+    return f"{int(years[y]):04d}-{m + 1:02d}"
+
+
+@dataclass(frozen=True)
+class KpiResult:
+    """
+    Nilai kartu Ringkasan Utama untuk satu state filter.
+    Tidak bergantung pada kapasitas, sehingga bisa di-cache per filter dan
+    dipakai ulang oleh dashboard, export & API; tingkat hunian dihitung saat dipakai.
+    """
+    periode_terakhir: str | None
+    total_narapidana: int          # total pada periode terakhir
+    laki_laki: int
+    perempuan: int
+    total_sesuai_filter: int       # total seluruh periode sesuai filter
+    kategori_terbanyak: str | None
+    periode_terpadat: str | None
+    bulan_terpadat: str | None
+
+    def tingkat_hunian(self, capacity: int) -> float:
+        return self.total_narapidana / capacity * 100 if capacity else 0.0
+
+    def as_dict(self, capacity: int) -> dict:
+        """
+        Bentuk dict (dipakai API & sheet ringkasan export).
+        """
+        return {
+            "total_narapidana": self.total_narapidana,
+            "laki_laki": self.laki_laki,
+            "perempuan": self.perempuan,
+            "kapasitas": int(capacity),
+            "tingkat_hunian_pct": round(self.tingkat_hunian(capacity), 2),
+            "periode_terakhir": self.periode_terakhir,
+            "total_sesuai_filter": self.total_sesuai_filter,
+            "kategori_terbanyak": self.kategori_terbanyak,
+            "periode_terpadat": self.periode_terpadat,
+            "bulan_terpadat": self.bulan_terpadat,
+        }
+
+
+def kpi_result(cube: Cube) -> KpiResult:
+    """
+    Semua nilai KPI dari cube yang sudah difilter dalam satu reduksi:
+    cube diringkas sekali menjadi matriks gender x periode (plus jumlah baris
+    per periode), lalu total, laki-laki, perempuan, periode terakhir &
+    terpadat dibaca dari matriks kecil itu. Gender dikenali dari labelnya
+    (sekali per label, bukan per baris).
+    """
+    gp = cube.values.sum(axis=AXIS_CATEGORY).reshape(len(cube.genders), -1)
+    rows_period = cube.rows.sum(axis=(AXIS_CATEGORY, AXIS_GENDER)).ravel() > 0
+    filled = np.flatnonzero(rows_period)
+    if not filled.size:
+        return KpiResult(None, 0, 0, 0, 0, None, None, None)
+
+    is_male = np.array(["LAKI" in g for g in cube.genders], dtype=bool)
+    is_female = np.array(["PEREMPUAN" in g for g in cube.genders], dtype=bool)
+    last = int(filled[-1])
+    at_last = gp[:, last]
+    densest = int(filled[np.argmax(gp.sum(axis=0)[filled])])
+    top = top_n(cube.values.sum(axis=(1, 2, 3)), 1, candidates=present(cube, AXIS_CATEGORY))
+
+    return KpiResult(
+        periode_terakhir=_period_label(last, cube.years),
+        total_narapidana=int(at_last.sum()),
+        laki_laki=int(at_last[is_male].sum()),
+        perempuan=int(at_last[is_female].sum()),
+        total_sesuai_filter=int(gp.sum()),
+        kategori_terbanyak=cube.categories[top[0]] if len(top) else None,
+        periode_terpadat=_period_label(densest, cube.years),
+        bulan_terpadat=MONTH_ORDER[densest % N_MONTHS],
+    )
+
+
+def kpi_summary(cube: Cube, capacity: int) -> dict:
+    """
+    KPI kartu Ringkasan Utama dari cube yang sudah difilter (bentuk dict).
+    Total, laki-laki, perempuan & tingkat hunian memakai periode terakhir.
+    """
+    return kpi_result(cube).as_dict(capacity)
+
+
+def category_series(cube: Cube) -> list[dict]:
+    """
+    Jumlah per kategori kejahatan (urut menurun), hanya kategori yang ada datanya.
+    """
+    totals = cube.values.sum(axis=(1, 2, 3))
+    idx = top_n(totals, len(totals), candidates=present(cube, AXIS_CATEGORY))
+    return [{"kategori_kejahatan": cube.categories[i], "jumlah_narapidana": int(totals[i])} for i in idx]
+
+
+def period_series(cube: Cube) -> list[dict]:
+    """
+    Jumlah per periode (bulan-tahun) urut kronologis, hanya periode yang ada datanya.
+    """
+    totals = cube.values.sum(axis=(AXIS_CATEGORY, AXIS_GENDER)).ravel()
+    rows = cube.rows.sum(axis=(AXIS_CATEGORY, AXIS_GENDER)).ravel() > 0
+    return [
+        {"periode": _period_label(i, cube.years), "jumlah_narapidana": int(totals[i])}
+        for i in np.flatnonzero(rows)
+    ]
+
+
+def month_series(cube: Cube) -> list[dict]:
+    """
+    Jumlah per bulan (urut kalender), hanya bulan yang ada datanya.
+    """
+    totals = cube.values.sum(axis=(AXIS_CATEGORY, AXIS_GENDER, AXIS_YEAR))
+    return [
+        {"bulan": MONTH_ORDER[i], "jumlah_narapidana": int(totals[i])}
+        for i in np.flatnonzero(present(cube, AXIS_MONTH))
+    ]
+
+
+# =========================================================
+# PERBANDINGAN DUA TAHUN / DUA PERIODE (YoY, MoM, bebas)
+# Kedua sisi diiris langsung dari cube menjadi matriks kategori x gender,
+# lalu selisih absolut & persen dihitung sekaligus untuk total, gender
+# dan seluruh kategori (operasi array, tanpa groupby per kategori).
+# =========================================================
+COMPARE_YEAR = "tahun"
+COMPARE_PERIOD = "periode"
+
+
+def available_periods(cube: Cube) -> list[str]:
+    """
+    Label periode "YYYY-MM" yang ada datanya, urut kronologis.
+    """
+    rows = cube.rows.sum(axis=(AXIS_CATEGORY, AXIS_GENDER)).ravel() > 0
+    return [_period_label(i, cube.years) for i in np.flatnonzero(rows)]
+
+
+def _time_slice(cube: Cube, mode: str, key) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    (jumlah, baris, banyak bulan berdata) untuk satu tahun / satu periode,
+    masing-masing berbentuk (kategori, gender).
+    """
+    years = [int(y) for y in cube.years]
+    if mode == COMPARE_YEAR:
+        y = years.index(int(key))
+        values, rows = cube.values[:, :, y, :], cube.rows[:, :, y, :]
+        n_months = int((rows.sum(axis=(0, 1)) > 0).sum())
+        return values.sum(axis=-1), rows.sum(axis=-1), n_months
+    if mode == COMPARE_PERIOD:
+        year, month = str(key).split("-")
+        y, m = years.index(int(year)), int(month) - 1
+        rows = cube.rows[:, :, y, m]
+        return cube.values[:, :, y, m], rows, int(rows.any())
+    raise ValueError(f"mode perbandingan tidak dikenal: {mode}")
+
+
+@dataclass(frozen=True)
+class PeriodComparison:
+    """
+    Perbandingan dua irisan waktu: A (pembanding) vs B (acuan).
+
+    a, b     : jumlah narapidana, shape (kategori, gender)
+    present  : kategori yang ada datanya di salah satu sisi
+    months_* : banyak bulan berdata di tiap sisi (mode tahun bisa parsial)
+    """
+    mode: str
+    label_a: str
+    label_b: str
+    categories: tuple
+    genders: tuple
+    a: np.ndarray
+    b: np.ndarray
+    present: np.ndarray
+    months_a: int
+    months_b: int
+
+
+def compare(cube: Cube, mode: str, a, b) -> PeriodComparison:
+    values_a, rows_a, months_a = _time_slice(cube, mode, a)
+    values_b, rows_b, months_b = _time_slice(cube, mode, b)
+    return PeriodComparison(
+        mode=mode,
+        label_a=str(a),
+        label_b=str(b),
+        categories=cube.categories,
+        genders=cube.genders,
+        a=values_a,
+        b=values_b,
+        present=(rows_a + rows_b).sum(axis=1) > 0,
+        months_a=months_a,
+        months_b=months_b,
+    )
+
+
+def delta_frame(labels, a: np.ndarray, b: np.ndarray) -> pd.DataFrame:
+    """
+    Tabel selisih B - A untuk banyak baris sekaligus.
+    selisih_pct = NaN kalau A bernilai 0 (pertumbuhan tidak terdefinisi).
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    diff = b - a
+    pct = np.full(diff.shape, np.nan)
+    np.divide(diff * 100.0, a, out=pct, where=a != 0)
+    return pd.DataFrame({
+        "label": list(labels),
+        "a": a,
+        "b": b,
+        "selisih": diff,
+        "selisih_pct": pct.round(2),
+    })
+
+
+def comparison_frames(cmp: PeriodComparison) -> dict:
+    """
+    Semua tabel selisih untuk satu perbandingan:
+    total (1 baris), per gender, dan per kategori (urut |selisih| menurun),
+    plus banyak bulan berdata di tiap sisi.
+    """
+    by_cat = delta_frame(cmp.categories, cmp.a.sum(axis=1), cmp.b.sum(axis=1))[cmp.present]
+    order = np.argsort(-by_cat["selisih"].abs().to_numpy(), kind="stable")
+    return {
+        "total": delta_frame(["TOTAL"], [cmp.a.sum()], [cmp.b.sum()]),
+        "gender": delta_frame(cmp.genders, cmp.a.sum(axis=0), cmp.b.sum(axis=0)),
+        "kategori": by_cat.iloc[order].reset_index(drop=True),
+        "bulan": {"a": cmp.months_a, "b": cmp.months_b},
+    }
+
+
+# =========================================================
+# TREN & ANOMALI (SEMUA KATEGORI SEKALIGUS)
+# Matriks kategori x periode diturunkan dari cube, lalu moving average,
+# rolling z-score & flag anomali dihitung untuk semua kategori dalam satu
+# pass (jumlah kumulatif sepanjang sumbu periode), tanpa loop per kategori.
+# =========================================================
+@dataclass(frozen=True)
+class TrendStats:
+    """
+    Statistik bergulir per kategori, semuanya berbentuk (kategori, periode).
+
+    values  : jumlah narapidana per periode
+    ma      : moving average `window` periode terakhir (termasuk periode itu)
+    z       : z-score terhadap `window` periode SEBELUMNYA (NaN kalau riwayat kurang)
+    anomaly : |z| >= threshold
+    """
+    categories: tuple
+    periods: tuple
+    window: int
+    threshold: float
+    values: np.ndarray
+    ma: np.ndarray
+    z: np.ndarray
+    anomaly: np.ndarray
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Jumlah `window` kolom terakhir untuk setiap kolom (NaN sebelum window penuh).
+    """
+    cs = np.cumsum(np.pad(x, ((0, 0), (1, 0))), axis=1)
+    out = np.full(x.shape, np.nan)
+    out[:, window - 1:] = cs[:, window:] - cs[:, :-window]
+    return out
+
+
+def trend_stats(cube: Cube, window: int = 6, threshold: float = 2.5, min_std: float = 1.0) -> TrendStats:
+    """
+    MA, rolling z-score & flag anomali untuk setiap kategori x periode.
+
+    min_std: batas bawah simpangan baku (dalam orang) agar seri yang datar
+    tidak menghasilkan z tak hingga saat berubah sedikit saja.
+    """
+    rows_period = cube.rows.sum(axis=(AXIS_CATEGORY, AXIS_GENDER)).ravel() > 0
+    cat_ok = present(cube, AXIS_CATEGORY)
+    matrix = cube.values.sum(axis=AXIS_GENDER).reshape(len(cube.categories), -1)
+    x = matrix[np.ix_(cat_ok, rows_period)].astype(np.float64)
+
+    n_periods = x.shape[1]
+    window = max(2, min(int(window), max(n_periods - 1, 2)))
+    ma = np.full(x.shape, np.nan)
+    z = np.full(x.shape, np.nan)
+
+    if n_periods > window:
+        sums = _rolling_sum(x, window)
+        sq_sums = _rolling_sum(x * x, window)
+        ma = sums / window
+
+        # Statistik window sebelumnya (geser satu periode) -> pembanding periode t
+        prev_mean = ma[:, window - 1:-1]
+        prev_var = (sq_sums[:, window - 1:-1] - window * prev_mean ** 2) / (window - 1)
+        prev_std = np.maximum(np.sqrt(np.clip(prev_var, 0, None)), min_std)
+        z[:, window:] = (x[:, window:] - prev_mean) / prev_std
+
+    return TrendStats(
+        categories=tuple(c for c, ok in zip(cube.categories, cat_ok) if ok),
+        periods=tuple(_period_label(i, cube.years) for i in np.flatnonzero(rows_period)),
+        window=window,
+        threshold=float(threshold),
+        values=x.astype(np.int64),
+        ma=ma,
+        z=z,
+        anomaly=np.abs(np.nan_to_num(z)) >= threshold,
+    )
+
+
+def anomaly_frame(stats: TrendStats, crimes=None, period=None) -> pd.DataFrame:
+    """
+    Daftar titik anomali (urut |z| menurun), opsional dibatasi ke
+    kategori terpilih & rentang periode (awal, akhir) "YYYY-MM".
+    """
+    keep = stats.anomaly.copy()
+    if crimes:
+        keep &= _axis_mask(stats.categories, crimes)[:, None]
+    if period is not None:
+        keys = np.array([period_key(p) for p in stats.periods])
+        keep &= ((keys >= period_key(period[0])) & (keys <= period_key(period[1])))[None, :]
+
+    ci, pi = np.nonzero(keep)
+    out = pd.DataFrame({
+        "kategori_kejahatan": [stats.categories[i] for i in ci],
+        "periode": [stats.periods[i] for i in pi],
+        "jumlah_narapidana": stats.values[ci, pi],
+        "rata_rata_sebelumnya": stats.ma[ci, pi - 1].round(1),
+        "z_score": stats.z[ci, pi].round(2),
+        "arah": np.where(stats.z[ci, pi] > 0, "naik", "turun"),
+    })
+    return out.iloc[np.argsort(-np.abs(out["z_score"].to_numpy()), kind="stable")].reset_index(drop=True)
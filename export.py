@@ -0,0 +1,172 @@
+# =========================================================
+# EXPORT DATA REKAP
+# CSV ditulis bertahap (per potongan baris) langsung dari kolom Arrow,
+# tanpa membangun satu string CSV utuh + salinan bytes-nya di memori.
+# Kompresi gzip opsional dilakukan secara streaming (zlib), sehingga
+# memori puncak ditentukan ukuran potongan, bukan jumlah baris.
+#
+# Parquet & Arrow IPC ditulis dari kolom bertipe yang sama (tanpa lewat
+# teks): kategori tetap dictionary-encoded, periode bertipe date,
+# tahun & jumlah tetap integer — pembaca tidak perlu parsing ulang.
+#
+# Semua file export dashboard (termasuk Excel) baru dibuat saat tombol unduh
+# diklik, jadi tidak memperlambat tampilan halaman. File ditulis ke file
+# sementara di disk lalu diserahkan sebagai bytes (tipe yang diterima
+# st.download_button).
+#
+# Dipakai oleh dashboard (tombol unduh, dibuat saat diklik) dan API
+# (StreamingResponse), serta bench/export_benchmark.py.
+# =========================================================
+import tempfile
+import zlib
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Baris per potongan CSV (~beberapa MB teks per potongan untuk data rekap)
+CHUNK_ROWS = 50_000
+
+CSV_MIME = "text/csv"
+GZIP_MIME = "application/gzip"
+PARQUET_MIME = "application/vnd.apache.parquet"
+ARROW_MIME = "application/vnd.apache.arrow.file"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Kompresi kolom untuk Parquet & Arrow IPC
+TYPED_COMPRESSION = "zstd"
+
+# Kolom export (urutan sama dengan tabel rekap, tanpa kolom periode)
+EXPORT_COLUMNS = [
+    "nama_kabupaten_kota", "kategori_kejahatan", "jenis_kelamin",
+    "jumlah_narapidana", "bulan", "tahun",
+]
+
+
+def export_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kolom export dari data bersih (nama_kabupaten_kota bersifat opsional).
+    """
+    return df[[c for c in EXPORT_COLUMNS if c in df.columns]]
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    DataFrame -> Arrow Table. Kolom numerik dipakai ulang tanpa salin,
+    kolom kategori menjadi dictionary array (kode integer + kamus label).
+    """
+    return pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+
+
+def iter_csv(table: pa.Table, chunk_rows: int = CHUNK_ROWS, compress: bool = False) -> Iterator[bytes]:
+    """
+    Menghasilkan CSV (UTF-8, dengan header) sebagai potongan bytes.
+    compress=True -> aliran gzip yang valid (bisa langsung disimpan sebagai .csv.gz).
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    options = pa_csv.WriteOptions(include_header=True)
+
+    for start in range(0, max(table.num_rows, 1), chunk_rows):
+        sink = pa.BufferOutputStream()
+        # Slice Arrow bersifat zero-copy (hanya offset ke buffer yang sama)
+        pa_csv.write_csv(table.slice(start, chunk_rows), sink, options)
+        chunk = sink.getvalue().to_pybytes()
+        options = pa_csv.WriteOptions(include_header=False)
+        if gz is not None:
+            chunk = gz.compress(chunk)
+        if chunk:
+            yield chunk
+
+    if gz is not None:
+        yield gz.flush()
+
+
+def write_csv(table: pa.Table, out: BinaryIO, chunk_rows: int = CHUNK_ROWS, compress: bool = False) -> int:
+    """
+    Menulis CSV bertahap ke file biner; mengembalikan jumlah byte tertulis.
+    """
+    written = 0
+    for chunk in iter_csv(table, chunk_rows, compress):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _file_bytes(write) -> bytes:
+    """
+    write(out) ke file sementara di disk, lalu isinya sebagai bytes (tipe yang
+    diterima st.download_button). Selama ditulis memori hanya sebesar satu
+    potongan; salinan utuh di memori hanya hasil akhirnya, yang memang
+    disimpan Streamlit sebagai file media sampai diunduh.
+    """
+    with tempfile.TemporaryFile() as out:
+        write(out)
+        out.seek(0)
+        return out.read()
+
+
+def csv_bytes(df: pd.DataFrame, compress: bool = False) -> bytes:
+    """
+    CSV (opsional gzip) dari df sebagai bytes, untuk st.download_button.
+    """
+    return _file_bytes(lambda out: write_csv(to_arrow(df), out, compress=compress))
+
+
+def xlsx_bytes(df: pd.DataFrame, sheet_name: str = "filtered", summary: dict | None = None) -> bytes:
+    """
+    Workbook Excel dari df sebagai bytes. Paling lambat di antara format
+    export, jadi sebaiknya dibuat hanya saat diminta (tombol diklik).
+    summary (mis. KpiResult.as_dict) ditulis ke sheet "ringkasan".
+    """
+    def write(out):
+        with pd.ExcelWriter(out, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+            if summary:
+                pd.DataFrame({"indikator": list(summary), "nilai": list(summary.values())}).to_excel(
+                    writer, index=False, sheet_name="ringkasan"
+                )
+
+    return _file_bytes(write)
+
+
+# =========================================================
+# FORMAT BERTIPE (PARQUET & ARROW IPC)
+# =========================================================
+def to_typed_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Seperti to_arrow, tetapi kolom periode (datetime) disimpan sebagai date32.
+    """
+    table = to_arrow(df)
+    if "periode" in table.column_names:
+        i = table.column_names.index("periode")
+        table = table.set_column(i, "periode", table.column(i).cast(pa.date32()))
+    return table
+
+
+def write_parquet(table: pa.Table, out: BinaryIO) -> None:
+    # Kolom dictionary ditulis sebagai dictionary page Parquet;
+    # skema Arrow ikut disimpan sehingga dibaca kembali sebagai kategori
+    pq.write_table(table, out, use_dictionary=True, compression=TYPED_COMPRESSION)
+
+
+def write_arrow(table: pa.Table, out: BinaryIO) -> None:
+    # Format file Arrow IPC (= Feather v2), dibaca dengan pd.read_feather
+    options = pa.ipc.IpcWriteOptions(compression=TYPED_COMPRESSION)
+    with pa.ipc.new_file(out, table.schema, options=options) as writer:
+        writer.write_table(table, max_chunksize=CHUNK_ROWS)
+
+
+def parquet_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Parquet dari df sebagai bytes (siap untuk st.download_button).
+    """
+    return _file_bytes(lambda out: write_parquet(to_typed_arrow(df), out))
+
+
+def arrow_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Arrow IPC dari df sebagai bytes (siap untuk st.download_button).
+    """
+    return _file_bytes(lambda out: write_arrow(to_typed_arrow(df), out))
@@ -0,0 +1,835 @@
+# =========================================================
+# INGEST DATA NARAPIDANA
+# Tahap sekali jalan: baca workbook mentah, normalisasi, validasi skema,
+# lalu simpan hasil bersih + manifest versi data ke folder data/prepared.
+#
+# Format hasil dibuat agar bisa di-memory-map:
+# - data bersih : Arrow IPC / Feather v2 tanpa kompresi
+# - cube agregat: NumPy .npy
+# Beberapa replika Streamlit di satu host cukup membuka file yang sama;
+# page cache OS menyimpan satu salinan untuk semua proses, dan startup
+# replika tidak perlu lagi mem-parsing workbook.
+#
+# Dashboard cukup memuat hasil bersih ini, sehingga tidak perlu lagi
+# melakukan normalisasi string (upper/strip/to_numeric) di setiap rerun.
+#
+# Cara pakai:
+#   python ingest.py                    -> pakai file default
+#   python ingest.py path/ke/file.xlsx  -> pakai file lain
+#   python ingest.py data/              -> semua workbook .xlsx di folder (mode folder)
+#   LAPAS_SOURCE=data streamlit run app.py        -> dashboard/API memakai mode folder
+#   LAPAS_INTEGRITY_POLICY=sum python ingest.py   -> kebijakan baris kembar lain
+#   LAPAS_EXCEL_ENGINE=openpyxl python ingest.py  -> paksa pembaca Excel tertentu
+# =========================================================
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_FILE = BASE_DIR / "data" / "data_narapidana_cirebon_clean.xlsx"
+PREPARED_DIR = BASE_DIR / "data" / "prepared"
+
+# Sumber yang dipakai dashboard & API: satu workbook atau satu folder workbook
+DEFAULT_SOURCE = Path(os.environ.get("LAPAS_SOURCE", "").strip() or DEFAULT_FILE)
+CLEAN_FILE_NAME = "narapidana_clean.arrow"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Naikkan angka ini setiap aturan normalisasi / kontrak skema berubah,
+# supaya hasil ingest lama otomatis dianggap kedaluwarsa.
+SCHEMA_VERSION = 2
+
+# Data dashboard hanya untuk wilayah Cirebon
+REGION_KEYWORD = "CIREBON"
+
+# Mapping nama bulan ke angka (untuk konversi datetime)
+MONTH_MAP = {
+    "JANUARI": 1, "FEBRUARI": 2, "MARET": 3, "APRIL": 4,
+    "MEI": 5, "JUNI": 6, "JULI": 7, "AGUSTUS": 8,
+    "SEPTEMBER": 9, "OKTOBER": 10, "NOVEMBER": 11, "DESEMBER": 12
+}
+
+# Urutan bulan untuk keperluan visualisasi
+MONTH_ORDER = list(MONTH_MAP.keys())
+
+
+# =========================================================
+# KONTRAK SKEMA
+# =========================================================
+
+# Kolom yang wajib ada di workbook mentah
+RAW_REQUIRED_COLUMNS = [
+    "kategori_kejahatan", "jenis_kelamin", "jumlah_narapidana", "bulan", "tahun"
+]
+
+# Kolom hasil bersih beserta dtype yang dijanjikan ke dashboard.
+# Kolom bertanda opsional hanya divalidasi kalau memang ada di workbook.
+CLEAN_SCHEMA = {
+    "nama_kabupaten_kota": "category",
+    "kategori_kejahatan": "category",
+    "jenis_kelamin": "category",
+    "bulan": "category",
+    "bulan_num": "int8",
+    "tahun": "int16",
+    "periode": "datetime64[ns]",
+    "jumlah_narapidana": "int64",
+}
+OPTIONAL_COLUMNS = {"nama_kabupaten_kota"}
+
+
+class SchemaError(ValueError):
+    """Dilempar kalau data tidak memenuhi kontrak skema."""
+
+
+def validate_raw(df: pd.DataFrame) -> None:
+    """
+    Memastikan workbook mentah memiliki semua kolom wajib.
+    """
+    missing = [c for c in RAW_REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise SchemaError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}")
+
+
+def validate_clean(df: pd.DataFrame) -> None:
+    """
+    Memastikan hasil bersih sesuai CLEAN_SCHEMA (nama kolom, urutan, dtype).
+    """
+    expected = [
+        c for c in CLEAN_SCHEMA
+        if c not in OPTIONAL_COLUMNS or c in df.columns
+    ]
+    if list(df.columns) != expected:
+        raise SchemaError(
+            f"Kolom hasil bersih tidak sesuai kontrak: {list(df.columns)} != {expected}"
+        )
+
+    for col in expected:
+        want = CLEAN_SCHEMA[col]
+        got = df[col].dtype
+        if want == "category":
+            ok = isinstance(got, pd.CategoricalDtype)
+        elif want.startswith("datetime64"):
+            ok = pd.api.types.is_datetime64_dtype(got)
+        else:
+            ok = str(got) == want
+        if not ok:
+            raise SchemaError(f"Kolom '{col}' bertipe {got}, seharusnya {want}")
+
+    if df["periode"].isna().any():
+        raise SchemaError("Kolom 'periode' tidak boleh kosong")
+
+
+# =========================================================
+# INTEGRITAS DATA
+# Kunci (periode, jenis_kelamin, kategori_kejahatan, nama_kabupaten_kota)
+# yang muncul lebih dari sekali membuat semua agregat menghitung ganda.
+# Pemeriksaan memakai satu kode integer per kunci yang diurutkan
+# (np.argsort), tanpa loop Python per baris. Cara penanganannya diatur
+# lewat LAPAS_INTEGRITY_POLICY:
+#   keep_last -> baris kembar: pakai baris paling bawah di workbook (default)
+#   sum       -> baris kembar: jumlahnya digabung menjadi satu baris
+#   reject    -> ingest gagal kalau ada temuan apa pun
+# Untuk keep_last & sum, baris dengan jumlah negatif / bukan angka dan tahun
+# di luar rentang dibuang. Semua temuan dicatat di manifest (stats.integrity).
+# =========================================================
+POLICY_KEEP_LAST = "keep_last"
+POLICY_SUM = "sum"
+POLICY_REJECT = "reject"
+INTEGRITY_POLICIES = (POLICY_KEEP_LAST, POLICY_SUM, POLICY_REJECT)
+DEFAULT_POLICY = os.environ.get("LAPAS_INTEGRITY_POLICY", POLICY_KEEP_LAST).strip().lower()
+
+# Kolom kunci (nama_kabupaten_kota hanya dipakai kalau ada)
+INTEGRITY_KEY = ["periode", "jenis_kelamin", "kategori_kejahatan", "nama_kabupaten_kota"]
+
+# Tahun wajar: MIN_YEAR s.d. tahun berjalan
+MIN_YEAR = 2000
+
+# Contoh baris bermasalah yang disimpan per jenis temuan
+MAX_EXAMPLES = 20
+
+# Kolom bantu di data mentah gabungan mode folder: file asal & nomor baris Excel
+FILE_COLUMN = "_file"
+ROW_COLUMN = "_baris_excel"
+
+FINDING_LABELS = {
+    "duplicate_rows": "baris kunci ganda",
+    "non_numeric": "jumlah kosong / bukan angka",
+    "negative": "jumlah negatif",
+    "year_out_of_range": "tahun di luar rentang",
+}
+EXAMPLE_COLUMNS = [
+    "nama_kabupaten_kota", "kategori_kejahatan", "jenis_kelamin", "bulan", "tahun", "jumlah_narapidana",
+]
+
+
+class IntegrityError(SchemaError):
+    """Dilempar (kebijakan reject) kalau pemeriksaan integritas menemukan masalah."""
+
+    def __init__(self, report: dict):
+        self.report = report
+        super().__init__(f"Pemeriksaan integritas gagal: {format_findings(report)}")
+
+
+def findings_count(report: dict) -> int:
+    return sum(int(report.get(k, 0)) for k in FINDING_LABELS)
+
+
+def format_findings(report: dict) -> str:
+    """
+    Ringkasan satu baris, mis. "3 baris kunci ganda, 1 jumlah negatif".
+    """
+    parts = [f"{report[k]:,} {label}" for k, label in FINDING_LABELS.items() if report.get(k)]
+    return ", ".join(parts) or "tidak ada temuan"
+
+
+def _add_examples(report: dict, problem: str, rows: pd.DataFrame, origin: pd.DataFrame) -> None:
+    # Nomor baris Excel = indeks baris mentah + 2 (baris 1 = header); pada mode
+    # folder nomor baris & nama file asal diambil dari kolom SOURCE_COLUMNS
+    head = rows.head(MAX_EXAMPLES)
+    cols = [c for c in EXAMPLE_COLUMNS if c in head.columns]
+    if ROW_COLUMN in origin.columns:
+        lines = origin[ROW_COLUMN].reindex(head.index)
+        files = origin[FILE_COLUMN].reindex(head.index)
+    else:
+        lines, files = pd.Series(head.index + 2, index=head.index), None
+    for idx, values in zip(head.index, head[cols].itertuples(index=False)):
+        report["examples"].append({
+            "masalah": FINDING_LABELS[problem],
+            **({"file": str(files[idx])} if files is not None else {}),
+            "baris_excel": int(lines[idx]),
+            **{c: str(v) for c, v in zip(cols, values)},
+        })
+
+
+def _key_codes(df: pd.DataFrame, key: list[str]) -> np.ndarray:
+    """
+    Satu kode int64 per baris untuk kombinasi kolom kunci
+    (mixed radix atas kode factorize tiap kolom).
+    """
+    combined = np.zeros(len(df), dtype=np.int64)
+    for col in key:
+        codes, uniques = pd.factorize(df[col], sort=False)
+        combined = combined * (len(uniques) + 1) + (codes + 1)
+    return combined
+
+
+def resolve_duplicates(clean: pd.DataFrame, policy: str, report: dict, origin: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Mendeteksi kunci ganda dan menerapkan kebijakan keep_last / sum.
+    clean harus masih berurutan sesuai baris workbook (indeks = baris mentah);
+    origin = frame mentah untuk nomor baris / file asal contoh temuan.
+    """
+    key = [c for c in INTEGRITY_KEY if c in clean.columns]
+    codes = _key_codes(clean, key)
+    # Sort stabil: di dalam satu kunci, urutan baris workbook tetap terjaga
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+    dup = sizes > 1
+    if not dup.any():
+        return clean
+
+    report["duplicate_keys"] = int(dup.sum())
+    report["duplicate_rows"] = int((sizes[dup] - 1).sum())
+    _add_examples(
+        report, "duplicate_rows", clean.iloc[order[np.repeat(dup, sizes)]],
+        clean if origin is None else origin,
+    )
+    if policy == POLICY_REJECT:
+        return clean
+
+    last = order[starts + sizes - 1]
+    keep = np.sort(last)
+    out = clean.iloc[keep].copy()
+    if policy == POLICY_SUM:
+        totals = np.zeros(len(clean), dtype=np.int64)
+        totals[last] = np.add.reduceat(clean["jumlah_narapidana"].to_numpy()[order], starts)
+        out["jumlah_narapidana"] = totals[keep]
+    return out
+
+
+# =========================================================
+# NORMALISASI
+# =========================================================
+def clean_frame(df_raw: pd.DataFrame, policy: str = DEFAULT_POLICY) -> tuple[pd.DataFrame, dict]:
+    """
+    Menerapkan semua aturan normalisasi yang sebelumnya dijalankan dashboard,
+    lalu pemeriksaan integritas sesuai policy.
+
+    Mengembalikan DataFrame bersih (bertipe sesuai CLEAN_SCHEMA) dan
+    ringkasan jumlah baris yang dibuang + temuan integritas.
+    """
+    if policy not in INTEGRITY_POLICIES:
+        raise ValueError(f"Kebijakan integritas tidak dikenal: {policy} (pilih {', '.join(INTEGRITY_POLICIES)})")
+    validate_raw(df_raw)
+    out = df_raw.copy()
+    stats = {"rows_raw": int(len(out))}
+    report = {"policy": policy, "duplicate_keys": 0, **{k: 0 for k in FINDING_LABELS}, "examples": []}
+
+    # Filter khusus wilayah Cirebon jika kolom tersedia
+    if "nama_kabupaten_kota" in out.columns:
+        out["nama_kabupaten_kota"] = (
+            out["nama_kabupaten_kota"].astype(str).str.upper().str.strip()
+        )
+        out = out[out["nama_kabupaten_kota"].str.contains(REGION_KEYWORD, na=False)]
+    stats["rows_outside_region"] = stats["rows_raw"] - int(len(out))
+
+    # Baris tanpa tahun valid tidak bisa dipetakan ke periode
+    tahun = pd.to_numeric(out["tahun"], errors="coerce")
+    stats["rows_invalid_year"] = int(tahun.isna().sum())
+    out = out[tahun.notna()]
+    tahun = tahun[tahun.notna()]
+
+    # Nilai tidak valid: tahun di luar rentang, jumlah kosong / bukan angka / negatif
+    jumlah = pd.to_numeric(out["jumlah_narapidana"], errors="coerce")
+    checks = {
+        "year_out_of_range": ~tahun.between(MIN_YEAR, datetime.now().year),
+        "non_numeric": jumlah.isna(),
+        "negative": jumlah < 0,
+    }
+    invalid = pd.Series(False, index=out.index)
+    for problem, mask in checks.items():
+        report[problem] = int(mask.sum())
+        _add_examples(report, problem, out[mask], out)
+        invalid |= mask
+    if policy != POLICY_REJECT and invalid.any():
+        out, tahun, jumlah = out[~invalid], tahun[~invalid], jumlah[~invalid]
+
+    # Bulan kosong / tidak dikenal -> Januari (sama seperti aturan lama)
+    bulan_num = (
+        out["bulan"].astype(str).str.upper().str.strip()
+        .map(MONTH_MAP).fillna(1).astype("int8")
+    )
+
+    clean = pd.DataFrame(index=out.index)
+    if "nama_kabupaten_kota" in out.columns:
+        clean["nama_kabupaten_kota"] = out["nama_kabupaten_kota"].astype("category")
+
+    clean["kategori_kejahatan"] = out["kategori_kejahatan"].astype(str).str.strip().astype("category")
+    clean["jenis_kelamin"] = out["jenis_kelamin"].astype(str).str.upper().str.strip().astype("category")
+
+    # Nama bulan diturunkan dari bulan_num supaya selalu konsisten & berurutan
+    clean["bulan"] = pd.Categorical.from_codes(
+        bulan_num.to_numpy() - 1,
+        categories=pd.CategoricalDtype(MONTH_ORDER, ordered=True).categories,
+        ordered=True,
+    )
+    clean["bulan_num"] = bulan_num
+    clean["tahun"] = tahun.astype("int16")
+    clean["periode"] = pd.to_datetime(
+        pd.DataFrame({"year": clean["tahun"], "month": clean["bulan_num"], "day": 1})
+    ).astype("datetime64[ns]")
+
+    # Pastikan jumlah narapidana bertipe numerik
+    clean["jumlah_narapidana"] = jumlah.fillna(0).astype("int64")
+
+    clean = resolve_duplicates(clean, policy, report, out)
+    stats["integrity"] = report
+    if policy == POLICY_REJECT and findings_count(report):
+        raise IntegrityError(report)
+
+    # Urutkan per periode agar rapi & mudah diiris per rentang waktu
+    clean = clean.sort_values(
+        ["periode", "kategori_kejahatan", "jenis_kelamin"], kind="stable"
+    ).reset_index(drop=True)
+
+    stats["rows_clean"] = int(len(clean))
+    validate_clean(clean)
+    return clean, stats
+
+
+# =========================================================
+# MANIFEST & PENYIMPANAN
+# =========================================================
+def file_sha256(path: Path) -> str:
+    """
+    Hash isi file (dipakai sebagai identitas versi data).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(out_dir: Path = PREPARED_DIR) -> dict | None:
+    """
+    Membaca manifest hasil ingest. None kalau belum pernah ingest.
+    """
+    path = Path(out_dir) / MANIFEST_FILE_NAME
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _same_file(entry: dict, path: Path) -> bool:
+    # Cek cepat pakai ukuran + mtime, hash hanya dihitung kalau keduanya berubah
+    stat = path.stat()
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    return entry.get("sha256") == file_sha256(path)
+
+
+def is_fresh(manifest: dict | None, source: Path, out_dir: Path = PREPARED_DIR) -> bool:
+    """
+    True kalau manifest masih sesuai dengan sumber (file atau folder) & versi skema.
+    Mode folder: daftar workbook harus sama dan tidak ada yang berubah isinya.
+    """
+    if not manifest or manifest.get("schema_version") != SCHEMA_VERSION:
+        return False
+    if manifest.get("integrity_policy") != DEFAULT_POLICY:
+        return False
+    src = manifest.get("source", {})
+    source = Path(source)
+    if not source.is_dir():
+        return src.get("kind") != SOURCE_FOLDER and _same_file(src, source)
+
+    if src.get("kind") != SOURCE_FOLDER:
+        return False
+    known = {f["path"]: f for f in src.get("files", [])}
+    paths = {_relative(p, source): p for p in discover_workbooks(source, out_dir)}
+    return paths.keys() == known.keys() and all(_same_file(known[rel], p) for rel, p in paths.items())
+
+
+def temp_path(target: Path) -> Path:
+    # Nama sementara unik per pemanggilan (pid + acak): aman kalau beberapa
+    # replika atau beberapa thread satu proses menulis file yang sama bersamaan
+    target = Path(target)
+    return target.with_name(f"{target.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+
+
+# =========================================================
+# PEMBACA EXCEL
+# Parsing workbook adalah langkah ingest paling lambat. Engine dipilih lewat
+# LAPAS_EXCEL_ENGINE:
+#   auto      -> calamine kalau terpasang, selain itu stream (default)
+#   calamine  -> pd.read_excel(engine="calamine"), paket python-calamine
+#   stream    -> openpyxl read-only: baris dibaca berurutan, hanya kolom
+#                RAW_COLUMNS yang diambil, dtype ditentukan sekali per kolom
+#   openpyxl  -> pd.read_excel(engine="openpyxl") seperti semula
+# Engine yang belum terpasang / gagal mem-parse file otomatis jatuh ke engine
+# berikutnya, terakhir openpyxl; kesalahan yang tidak akan hilang dengan engine
+# lain (SchemaError, file tidak ada / tidak bisa dibuka) langsung dilempar.
+# Kesetaraan hasil diuji di tests/test_excel_engines.py, waktu parse dengan
+# bench/excel_benchmark.py.
+# =========================================================
+ENGINE_AUTO = "auto"
+ENGINE_CALAMINE = "calamine"
+ENGINE_STREAM = "stream"
+ENGINE_OPENPYXL = "openpyxl"
+EXCEL_ENGINES = (ENGINE_AUTO, ENGINE_CALAMINE, ENGINE_STREAM, ENGINE_OPENPYXL)
+EXCEL_ENGINE = os.environ.get("LAPAS_EXCEL_ENGINE", ENGINE_AUTO).strip().lower()
+
+# Kolom mentah yang dibaca (kolom lain tidak dipakai normalisasi)
+RAW_COLUMNS = [*RAW_REQUIRED_COLUMNS, "nama_kabupaten_kota"]
+
+
+# Kesalahan parse yang membuat engine berikutnya dicoba (ImportError = engine
+# belum terpasang); selain ini (mis. SchemaError, OSError) langsung dilempar
+_ENGINE_ERRORS = (ImportError, ValueError, KeyError, IndexError, TypeError, AttributeError, zipfile.BadZipFile)
+
+
+def _wanted_column(name) -> bool:
+    return name in RAW_COLUMNS
+
+
+def _read_calamine(source) -> pd.DataFrame:
+    # ImportError dari pandas kalau python-calamine belum terpasang
+    return pd.read_excel(source, engine="calamine", usecols=_wanted_column)
+
+
+def _read_openpyxl(source) -> pd.DataFrame:
+    return pd.read_excel(source, engine="openpyxl", usecols=_wanted_column)
+
+
+def _stream_cell(value):
+    if value is None:
+        return np.nan
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _stream_column(values: list) -> pd.Series:
+    # Inferensi tipe mengikuti read_excel: teks angka ("2024") ikut jadi angka,
+    # angka pecahan yang bulat menjadi int
+    col = pd.Series(values)
+    if col.dtype == object:
+        try:
+            col = pd.to_numeric(col)
+        except (ValueError, TypeError):
+            col = pd.Series([_stream_cell(v) for v in values], dtype=object)
+    if col.dtype == np.float64 and col.notna().all() and (col % 1 == 0).all():
+        col = col.astype("int64")
+    return col
+
+
+def _read_stream(source) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        keep = [(i, name) for i, name in enumerate(header) if _wanted_column(name)]
+        columns = {name: [] for _, name in keep}
+        filled = 0
+        for row in rows:
+            for i, name in keep:
+                columns[name].append(row[i] if i < len(row) else None)
+            if any(v is not None for v in row):
+                filled = len(columns[keep[0][1]]) if keep else 0
+    finally:
+        wb.close()
+    # Baris kosong di akhir sheet dibuang, sama seperti read_excel
+    return pd.DataFrame({name: _stream_column(values[:filled]) for name, values in columns.items()})
+
+
+_EXCEL_READERS = {
+    ENGINE_CALAMINE: _read_calamine,
+    ENGINE_STREAM: _read_stream,
+    ENGINE_OPENPYXL: _read_openpyxl,
+}
+
+
+def _calamine_errors() -> tuple:
+    try:
+        from python_calamine import CalamineError
+    except ImportError:
+        return ()
+    return (CalamineError,)
+
+
+def excel_engines(engine: str = EXCEL_ENGINE) -> list[str]:
+    """
+    Urutan engine yang dicoba untuk pilihan engine; openpyxl selalu jadi cadangan terakhir.
+    """
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Engine Excel tidak dikenal: {engine} (pilih {', '.join(EXCEL_ENGINES)})")
+    first = [ENGINE_CALAMINE, ENGINE_STREAM] if engine == ENGINE_AUTO else [engine]
+    return list(dict.fromkeys([*first, ENGINE_OPENPYXL]))
+
+
+def read_workbook(source, engine: str = EXCEL_ENGINE) -> pd.DataFrame:
+    """
+    Membaca sheet pertama workbook mentah (path atau file-like) dengan engine
+    tercepat yang tersedia. Engine yang dipakai dicatat di df.attrs["excel_engine"].
+    """
+    *fast, fallback = excel_engines(engine)
+    for name in fast:
+        try:
+            df = _EXCEL_READERS[name](source)
+        except SchemaError:
+            raise
+        except _ENGINE_ERRORS + _calamine_errors():
+            # Belum terpasang / tidak bisa mem-parse file ini -> engine berikutnya
+            if hasattr(source, "seek"):
+                source.seek(0)
+            continue
+        df.attrs["excel_engine"] = name
+        return df
+    df = _EXCEL_READERS[fallback](source)
+    df.attrs["excel_engine"] = fallback
+    return df
+
+
+# =========================================================
+# SUMBER: SATU WORKBOOK ATAU SATU FOLDER
+# Mode folder menggabungkan semua workbook .xlsx di bawah satu folder
+# (mis. satu file per bulan / per wilayah) menjadi satu dataset:
+# - workbook baru / berubah di-parse paralel (ProcessPoolExecutor),
+# - hasil parse disimpan per file di data/prepared/parts/<sha>.arrow,
+#   jadi ingest berikutnya hanya mem-parse file yang baru / berubah,
+# - susunan kolom semua workbook wajib sama.
+# Normalisasi & pemeriksaan integritas dijalankan atas data gabungan,
+# sehingga kunci yang sama di dua file terdeteksi sebagai baris kembar
+# (keep_last: file terakhir menurut urutan path yang dipakai).
+# =========================================================
+SOURCE_FOLDER = "folder"
+PARTS_DIR_NAME = "parts"
+
+# Jumlah proses parse paralel (0 / kosong = jumlah CPU)
+INGEST_WORKERS = int(os.environ.get("LAPAS_INGEST_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+
+def discover_workbooks(folder: Path, out_dir: Path = PREPARED_DIR) -> list[Path]:
+    """
+    Semua workbook .xlsx di bawah folder (rekursif, urut path), kecuali
+    folder hasil ingest dan file kunci Excel yang sedang dibuka (~$...).
+    """
+    out_dir = Path(out_dir).resolve()
+    return sorted(
+        p for p in Path(folder).resolve().rglob("*.xlsx")
+        if not p.name.startswith("~$") and out_dir not in p.parents
+    )
+
+
+def _relative(path: Path, folder: Path) -> str:
+    return path.relative_to(Path(folder).resolve()).as_posix()
+
+
+def _parse_part(path: str, part_path: str) -> str:
+    """
+    Dijalankan di proses pool: parse satu workbook lalu simpan kolom mentah
+    yang dipakai ke part_path (Feather). Mengembalikan engine Excel yang dipakai.
+    """
+    df = read_workbook(Path(path))
+    engine = df.attrs["excel_engine"]
+    df = df[[c for c in RAW_COLUMNS if c in df.columns]].reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object:
+            # Isi campuran (angka + teks) disimpan sebagai teks; kosong tetap kosong.
+            # to_numeric saat normalisasi memberi hasil yang sama dengan nilai asli.
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    tmp = temp_path(part_path)
+    feather.write_feather(df, tmp, compression="zstd")
+    tmp.replace(part_path)
+    return engine
+
+
+def _raise_unreadable(rel: str, parse) -> str:
+    try:
+        return parse()
+    except Exception as e:
+        raise SchemaError(f"Workbook {rel} tidak bisa dibaca: {e}") from e
+
+
+def _parse_parts(todo: dict[str, tuple[Path, Path]]) -> dict[str, str]:
+    """
+    Parse workbook {path relatif: (workbook, file part)} secara paralel.
+    Satu file saja (atau satu CPU) dikerjakan langsung tanpa pool.
+    Mengembalikan engine Excel yang dipakai per workbook.
+    """
+    workers = min(INGEST_WORKERS, len(todo))
+    if workers <= 1:
+        return {
+            rel: _raise_unreadable(rel, lambda: _parse_part(str(path), str(part)))
+            for rel, (path, part) in todo.items()
+        }
+    # Part yang sudah selesai tetap tersimpan walau ada workbook lain yang gagal.
+    # Bukan fork: ingest bisa dipanggil dari proses Streamlit / uvicorn yang
+    # multi-thread, dan fork di sana bisa deadlock pada lock yang sedang dipegang
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = {rel: pool.submit(_parse_part, str(path), str(part)) for rel, (path, part) in todo.items()}
+        return {rel: _raise_unreadable(rel, future.result) for rel, future in futures.items()}
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def validate_folder_schema(files: list[dict], frames: list[pd.DataFrame]) -> None:
+    """
+    Semua workbook wajib punya kolom wajib dan susunan kolom yang sama
+    (mis. file tanpa nama_kabupaten_kota akan lolos filter wilayah).
+    """
+    for entry, df in zip(files, frames):
+        missing = [c for c in RAW_REQUIRED_COLUMNS if c not in df.columns]
+        if missing:
+            raise SchemaError(f"{entry['path']}: kolom wajib tidak ditemukan: {', '.join(missing)}")
+    reference = list(frames[0].columns)
+    for entry, df in zip(files[1:], frames[1:]):
+        if list(df.columns) != reference:
+            raise SchemaError(
+                f"Kolom tidak konsisten antar workbook: {files[0]['path']} {reference} "
+                f"!= {entry['path']} {list(df.columns)}"
+            )
+
+
+def read_folder(folder: Path, out_dir: Path = PREPARED_DIR, previous: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Menggabungkan semua workbook di folder menjadi satu DataFrame mentah
+    (+ kolom FILE_COLUMN & ROW_COLUMN). Hasil parse per file dipakai ulang
+    kalau isinya tidak berubah. Mengembalikan (df_raw, info sumber untuk manifest).
+    """
+    folder, out_dir = Path(folder), Path(out_dir)
+    paths = discover_workbooks(folder, out_dir)
+    if not paths:
+        raise SchemaError(f"Tidak ada workbook .xlsx di folder {folder}")
+    parts_dir = out_dir / PARTS_DIR_NAME
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    known = {}
+    if previous and previous.get("source", {}).get("kind") == SOURCE_FOLDER:
+        known = {f["path"]: f for f in previous["source"]["files"]}
+
+    files, todo = [], {}
+    for path in paths:
+        rel = _relative(path, folder)
+        stat = path.stat()
+        old = known.get(rel, {})
+        same = old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns
+        sha = old["sha256"] if same else file_sha256(path)
+        # Part dinamai sesuai isi file: rename / salinan identik tidak di-parse ulang
+        entry = {"path": rel, "sha256": sha, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "part": f"{sha[:16]}.arrow"}
+        if old.get("sha256") == sha and "excel_engine" in old:
+            entry["excel_engine"] = old["excel_engine"]
+        files.append(entry)
+        if not (parts_dir / entry["part"]).exists():
+            todo[rel] = (path, parts_dir / entry["part"])
+
+    for rel, engine in _parse_parts(todo).items():
+        next(e for e in files if e["path"] == rel)["excel_engine"] = engine
+
+    frames = [feather.read_table(parts_dir / entry["part"]).to_pandas() for entry in files]
+    validate_folder_schema(files, frames)
+    for entry, df in zip(files, frames):
+        entry["rows"] = int(len(df))
+        df[FILE_COLUMN] = entry["path"]
+        df[ROW_COLUMN] = np.arange(2, len(df) + 2)
+    df_raw = pd.concat(frames, ignore_index=True)
+
+    # Part milik workbook yang sudah dihapus / berubah tidak dipakai lagi
+    used = {entry["part"] for entry in files}
+    for part in parts_dir.glob("*.arrow"):
+        if part.name not in used:
+            part.unlink(missing_ok=True)
+
+    digest = hashlib.sha256("\n".join(f"{e['path']}:{e['sha256']}" for e in files).encode()).hexdigest()
+    return df_raw, {
+        "kind": SOURCE_FOLDER,
+        "path": str(folder),
+        "sha256": digest,
+        "files": files,
+        "parsed": sorted(todo),
+    }
+
+
+def read_source(source: Path, out_dir: Path = PREPARED_DIR, previous: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Data mentah + info sumber untuk manifest, dari satu workbook atau satu folder.
+    """
+    source = Path(source)
+    if source.is_dir():
+        return read_folder(source, out_dir, previous)
+    stat = source.stat()
+    df = read_workbook(source)
+    return df, {
+        "path": str(source),
+        "sha256": file_sha256(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "excel_engine": df.attrs["excel_engine"],
+    }
+
+
+def data_version_for(sha: str, policy: str = DEFAULT_POLICY) -> str:
+    # Kebijakan integritas ikut menentukan isi data -> bagian dari versi
+    return f"{SCHEMA_VERSION}-{sha[:16]}" + ("" if policy == POLICY_KEEP_LAST else f"-{policy}")
+
+
+def run_ingest(source: Path = DEFAULT_SOURCE, out_dir: Path = PREPARED_DIR, policy: str = DEFAULT_POLICY) -> dict:
+    """
+    Menjalankan ingest penuh dan menulis hasil bersih + cube + manifest.
+    source boleh satu workbook atau satu folder workbook.
+    """
+    # import lokal: engine & snapshots juga mengimpor modul ini
+    from dataclasses import replace
+
+    from engine import build_cube, save_cube
+    from snapshots import revise, save_snapshot
+
+    source = Path(source)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = load_manifest(out_dir)
+    df_raw, source_info = read_source(source, out_dir, previous)
+    clean, stats = clean_frame(df_raw, policy)
+
+    data_version = data_version_for(source_info["sha256"], policy)
+
+    # Revisi per sel dari diff terhadap versi sebelumnya (dibaca sebelum
+    # file bersih lama ditimpa)
+    cube = build_cube(clean)
+    revision, info = revise(previous, clean, cube, data_version, out_dir)
+    cube = replace(cube, revision=revision, lineage=info["lineage"], axes_revision=info["axes_revision"])
+
+    manifest = {
+        "schema_version": SCHEMA_VERSION,
+        "integrity_policy": policy,
+        "data_version": data_version,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": source_info,
+        "clean_file": CLEAN_FILE_NAME,
+        "columns": {c: str(t) for c, t in clean.dtypes.items()},
+        "stats": stats,
+        "last_period": clean["periode"].max().strftime("%Y-%m-%d") if len(clean) else None,
+    }
+
+    # Tulis file data dulu, manifest terakhir (manifest = penanda ingest selesai).
+    # rename() atomic: proses yang masih me-mmap file lama tetap membaca inode lama.
+    tmp = temp_path(out_dir / CLEAN_FILE_NAME)
+    feather.write_feather(clean, tmp, compression="uncompressed")
+    tmp.replace(out_dir / CLEAN_FILE_NAME)
+
+    manifest["cube"] = save_cube(cube, out_dir)
+    manifest["cube"].update(
+        revision=info["revision"], previous_version=info["previous_version"], diff=info["diff"],
+    )
+    save_snapshot(clean, manifest, out_dir)
+
+    tmp = temp_path(out_dir / MANIFEST_FILE_NAME)
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp.replace(out_dir / MANIFEST_FILE_NAME)
+    return manifest
+
+
+def ensure_prepared(source: Path = DEFAULT_SOURCE, out_dir: Path = PREPARED_DIR) -> dict:
+    """
+    Mengembalikan manifest terbaru, menjalankan ingest dulu kalau hasil
+    bersih belum ada atau sudah kedaluwarsa dibanding sumber (file / folder).
+    """
+    manifest = load_manifest(out_dir)
+    if is_fresh(manifest, source, out_dir) and all(
+        name and (Path(out_dir) / name).exists()
+        for name in (
+            manifest["clean_file"], manifest["cube"]["values_file"],
+            manifest["cube"]["rows_file"], manifest["cube"].get("revision_file"),
+        )
+    ):
+        return manifest
+    return run_ingest(source, out_dir)
+
+
+def read_clean(manifest: dict, out_dir: Path = PREPARED_DIR) -> pd.DataFrame:
+    """
+    Memuat hasil bersih (memory-mapped) dan memvalidasi ulang kontrak skemanya.
+    Kolom numerik tanpa null dipetakan langsung dari buffer Arrow tanpa disalin.
+    """
+    table = feather.read_table(Path(out_dir) / manifest["clean_file"], memory_map=True)
+    df = table.to_pandas(split_blocks=True)
+    validate_clean(df)
+    return df
+
+
+if __name__ == "__main__":
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SOURCE
+    m = run_ingest(src)
+    print(f"Ingest selesai: {m['stats']['rows_clean']:,} baris")
+    if m["source"].get("kind") == SOURCE_FOLDER:
+        files = m["source"]["files"]
+        print(f"Sumber       : {len(files)} workbook, {len(m['source']['parsed'])} di-parse ulang")
+    elif m["source"].get("excel_engine"):
+        print(f"Engine Excel : {m['source']['excel_engine']}")
+    print(f"Integritas   : {format_findings(m['stats']['integrity'])} (kebijakan {m['integrity_policy']})")
+    print(f"Versi data   : {m['data_version']} (revisi {m['cube']['revision']})")
+    if m["cube"]["diff"]:
+        d = m["cube"]["diff"]
+        print(
+            f"Perubahan    : {d['added']} baru, {d['removed']} dihapus, {d['changed']} berubah "
+            f"({d['cells']} sel cube, {len(d['periods'])} periode) vs {m['cube']['previous_version']}"
+        )
+    print(f"Output       : {PREPARED_DIR / m['clean_file']}")
@@ -0,0 +1,134 @@
+# =========================================================
+# INSTRUMENTASI WAKTU RERUN
+# Mencatat durasi tiap bagian dashboard (full rerun maupun rerun fragment)
+# ke session_state, supaya terlihat bagian mana yang benar-benar dihitung ulang
+# =========================================================
+import functools
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# Jumlah catatan terakhir yang disimpan per sesi
+MAX_RECORDS = 40
+
+
+def _log() -> list:
+    return st.session_state.setdefault("_perf_log", [])
+
+
+def record(section: str, ms: float) -> None:
+    """
+    Menyimpan satu catatan durasi (milidetik) untuk sebuah bagian.
+    """
+    log = _log()
+    log.append({
+        "waktu": datetime.now().strftime("%H:%M:%S"),
+        "bagian": section,
+        "ms": round(ms, 1),
+    })
+    del log[:-MAX_RECORDS]
+
+
+@contextmanager
+def section_timer(section: str):
+    """
+    Context manager untuk mengukur durasi satu blok kode.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(section, (time.perf_counter() - t0) * 1000)
+
+
+def timed(section: str):
+    """
+    Decorator versi section_timer, dipakai di bawah @st.fragment
+    sehingga rerun fragment tetap tercatat.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section_timer(section):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# =========================================================
+# PAYLOAD HTML PER RERUN
+# Menjumlahkan byte markup HTML mentah (st.markdown unsafe) yang dikirim
+# ke browser dalam satu full rerun
+# =========================================================
+def start_run() -> None:
+    st.session_state["_payload_bytes"] = 0
+    st.session_state["_run_started"] = time.perf_counter()
+    st.session_state["_paint_marks"] = []
+
+
+def add_payload(n_bytes: int) -> None:
+    st.session_state["_payload_bytes"] = st.session_state.get("_payload_bytes", 0) + n_bytes
+
+
+def finish_payload() -> None:
+    """
+    Menyimpan total byte HTML full rerun ini untuk ditampilkan di panel.
+    """
+    st.session_state["_payload_last"] = st.session_state.get("_payload_bytes", 0)
+
+
+# =========================================================
+# URUTAN TAMPIL (PROGRESSIVE RENDERING)
+# Elemen dikirim ke browser begitu dibuat, jadi waktu sejak awal full rerun
+# sampai sebuah bagian selesai ditulis = kapan bagian itu mulai terlihat
+# (diukur di server, belum termasuk latensi jaringan & render browser).
+# "First meaningful paint" = header, filter & kartu KPI sudah terkirim.
+# =========================================================
+def paint_mark(section: str, first_meaningful: bool = False) -> None:
+    """
+    Mencatat kapan sebuah bagian selesai dikirim (ms sejak awal full rerun).
+    Hanya dipanggil dari level script, bukan dari dalam fragment.
+    """
+    started = st.session_state.get("_run_started")
+    if started is None:
+        return
+    ms = (time.perf_counter() - started) * 1000
+    st.session_state.setdefault("_paint_marks", []).append({"bagian": section, "ms": round(ms, 1)})
+    if first_meaningful:
+        record("first meaningful paint", ms)
+        history = st.session_state.setdefault("_ttfmp_history", [])
+        history.append(ms)
+        del history[:-MAX_RECORDS]
+
+
+def render_perf_panel() -> None:
+    """
+    Panel sidebar berisi catatan waktu rerun terbaru.
+    Baris "app (full)" = rerun seluruh script, selebihnya = per bagian/fragment.
+    """
+    log = _log()
+    with st.sidebar.expander("⏱️ Waktu Rerun", expanded=False):
+        if not log:
+            st.caption("Belum ada catatan.")
+            return
+        st.dataframe(list(reversed(log)), use_container_width=True, hide_index=True)
+        history = st.session_state.get("_ttfmp_history", [])
+        if history:
+            ordered = sorted(history)
+            st.caption(
+                f"First meaningful paint (header + filter + KPI): {history[-1]:,.0f} ms; "
+                f"median {ordered[len(ordered) // 2]:,.0f} ms dari {len(history)} full rerun"
+            )
+        marks = st.session_state.get("_paint_marks")
+        if marks:
+            st.caption("Urutan tampil full rerun terakhir (ms sejak awal rerun):")
+            st.dataframe(marks, use_container_width=True, hide_index=True)
+        payload = st.session_state.get("_payload_last")
+        if payload is not None:
+            st.caption(f"HTML terkirim pada full rerun terakhir: {payload:,} byte")
+        st.caption(
+            "Rerun fragment (mis. ubah kapasitas / cari kategori) hanya mencatat "
+            "bagiannya sendiri, tanpa 'app (full)'."
+        )
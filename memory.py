@@ -0,0 +1,347 @@
+# =========================================================
+# AKUNTANSI MEMORI (PER PROSES & PER SESI)
+# Supaya kalau server kehabisan memori terlihat struktur data / sesi mana
+# yang memegang byte paling banyak:
+#
+# - per proses : RSS, data bersih & cube hasil ingest, cache upload,
+#                st.cache_data & file media (tombol unduh, termasuk file
+#                export yang sudah dibuat) milik Streamlit
+# - per sesi   : isi session_state + data upload yang sedang dipakai sesi
+#
+# Angka yang sama diekspor sebagai metrik OpenMetrics lewat endpoint bawaan
+# Streamlit /_stcore/metrics (family lapas_memory_bytes, label scope & name);
+# cache milik Streamlit sendiri sudah ada di family cache_memory_bytes.
+#
+# Untuk mencari kebocoran: tracemalloc dinyalakan dari panel admin (atau
+# LAPAS_TRACEMALLOC=1 sejak start), lalu setiap full rerun mengambil snapshot
+# dan membandingkannya dengan snapshot rerun sebelumnya.
+#
+# Panel admin di sidebar hanya tampil kalau LAPAS_ADMIN=1.
+#
+# Ukuran cache Streamlit & metrik /_stcore/metrics memakai API internal
+# Streamlit (StatsManager berbasis family, GaugeStat, safe_sizeof) yang belum
+# ada di semua versi yang diizinkan requirements.txt; di versi lama bagian itu
+# dilewati (angka cache Streamlit kosong, metrik tidak diekspor).
+# =========================================================
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MEMORY_FAMILY = "lapas_memory_bytes"
+MEMORY_HELP = "Byte yang dipegang struktur data dashboard (scope=process|session)."
+
+ADMIN = os.environ.get("LAPAS_ADMIN", "0") == "1"
+
+# Sesi yang tidak rerun selama ini dianggap sudah tutup
+SESSION_TTL = float(os.environ.get("LAPAS_MEMORY_SESSION_TTL", 1800))
+
+# Kedalaman traceback tracemalloc & jumlah baris diff yang ditampilkan
+TRACEMALLOC_FRAMES = int(os.environ.get("LAPAS_TRACEMALLOC_FRAMES", 1))
+TRACEMALLOC_TOP = 15
+
+# session_state tiap sesi diukur ulang (pympler, mahal) paling sering tiap
+# interval ini; panel admin selalu mengukur sesinya sendiri
+SESSION_SAMPLE_SECONDS = float(os.environ.get("LAPAS_MEMORY_SAMPLE_SECONDS", 60))
+
+if os.environ.get("LAPAS_TRACEMALLOC", "0") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+# =========================================================
+# PENGUKURAN
+# =========================================================
+def process_rss() -> int:
+    """
+    Resident set size proses saat ini (byte).
+    """
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Bukan Linux: pakai puncak RSS (satuan KB di Linux, byte di macOS)
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def frame_bytes(df: pd.DataFrame | None) -> int:
+    # Kolom yang di-memory-map dari file Arrow ikut terhitung (dibagi lewat page cache)
+    return 0 if df is None else int(df.memory_usage(deep=True).sum())
+
+
+def array_bytes(*arrays: np.ndarray | None) -> int:
+    return sum(int(a.nbytes) for a in arrays if a is not None)
+
+
+def sizeof(obj) -> int:
+    """
+    Ukuran rekursif objek Python (pympler bawaan Streamlit); 0 kalau gagal.
+    Streamlit lama tanpa safe_sizeof -> ukuran dangkal sys.getsizeof.
+    """
+    try:
+        from streamlit.runtime.stats import safe_sizeof
+    except ImportError:
+        return sys.getsizeof(obj, 0)
+    return safe_sizeof(obj)
+
+
+def streamlit_cache_usage() -> dict[str, int]:
+    """
+    Byte cache milik Streamlit per jenis/nama cache (st.cache_data per fungsi,
+    file media tombol unduh, file upload). Jenis yang hanya melaporkan jumlah
+    item (session_state & st.cache_resource tanpa
+    server.enableExpensiveMemoryStats) tidak diikutkan. Kosong kalau versi
+    Streamlit belum punya StatsManager berbasis family.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+
+    try:
+        from streamlit.runtime.caching import get_data_cache_stats_provider
+        from streamlit.runtime.stats import CACHE_MEMORY_FAMILY
+
+        if Runtime.exists():
+            stats = Runtime.instance().stats_mgr.get_stats([CACHE_MEMORY_FAMILY]).get(CACHE_MEMORY_FAMILY, [])
+        else:
+            stats = get_data_cache_stats_provider().get_stats().get(CACHE_MEMORY_FAMILY, [])
+        expensive = config.get_option("server.enableExpensiveMemoryStats")
+    except (ImportError, TypeError, AttributeError, RuntimeError):
+        return {}
+    counts_only = set() if expensive else {"st_session_state", "st_cache_resource"}
+    usage: dict[str, int] = {}
+    for stat in stats:
+        if stat.category_name in counts_only:
+            continue
+        name = f"{stat.category_name}:{stat.cache_name}" if stat.cache_name else stat.category_name
+        usage[name] = usage.get(name, 0) + int(stat.byte_length)
+    return usage
+
+
+def session_state_usage() -> dict[str, int]:
+    """
+    Byte per kunci session_state sesi ini (terbesar dulu).
+    """
+    usage = {key: sizeof(value) for key, value in st.session_state.to_dict().items()}
+    return dict(sorted(usage.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def current_session_id() -> str:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "-"
+
+
+# =========================================================
+# REGISTRY PER PROSES (JUGA StatsProvider UNTUK /_stcore/metrics)
+# =========================================================
+class MemoryAccount:
+    """
+    Sumber memori bernama (fungsi pengukur) + catatan per sesi untuk satu proses.
+    Didaftarkan ke StatsManager Streamlit sehingga ikut diekspor sebagai metrik.
+    """
+
+    stats_families = (MEMORY_FAMILY,)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: dict[str, callable] = {}
+        self._sessions: dict[str, dict] = {}
+        # Snapshot tracemalloc full rerun terakhir (dipakai bersama semua sesi)
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.snapshot_at: str | None = None
+
+    def track(self, name: str, measure) -> None:
+        """
+        Mendaftarkan / mengganti sumber memori; measure() -> byte.
+        """
+        with self._lock:
+            self._sources[name] = measure
+
+    def process_usage(self) -> dict[str, int]:
+        with self._lock:
+            sources = dict(self._sources)
+        usage = {"rss": process_rss()}
+        usage.update({name: int(measure()) for name, measure in sources.items()})
+        usage["session_state (semua sesi)"] = sum(s["session_state"] for s in self.session_usage().values())
+        return usage
+
+    def sample_due(self, session_id: str) -> bool:
+        """
+        True kalau session_state sesi ini perlu diukur ulang.
+        """
+        with self._lock:
+            sampled = self._sessions.get(session_id, {}).get("_sampled")
+        return sampled is None or time.monotonic() - sampled >= SESSION_SAMPLE_SECONDS
+
+    def record_session(self, session_id: str, usage: dict[str, int]) -> None:
+        """
+        Mencatat pemakaian sesi; tanpa "session_state" di usage, hasil ukur
+        sebelumnya dipakai lagi.
+        """
+        now = time.monotonic()
+        with self._lock:
+            previous = self._sessions.get(session_id, {})
+            if "session_state" in usage:
+                sampled = now
+            else:
+                sampled = previous.get("_sampled")
+                usage = {"session_state": previous.get("session_state", 0), **usage}
+            self._sessions[session_id] = {
+                **usage, "_seen": now, "_sampled": sampled, "terakhir": datetime.now().strftime("%H:%M:%S"),
+            }
+            for sid in [s for s, u in self._sessions.items() if now - u["_seen"] > SESSION_TTL]:
+                del self._sessions[sid]
+
+    def session_usage(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                sid: {k: v for k, v in u.items() if not k.startswith("_")} for sid, u in self._sessions.items()
+            }
+
+    def get_stats(self, family_names=None) -> dict:
+        """
+        StatsProvider: satu gauge per sumber proses dan per sesi.
+        """
+        from streamlit.runtime.stats import GaugeStat
+
+        def gauge(value: int, **labels) -> GaugeStat:
+            return GaugeStat(MEMORY_FAMILY, int(value), labels, "bytes", MEMORY_HELP)
+
+        stats = [gauge(v, scope="process", name=k) for k, v in self.process_usage().items()]
+        for sid, usage in self.session_usage().items():
+            stats += [gauge(v, scope="session", session=sid[:8], name=k) for k, v in usage.items() if k != "terakhir"]
+        return {MEMORY_FAMILY: stats}
+
+
+def register_metrics(account: MemoryAccount) -> bool:
+    """
+    Mendaftarkan account ke /_stcore/metrics. False kalau tidak berjalan di
+    server Streamlit (mis. AppTest / bare mode) atau versi Streamlit belum
+    mengenal provider berbasis family (GaugeStat).
+    """
+    from streamlit.runtime import Runtime
+
+    try:
+        from streamlit.runtime.stats import GaugeStat  # noqa: F401
+    except ImportError:
+        return False
+    if not Runtime.exists():
+        return False
+    Runtime.instance().stats_mgr.register_provider(account)
+    return True
+
+
+# =========================================================
+# TRACEMALLOC: DIFF ANTAR FULL RERUN
+# =========================================================
+def tracemalloc_diff(account: MemoryAccount, top: int = TRACEMALLOC_TOP) -> list[dict] | None:
+    """
+    Snapshot sekarang dibanding snapshot full rerun sebelumnya (selisih
+    terbesar, naik maupun turun, di atas). None kalau tracemalloc tidak aktif.
+    """
+    if not tracemalloc.is_tracing():
+        account.snapshot = account.snapshot_at = None
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+    ])
+    previous, account.snapshot = account.snapshot, snapshot
+    account.snapshot_at = datetime.now().strftime("%H:%M:%S")
+    if previous is None:
+        return []
+    return [
+        {
+            "lokasi": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "selisih KB": round(stat.size_diff / 1024, 1),
+            "selisih blok": stat.count_diff,
+            "total KB": round(stat.size / 1024, 1),
+        }
+        for stat in snapshot.compare_to(previous, "lineno")[:top]
+    ]
+
+
+def _toggle_tracemalloc() -> None:
+    if st.session_state["_mem_trace"] and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    elif not st.session_state["_mem_trace"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+# =========================================================
+# PANEL ADMIN
+# =========================================================
+def _mb(n: int) -> float:
+    return round(n / 1024 / 1024, 2)
+
+
+def render_memory_panel(account: MemoryAccount, session_extra: dict[str, int] | None = None) -> None:
+    """
+    Mencatat pemakaian sesi ini ke account, lalu (kalau LAPAS_ADMIN=1)
+    menampilkan panel memori di sidebar. Dipanggil di akhir full rerun;
+    session_state hanya diukur untuk panel admin atau sekali per
+    SESSION_SAMPLE_SECONDS, bukan di setiap interaksi.
+    """
+    session_id = current_session_id()
+    session = dict(session_extra or {})
+    state = session_state_usage() if ADMIN or account.sample_due(session_id) else None
+    if state is not None:
+        session["session_state"] = sum(state.values())
+    account.record_session(session_id, session)
+    if not ADMIN:
+        return
+
+    with st.sidebar.expander("🧠 Memori (admin)", expanded=False):
+        process = account.process_usage()
+        sessions = account.session_usage()
+        c1, c2 = st.columns(2)
+        c1.metric("RSS proses", f"{_mb(process['rss']):,.1f} MB")
+        c2.metric("Sesi aktif", f"{len(sessions):,}")
+
+        st.caption("Per proses (MB)")
+        rows = [{"sumber": k, "MB": _mb(v)} for k, v in process.items() if k != "rss"]
+        rows += [{"sumber": k, "MB": _mb(v)} for k, v in streamlit_cache_usage().items()]
+        st.dataframe(sorted(rows, key=lambda r: r["MB"], reverse=True), use_container_width=True, hide_index=True)
+
+        st.caption("Per sesi (MB)")
+        st.dataframe(
+            [
+                {"sesi": sid[:8], **{k: (_mb(v) if isinstance(v, int) else v) for k, v in u.items()}}
+                for sid, u in sorted(sessions.items(), key=lambda kv: -sum(
+                    v for v in kv[1].values() if isinstance(v, int)
+                ))
+            ],
+            use_container_width=True, hide_index=True,
+        )
+        st.caption("session_state sesi ini, kunci terbesar (KB)")
+        st.dataframe(
+            [{"kunci": k, "KB": round(v / 1024, 1)} for k, v in list(state.items())[:10]],
+            use_container_width=True, hide_index=True,
+        )
+
+        st.toggle(
+            "Lacak alokasi (tracemalloc)", value=tracemalloc.is_tracing(), key="_mem_trace",
+            on_change=_toggle_tracemalloc,
+            help="Memperlambat proses selama aktif; matikan setelah selesai.",
+        )
+        previous_at = account.snapshot_at
+        diff = tracemalloc_diff(account)
+        if diff is None:
+            st.caption("tracemalloc tidak aktif.")
+        elif not diff:
+            st.caption("Snapshot pertama diambil; rerun lagi untuk melihat selisih.")
+        else:
+            st.caption(f"Selisih alokasi terbesar sejak full rerun {previous_at}:")
+            st.dataframe(diff, use_container_width=True, hide_index=True)
+        st.caption(f"Metrik: /_stcore/metrics (family {MEMORY_FAMILY}).")
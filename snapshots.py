@@ -0,0 +1,316 @@
+# =========================================================
+# SNAPSHOT VERSI DATA & DIFF ANTAR VERSI
+# Setiap ingest menyimpan salinan data bersih per versi di
+# data/prepared/snapshots, sehingga workbook koreksi bisa dibandingkan
+# dengan versi sebelumnya baris demi baris.
+#
+# Diff di-key dengan (periode, jenis_kelamin, kategori_kejahatan,
+# nama_kabupaten_kota). Sel cube yang tersentuh diff mendapat nomor
+# revisi baru; sel lain mewarisi revisi lamanya. Kunci result cache
+# memakai revisi tertinggi di sel yang dicakup filter (lihat
+# engine.cache_version), jadi agregat & grafik yang tidak tersentuh
+# koreksi tetap dipakai ulang, tidak ikut dihitung ulang.
+#
+# Cara pakai:
+#   python snapshots.py                 -> daftar snapshot
+#   python snapshots.py LAMA BARU       -> ringkasan diff dua versi
+# =========================================================
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from ingest import MANIFEST_FILE_NAME, PREPARED_DIR, SCHEMA_VERSION, temp_path
+
+SNAPSHOT_DIR_NAME = "snapshots"
+INDEX_FILE_NAME = "index.json"
+REVISION_FILE_NAME = "cube_revision.npy"
+
+# Banyaknya snapshot yang disimpan (yang paling lama dibuang)
+SNAPSHOT_KEEP = int(os.environ.get("LAPAS_SNAPSHOT_KEEP", 10))
+
+# Kunci baris untuk diff (nama_kabupaten_kota opsional, seperti di skema bersih)
+DIFF_KEY = ["periode", "jenis_kelamin", "kategori_kejahatan", "nama_kabupaten_kota"]
+
+# Status baris hasil diff
+STATUS_ADDED = "baru"
+STATUS_REMOVED = "dihapus"
+STATUS_CHANGED = "berubah"
+
+
+# =========================================================
+# PENYIMPANAN SNAPSHOT
+# =========================================================
+def snapshot_dir(out_dir: Path = PREPARED_DIR) -> Path:
+    return Path(out_dir) / SNAPSHOT_DIR_NAME
+
+
+def _snapshot_path(version: str, out_dir: Path) -> Path:
+    return snapshot_dir(out_dir) / f"{version}.arrow"
+
+
+def load_index(out_dir: Path = PREPARED_DIR) -> list[dict]:
+    """
+    Daftar snapshot (lama -> baru). List kosong kalau belum ada.
+    """
+    path = snapshot_dir(out_dir) / INDEX_FILE_NAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = temp_path(path)
+    write(tmp)
+    tmp.replace(path)
+
+
+def save_snapshot(clean: pd.DataFrame, manifest: dict, out_dir: Path = PREPARED_DIR) -> list[dict]:
+    """
+    Menyimpan data bersih satu versi (Feather terkompresi) dan memperbarui
+    index. Snapshot di luar SNAPSHOT_KEEP terbaru dihapus.
+    """
+    folder = snapshot_dir(out_dir)
+    folder.mkdir(parents=True, exist_ok=True)
+    version = manifest["data_version"]
+
+    path = _snapshot_path(version, out_dir)
+    if not path.exists():
+        _write_atomic(path, lambda tmp: feather.write_feather(clean, tmp, compression="zstd"))
+
+    index = [e for e in load_index(out_dir) if e["data_version"] != version]
+    index.append({
+        "data_version": version,
+        "created_at": manifest["created_at"],
+        "source": Path(manifest["source"]["path"]).name,
+        "rows": int(len(clean)),
+        "total": int(clean["jumlah_narapidana"].sum()),
+        "last_period": manifest.get("last_period"),
+        "revision": manifest["cube"].get("revision"),
+    })
+    for old in index[:-SNAPSHOT_KEEP]:
+        _snapshot_path(old["data_version"], out_dir).unlink(missing_ok=True)
+    index = index[-SNAPSHOT_KEEP:]
+
+    _write_atomic(
+        folder / INDEX_FILE_NAME,
+        lambda tmp: tmp.write_text(json.dumps(index, indent=2), encoding="utf-8"),
+    )
+    return index
+
+
+def read_snapshot(version: str, out_dir: Path = PREPARED_DIR) -> pd.DataFrame | None:
+    """
+    Data bersih versi tertentu. Untuk versi yang sedang aktif dan belum punya
+    snapshot (hasil ingest sebelum fitur ini ada) dibaca dari file bersih.
+    """
+    path = _snapshot_path(version, out_dir)
+    if path.exists():
+        return feather.read_feather(path)
+
+    manifest_path = Path(out_dir) / MANIFEST_FILE_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    clean_path = Path(out_dir) / manifest.get("clean_file", "")
+    if manifest.get("data_version") == version and clean_path.is_file():
+        return feather.read_feather(clean_path)
+    return None
+
+
+# =========================================================
+# DIFF BARIS
+# =========================================================
+def _keyed_totals(df: pd.DataFrame, key: list[str]) -> pd.DataFrame:
+    """
+    Jumlah & banyak baris per kunci. Baris kembar dijumlahkan dulu supaya
+    diff tidak bergantung pada urutan baris di workbook.
+    """
+    out = (
+        df.groupby(key, observed=True, sort=False)["jumlah_narapidana"]
+        .agg(jumlah="sum", baris="size")
+        .reset_index()
+    )
+    # Kamus kategori dua versi bisa berbeda -> samakan sebagai teks sebelum merge
+    for col in key:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(str)
+    return out
+
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Baris yang berbeda antara dua versi data bersih.
+    Kolom: kunci diff, jumlah_lama, jumlah_baru, selisih, status.
+    Baris dengan jumlah sama tetapi banyak baris sumbernya berubah
+    (baris kembar) juga dihitung berubah.
+    """
+    key = [c for c in DIFF_KEY if c in old.columns and c in new.columns]
+    merged = _keyed_totals(old, key).merge(
+        _keyed_totals(new, key), on=key, how="outer", suffixes=("_lama", "_baru"), indicator=True,
+    )
+    both = merged["_merge"].to_numpy() == "both"
+    changed = both & (
+        (merged["jumlah_lama"].to_numpy() != merged["jumlah_baru"].to_numpy())
+        | (merged["baris_lama"].to_numpy() != merged["baris_baru"].to_numpy())
+    )
+    diff = merged[~both | changed].copy()
+
+    diff["status"] = np.select(
+        [diff["_merge"].to_numpy() == "left_only", diff["_merge"].to_numpy() == "right_only"],
+        [STATUS_REMOVED, STATUS_ADDED],
+        STATUS_CHANGED,
+    )
+    diff["jumlah_lama"] = diff["jumlah_lama"].fillna(0).astype("int64")
+    diff["jumlah_baru"] = diff["jumlah_baru"].fillna(0).astype("int64")
+    diff["selisih"] = diff["jumlah_baru"] - diff["jumlah_lama"]
+    return (
+        diff[[*key, "jumlah_lama", "jumlah_baru", "selisih", "status"]]
+        .sort_values(key, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def diff_summary(diff: pd.DataFrame) -> dict:
+    """
+    Ringkasan diff untuk manifest / tampilan.
+    """
+    status = diff["status"].value_counts()
+    return {
+        "added": int(status.get(STATUS_ADDED, 0)),
+        "removed": int(status.get(STATUS_REMOVED, 0)),
+        "changed": int(status.get(STATUS_CHANGED, 0)),
+        "net": int(diff["selisih"].sum()),
+        "periods": sorted(diff["periode"].dt.strftime("%Y-%m").unique().tolist()),
+    }
+
+
+def period_changes(diff: pd.DataFrame) -> pd.DataFrame:
+    """
+    Banyak baris berubah & selisih jumlah per periode.
+    """
+    return (
+        diff.assign(periode=diff["periode"].dt.strftime("%Y-%m"))
+        .groupby("periode", sort=True)
+        .agg(baris=("status", "size"), selisih=("selisih", "sum"))
+        .reset_index()
+    )
+
+
+# =========================================================
+# REVISI SEL CUBE
+# =========================================================
+def touched_cells(diff: pd.DataFrame, cube) -> np.ndarray | None:
+    """
+    Mask sel cube (kategori, gender, tahun, bulan) yang tersentuh diff.
+    None kalau ada label di diff yang tidak dikenal sumbu cube (sumbu
+    berubah -> semua sel harus dianggap tersentuh).
+    """
+    mask = np.zeros(cube.values.shape, dtype=bool)
+    if diff.empty:
+        return mask
+
+    cats = pd.Index(cube.categories).get_indexer(diff["kategori_kejahatan"])
+    genders = pd.Index(cube.genders).get_indexer(diff["jenis_kelamin"])
+    years = pd.Index(np.asarray(cube.years)).get_indexer(diff["periode"].dt.year)
+    months = diff["periode"].dt.month.to_numpy() - 1
+    if (cats < 0).any() or (genders < 0).any() or (years < 0).any():
+        return None
+    mask[cats, genders, years, months] = True
+    return mask
+
+
+def _previous_state(prev: dict, out_dir: Path) -> tuple[str, int, int, np.ndarray | None]:
+    """
+    (lineage, revisi, revisi sumbu, array revisi) versi sebelumnya.
+    Manifest lama tanpa info revisi dianggap revisi 1 dari garis versinya sendiri.
+    """
+    meta = prev.get("cube", {})
+    path = Path(out_dir) / meta.get("revision_file", REVISION_FILE_NAME)
+    revision = None
+    if "revision_file" in meta and path.exists():
+        revision = np.load(path)
+    return (
+        meta.get("lineage", prev["data_version"]),
+        int(meta.get("revision", 1)),
+        int(meta.get("axes_revision", 1)),
+        revision,
+    )
+
+
+def revise(prev: dict | None, clean: pd.DataFrame, cube, data_version: str,
+           out_dir: Path = PREPARED_DIR) -> tuple[np.ndarray, dict]:
+    """
+    Menentukan array revisi per sel untuk versi data baru.
+
+    Mengembalikan (array revisi, info) dengan info berisi lineage, revision,
+    axes_revision, previous_version dan ringkasan diff (None kalau tidak
+    ada versi sebelumnya yang bisa dibandingkan).
+    """
+    fresh = (
+        np.ones(cube.values.shape, dtype=np.int32),
+        {"lineage": data_version, "revision": 1, "axes_revision": 1,
+         "previous_version": None, "diff": None},
+    )
+    if not prev or prev.get("schema_version") != SCHEMA_VERSION:
+        return fresh
+
+    lineage, rev, axes_rev, prev_revision = _previous_state(prev, out_dir)
+    prev_meta = prev.get("cube", {})
+    same_axes = (
+        prev_meta.get("categories") == list(cube.categories)
+        and prev_meta.get("genders") == list(cube.genders)
+        and prev_meta.get("years") == [int(y) for y in cube.years]
+    )
+
+    if prev["data_version"] == data_version:
+        # Ingest ulang file yang sama (mis. file revisi hilang): revisi tetap
+        if prev_revision is None or not same_axes:
+            prev_revision = np.full(cube.values.shape, rev, dtype=np.int32)
+        return prev_revision, {
+            "lineage": lineage, "revision": rev, "axes_revision": axes_rev,
+            "previous_version": prev_meta.get("previous_version"), "diff": prev_meta.get("diff"),
+        }
+
+    old = read_snapshot(prev["data_version"], out_dir)
+    if old is None:
+        return fresh
+
+    diff = diff_frames(old, clean)
+    rev += 1
+    touched = touched_cells(diff, cube) if same_axes else None
+    if touched is None or prev_revision is None or prev_revision.shape != cube.values.shape:
+        # Sumbu berubah / revisi lama tidak ada: semua sel dianggap tersentuh
+        revision = np.full(cube.values.shape, rev, dtype=np.int32)
+        if not same_axes:
+            axes_rev = rev
+    else:
+        revision = prev_revision.copy()
+        revision[touched] = rev
+
+    return revision, {
+        "lineage": lineage, "revision": rev, "axes_revision": axes_rev,
+        "previous_version": prev["data_version"],
+        "diff": {**diff_summary(diff), "cells": int((revision == rev).sum())},
+    }
+
+
+if __name__ == "__main__":
+    index = load_index()
+    if len(sys.argv) == 3:
+        old, new = read_snapshot(sys.argv[1]), read_snapshot(sys.argv[2])
+        if old is None or new is None:
+            sys.exit("Snapshot tidak ditemukan")
+        d = diff_frames(old, new)
+        print(json.dumps(diff_summary(d), indent=2))
+        print(d.to_string(index=False, max_rows=50))
+    else:
+        for e in index:
+            print(f"{e['data_version']}  r{e.get('revision')}  {e['created_at']}  "
+                  f"{e['rows']:>7,} baris  total {e['total']:,}  ({e['source']})")
@@ -0,0 +1,5 @@
+# Modul dashboard ada di root repo (bukan paket), jadi root dimasukkan ke sys.path
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,149 @@
+# =========================================================
+# UJI API (api.py)
+# Aplikasi ASGI dipanggil langsung (scope / receive / send), tanpa server
+# dan tanpa klien HTTP. Data diambil dari ingest workbook repo ke folder
+# sementara, jadi data/prepared/ dan result cache milik dashboard tidak tersentuh.
+# =========================================================
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+import api
+from cache_store import ResultCache
+from engine import available_periods, open_cube
+from ingest import DEFAULT_SOURCE, read_clean, run_ingest
+
+
+class FixedState:
+    """Pengganti DataState: satu versi data tetap."""
+
+    def __init__(self, manifest, cube, clean):
+        self.manifest, self.cube, self._clean = manifest, cube, clean
+
+    def current(self):
+        return self.manifest, self.cube
+
+    def clean(self, manifest):
+        return self._clean
+
+
+@pytest.fixture(scope="module")
+def prepared(tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp("prepared")
+    manifest = run_ingest(DEFAULT_SOURCE, out_dir)
+    return FixedState(manifest, open_cube(manifest["cube"], out_dir), read_clean(manifest, out_dir))
+
+
+@pytest.fixture(autouse=True)
+def state(prepared, monkeypatch):
+    monkeypatch.setattr(api, "STATE", prepared)
+    monkeypatch.setattr(api, "CACHE", ResultCache())
+    return prepared
+
+
+def call(path: str, params=None, headers=None) -> tuple[int, dict, bytes]:
+    """GET ke aplikasi ASGI; mengembalikan (status, header, body)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(params or {}, doseq=True).encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "server": ("test", 80), "client": ("test", 1234),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(api.app(scope, receive, send))
+    start = sent[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], headers, body
+
+
+def error_of(params) -> str:
+    status, _, body = call("/api/kpi", params)
+    assert status == 400
+    return json.loads(body)["error"]
+
+
+# =========================================================
+# ETAG / IF-NONE-MATCH
+# =========================================================
+def test_etag_and_not_modified(state):
+    status, headers, body = call("/api/meta")
+    assert status == 200
+    assert headers["x-data-version"] == state.manifest["data_version"]
+    assert json.loads(body)["filter"]["period"] == available_periods(state.cube)
+
+    etag = headers["etag"]
+    for header in (etag, f"W/{etag}", f'"lain", {etag}', "*"):
+        status, again, body = call("/api/meta", headers={"If-None-Match": header})
+        assert status == 304
+        assert body == b""
+        assert again["etag"] == etag
+
+    status, _, _ = call("/api/meta", headers={"If-None-Match": '"lain"'})
+    assert status == 200
+
+
+def test_etag_follows_filter(state):
+    crime = state.cube.categories[0]
+    _, all_headers, _ = call("/api/kpi")
+    _, one_headers, body = call("/api/kpi", {"crime": crime})
+    assert all_headers["etag"] != one_headers["etag"]
+    assert json.loads(body)["filter"]["crime"] == [crime]
+
+    # Urutan parameter multi-select tidak mengubah ETag
+    a, b = state.cube.categories[:2]
+    _, ab, _ = call("/api/kategori", {"crime": [a, b]})
+    _, ba, _ = call("/api/kategori", {"crime": [b, a]})
+    assert ab["etag"] == ba["etag"]
+
+
+# =========================================================
+# VALIDASI FILTER
+# =========================================================
+def test_filter_validation():
+    assert "gender tidak dikenal" in error_of({"gender": "X"})
+    assert "crime tidak dikenal" in error_of({"crime": "BUKAN-KATEGORI"})
+    assert "year harus angka" in error_of({"year": "dua ribu"})
+    assert "month tidak dikenal" in error_of({"month": "Bulan13"})
+    assert "capacity minimal 1" in error_of({"capacity": 0})
+    assert "capacity harus angka" in error_of({"capacity": "banyak"})
+    assert "YYYY-MM" in error_of({"period_start": "2024-13"})
+    assert "YYYY-MM" in error_of({"period_end": "2024/01"})
+
+
+def test_period_range_validation(state):
+    periods = available_periods(state.cube)
+    first, last = periods[0], periods[-1]
+
+    assert "harus sebelum period_end" in error_of({"period_start": last, "period_end": first})
+    assert f"setelah periode terakhir data ({last})" in error_of({"period_start": "2999-01"})
+    assert f"sebelum periode pertama data ({first})" in error_of({"period_end": "1900-01"})
+
+    # Rentang yang melebar melewati data tetap sah (dipotong ke data)
+    status, _, body = call("/api/kpi", {"period_start": "1900-01", "period_end": "2999-12"})
+    assert status == 200
+    assert json.loads(body)["filter"]["period"] is None
+
+    status, _, body = call("/api/periode", {"period_start": last})
+    assert status == 200
+    assert json.loads(body)["filter"]["period"] == [last, last]
+
+
+def test_export_csv_streams_filtered_rows(state):
+    crime = state.cube.categories[0]
+    status, headers, body = call("/api/export.csv", {"crime": crime})
+    assert status == 200
+    assert headers["content-type"].startswith("text/csv")
+    lines = body.decode("utf-8").strip().splitlines()
+    expected = int((state._clean["kategori_kejahatan"] == crime).sum())
+    assert len(lines) == expected + 1
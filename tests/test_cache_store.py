@@ -0,0 +1,168 @@
+# =========================================================
+# UJI RESULT CACHE (cache_store.py)
+# Redis diuji dengan stand-in lokal (fakeredis) lewat parameter client,
+# tanpa server sungguhan.
+# =========================================================
+import sys
+import time
+
+import pytest
+
+import cache_store
+from cache_store import (
+    CODE_VERSION, NullBackend, RedisBackend, ResultCache, SQLiteBackend, cache_from_env, make_key,
+)
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisBackend(client=fakeredis.FakeRedis(), prefix="test:")
+
+
+def test_make_key_is_canonical_and_versioned():
+    a = make_key("agg:kpi", "v1", {"crime": ["A"], "year": [2024]})
+    b = make_key("agg:kpi", "v1", {"year": [2024], "crime": ["A"]})
+    assert a == b
+    assert a.startswith(f"{CODE_VERSION}:agg:kpi:v1:")
+    assert make_key("agg:kpi", "v2", {"crime": ["A"], "year": [2024]}) != a
+
+
+def test_code_version_override(monkeypatch):
+    monkeypatch.setenv("LAPAS_CACHE_CODE_VERSION", "abc123")
+    assert cache_store._code_version() == f"{cache_store.CACHE_SCHEMA_VERSION}-abc123"
+
+
+def test_redis_get_set_delete(redis_backend):
+    assert redis_backend.get("k") is None
+    redis_backend.set("k", b"isi", ttl=60)
+    assert redis_backend.get("k") == b"isi"
+    assert redis_backend.stats()["entries"] == 1
+    assert redis_backend.delete(["k", "tidak-ada"]) == 1
+    assert redis_backend.get("k") is None
+    assert redis_backend.delete([]) == 0
+
+
+def test_redis_ttl_expiry(redis_backend):
+    redis_backend.set("k", b"isi", ttl=0.05)
+    assert redis_backend.get("k") == b"isi"
+    time.sleep(0.15)
+    assert redis_backend.get("k") is None
+
+
+def test_redis_clear_only_own_prefix(redis_backend):
+    redis_backend.client.set("lain:k", b"x")
+    redis_backend.set("a", b"1", ttl=60)
+    redis_backend.set("b", b"2", ttl=60)
+    redis_backend.clear()
+    assert redis_backend.stats()["entries"] == 0
+    assert redis_backend.client.get("lain:k") == b"x"
+
+
+def test_result_cache_on_redis(redis_backend):
+    cache = ResultCache(redis_backend, ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or {"total": 42}  # noqa: E731
+    assert cache.get_or_compute("agg:kpi", "v1", {"crime": ["A"]}, compute) == {"total": 42}
+    assert cache.get_or_compute("agg:kpi", "v1", {"crime": ["A"]}, compute) == {"total": 42}
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_redis_unsigned_or_foreign_blobs_are_not_unpickled(redis_backend):
+    import pickle
+
+    class Boom:
+        def __reduce__(self):
+            return (pytest.fail, ("blob tanpa tanda tangan sah di-unpickle",))
+
+    key = make_key("agg:kpi", "v1", None)
+    redis_backend.set(key, pickle.dumps(Boom()), ttl=60)
+    cache = ResultCache(redis_backend, secret=b"rahasia")
+    assert cache.get(key) is cache_store.MISSING
+
+    # Replika lain dengan kunci berbeda juga tidak dipercaya
+    ResultCache(redis_backend, secret=b"lain").set(key, {"total": 1})
+    assert cache.get(key) is cache_store.MISSING
+    assert cache.stats()["rejected"] == 2
+
+    # Blob sah tidak bisa dipindah ke kunci entri lain
+    cache.set(key, {"total": 1})
+    other = make_key("agg:kpi", "v2", None)
+    redis_backend.set(other, redis_backend.get(key), ttl=60)
+    assert cache.get(key) == {"total": 1}
+    assert cache.get(other) is cache_store.MISSING
+
+
+def test_sqlite_secret_file_shared_between_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("LAPAS_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("LAPAS_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.delenv("LAPAS_CACHE_SECRET", raising=False)
+    a, b = cache_from_env(), cache_from_env()
+    a.set("k", [1, 2, 3])
+    assert b.get("k") == [1, 2, 3]
+    assert (tmp_path / "cache.sqlite.key").stat().st_mode & 0o077 == 0
+
+
+def test_null_backend_fallback_without_redis_package(monkeypatch):
+    monkeypatch.setenv("LAPAS_CACHE_BACKEND", "redis")
+    monkeypatch.setitem(sys.modules, "redis", None)
+    cache = cache_from_env()
+    assert isinstance(cache.backend, NullBackend)
+    assert cache.get_or_compute("agg:kpi", "v1", None, lambda: 7) == 7
+    assert cache.misses == 1
+
+
+def test_backend_errors_do_not_fail_compute():
+    class Broken:
+        name = "broken"
+
+        def get(self, key):
+            raise ConnectionError("server mati")
+
+        def set(self, key, blob, ttl):
+            raise ConnectionError("server mati")
+
+    cache = ResultCache(Broken())
+    assert cache.get_or_compute("agg:kpi", "v1", None, lambda: 7) == 7
+    assert cache.errors == 2
+
+
+def test_sqlite_size_tracking_and_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, "ACCESS_RESOLUTION", 0.0)
+    backend = SQLiteBackend(tmp_path / "cache.sqlite", max_bytes=250)
+    backend.set("a", b"x" * 100, ttl=60)
+    backend.set("b", b"x" * 100, ttl=60)
+    assert backend.stats()["bytes"] == 200
+    backend.set("a", b"x" * 50, ttl=60)
+    assert backend.stats()["bytes"] == 150
+    backend.get("a")
+    backend.set("c", b"x" * 150, ttl=60)
+    # "b" paling lama tidak diakses -> dibuang
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.stats()["bytes"] == 200
+    backend.delete(["a"])
+    assert backend.stats() | {"path": None} == {
+        "backend": "sqlite", "path": None, "entries": 1, "bytes": 150, "max_bytes": 250,
+    }
+
+
+def test_sqlite_ttl_expiry(tmp_path):
+    backend = SQLiteBackend(tmp_path / "cache.sqlite")
+    backend.set("k", b"isi", ttl=0.05)
+    assert backend.get("k") == b"isi"
+    time.sleep(0.1)
+    assert backend.get("k") is None
+    assert backend.stats()["bytes"] == 0
+
+
+def test_sqlite_hit_does_not_rewrite_access_time(tmp_path):
+    backend = SQLiteBackend(tmp_path / "cache.sqlite")
+    backend.set("k", b"isi", ttl=60)
+    conn = backend._conn()
+    before = conn.total_changes
+    for _ in range(10):
+        assert backend.get("k") == b"isi"
+    assert conn.total_changes == before
+
@@ -0,0 +1,100 @@
+# =========================================================
+# UJI ENGINE PEMBACA EXCEL (ingest.read_workbook)
+# Semua engine harus menghasilkan data mentah & data bersih yang identik
+# dengan openpyxl pada workbook bawaan; engine yang tidak tersedia / gagal
+# jatuh ke engine berikutnya. Waktu parse: bench/excel_benchmark.py.
+# =========================================================
+import io
+
+import pandas as pd
+import pytest
+
+import ingest
+from ingest import (
+    DEFAULT_FILE, ENGINE_AUTO, ENGINE_CALAMINE, ENGINE_OPENPYXL, ENGINE_STREAM, SchemaError,
+    clean_frame, read_workbook,
+)
+
+pytestmark = pytest.mark.skipif(not DEFAULT_FILE.exists(), reason="workbook bawaan tidak ada")
+
+
+@pytest.fixture(scope="module")
+def reference():
+    df = read_workbook(DEFAULT_FILE, ENGINE_OPENPYXL)
+    assert df.attrs["excel_engine"] == ENGINE_OPENPYXL
+    return df, clean_frame(df)
+
+
+def _assert_same(df, reference):
+    ref, (ref_clean, ref_stats) = reference
+    pd.testing.assert_frame_equal(df, ref)
+    clean, stats = clean_frame(df)
+    pd.testing.assert_frame_equal(clean, ref_clean)
+    assert stats == ref_stats
+
+
+def test_stream_matches_openpyxl(reference):
+    df = read_workbook(DEFAULT_FILE, ENGINE_STREAM)
+    assert df.attrs["excel_engine"] == ENGINE_STREAM
+    _assert_same(df, reference)
+
+
+def test_calamine_matches_openpyxl(reference):
+    pytest.importorskip("python_calamine")
+    df = read_workbook(DEFAULT_FILE, ENGINE_CALAMINE)
+    assert df.attrs["excel_engine"] == ENGINE_CALAMINE
+    _assert_same(df, reference)
+
+
+def test_file_like_matches_path(reference):
+    df = read_workbook(io.BytesIO(DEFAULT_FILE.read_bytes()), ENGINE_AUTO)
+    _assert_same(df, reference)
+
+
+def _missing(source):
+    raise ImportError("engine belum terpasang")
+
+
+def test_auto_falls_back_when_calamine_missing(monkeypatch, reference):
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_CALAMINE, _missing)
+    df = read_workbook(DEFAULT_FILE, ENGINE_AUTO)
+    assert df.attrs["excel_engine"] == ENGINE_STREAM
+    _assert_same(df, reference)
+
+
+def test_falls_back_to_openpyxl_and_rewinds_file_like(monkeypatch, reference):
+    def partial_read(source):
+        source.read(100)
+        raise ValueError("tidak bisa mem-parse")
+
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_CALAMINE, _missing)
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_STREAM, partial_read)
+    df = read_workbook(io.BytesIO(DEFAULT_FILE.read_bytes()), ENGINE_AUTO)
+    assert df.attrs["excel_engine"] == ENGINE_OPENPYXL
+    _assert_same(df, reference)
+
+
+def test_schema_error_is_not_retried(monkeypatch):
+    calls = []
+
+    def schema_error(source):
+        raise SchemaError("kolom wajib hilang")
+
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_STREAM, schema_error)
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_OPENPYXL, lambda source: calls.append(source))
+    with pytest.raises(SchemaError):
+        read_workbook(DEFAULT_FILE, ENGINE_STREAM)
+    assert calls == []
+
+
+def test_missing_file_is_not_retried(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(ingest._EXCEL_READERS, ENGINE_OPENPYXL, lambda source: calls.append(source))
+    with pytest.raises(FileNotFoundError):
+        read_workbook(tmp_path / "tidak-ada.xlsx", ENGINE_STREAM)
+    assert calls == []
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        read_workbook(DEFAULT_FILE, "xlrd")
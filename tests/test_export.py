@@ -0,0 +1,61 @@
+# =========================================================
+# UJI EXPORT (export.py)
+# Setiap export dashboard harus berupa tipe yang diterima st.download_button:
+# hasilnya dilewatkan ke konversi data Streamlit yang sama dengan tombol unduh
+# (termasuk bentuk callable yang dipakai dashboard), lalu dibaca ulang.
+# =========================================================
+import gzip
+import io
+
+import pandas as pd
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from export import arrow_bytes, csv_bytes, export_frame, iter_csv, parquet_bytes, to_arrow, xlsx_bytes
+
+
+@pytest.fixture
+def table() -> pd.DataFrame:
+    return pd.DataFrame({
+        "nama_kabupaten_kota": pd.Categorical(["KOTA CIREBON"] * 3),
+        "kategori_kejahatan": pd.Categorical(["NARKOTIKA", "PENCURIAN", "NARKOTIKA"]),
+        "jenis_kelamin": pd.Categorical(["LAKI-LAKI", "PEREMPUAN", "LAKI-LAKI"]),
+        "jumlah_narapidana": [10, 2, 7],
+        "bulan": ["JANUARI", "JANUARI", "FEBRUARI"],
+        "tahun": [2024, 2024, 2024],
+        "periode": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-02-01"]),
+    })
+
+
+def download(data) -> bytes:
+    # Sama seperti st.download_button(data=lambda: ...): callable dipanggil
+    # saat tombol diklik, hasilnya dikonversi ke bytes
+    data = data() if callable(data) else data
+    out, _ = convert_data_to_bytes_and_infer_mime(data, TypeError(f"tidak didukung: {type(data)}"))
+    return out
+
+
+def test_csv(table):
+    back = pd.read_csv(io.BytesIO(download(lambda: csv_bytes(export_frame(table)))))
+    assert back["jumlah_narapidana"].tolist() == [10, 2, 7]
+    assert list(back.columns) == list(export_frame(table).columns)
+
+
+def test_csv_gzip_matches_streamed_csv(table):
+    data = download(lambda: csv_bytes(export_frame(table), compress=True))
+    assert gzip.decompress(data) == b"".join(iter_csv(to_arrow(export_frame(table))))
+
+
+def test_xlsx_with_summary(table):
+    data = download(lambda: xlsx_bytes(export_frame(table), summary={"total": 19}))
+    sheets = pd.read_excel(io.BytesIO(data), sheet_name=None)
+    assert sheets["filtered"]["jumlah_narapidana"].sum() == 19
+    assert sheets["ringkasan"].to_dict("records") == [{"indikator": "total", "nilai": 19}]
+
+
+@pytest.mark.parametrize("export, read", [(parquet_bytes, pd.read_parquet), (arrow_bytes, pd.read_feather)])
+def test_typed_formats_keep_types(table, export, read):
+    back = read(io.BytesIO(download(lambda: export(table))))
+    assert isinstance(back["kategori_kejahatan"].dtype, pd.CategoricalDtype)
+    assert back["tahun"].dtype == "int64"
+    assert back["jumlah_narapidana"].tolist() == [10, 2, 7]
@@ -0,0 +1,201 @@
+# =========================================================
+# UPLOAD WORKBOOK DARI SIDEBAR
+# User bisa mengunggah workbook sendiri untuk dilihat di dashboard tanpa
+# mengganti data hasil ingest. Aturannya:
+# - ditolak sedini mungkin: ukuran lebih dari LAPAS_UPLOAD_MAX_MB atau bukan
+#   arsip .xlsx ditolak sebelum di-parse; kolom wajib tidak lengkap ditolak
+#   sebelum normalisasi (validate_raw di clean_frame)
+# - di-key dengan hash isi (sha256): file identik dari sesi mana pun cukup
+#   di-parse & dinormalisasi sekali (sesi yang mengunggah file yang sama
+#   selagi masih di-parse menunggu hasil parse yang sedang berjalan)
+# - hasilnya dalam format yang sama dengan hasil ingest (data bersih + cube)
+#   dan disimpan di UploadCache: LRU + TTL dengan batas memori total,
+#   satu instance per proses (st.cache_resource di dashboard)
+#
+# Sesi hanya memegang file upload-nya (widget); kalau entri sudah dibuang
+# dari cache, rerun berikutnya menyiapkan ulang dari file tersebut.
+#
+# Konfigurasi lewat environment variable:
+#   LAPAS_UPLOAD_MAX_MB    = ukuran file maksimum (default 20, samakan dengan
+#                            server.maxUploadSize di .streamlit/config.toml)
+#   LAPAS_UPLOAD_CACHE_MB  = batas memori semua upload yang di-cache (default 256)
+#   LAPAS_UPLOAD_TTL       = entri dibuang setelah sekian detik tidak dipakai (default 3600)
+# =========================================================
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import pandas as pd
+
+from engine import Cube, build_cube
+from ingest import DEFAULT_POLICY, SchemaError, clean_frame, data_version_for, read_workbook
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("LAPAS_UPLOAD_MAX_MB", 20)) * 1024 * 1024)
+CACHE_BUDGET_BYTES = int(float(os.environ.get("LAPAS_UPLOAD_CACHE_MB", 256)) * 1024 * 1024)
+UPLOAD_TTL = float(os.environ.get("LAPAS_UPLOAD_TTL", 3600))
+
+# Workbook .xlsx adalah arsip zip
+XLSX_MAGIC = b"PK\x03\x04"
+
+
+class UploadRejected(SchemaError):
+    """File upload ditolak sebelum di-parse (ukuran / format / isi kosong)."""
+
+
+@dataclass(frozen=True)
+class PreparedUpload:
+    """
+    Workbook upload yang sudah dinormalisasi, siap dipakai dashboard.
+    manifest berisi kunci yang sama dengan manifest ingest yang dibaca
+    dashboard (data_version, last_period, stats, source).
+    """
+    sha256: str
+    clean: pd.DataFrame
+    cube: Cube
+    manifest: dict
+    nbytes: int
+
+    @property
+    def data_version(self) -> str:
+        return self.manifest["data_version"]
+
+
+def check_upload(name: str, size: int, head: bytes) -> None:
+    """
+    Penolakan awal tanpa mem-parse: ukuran & tanda tangan file .xlsx.
+    """
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadRejected(
+            f"{name}: {size / 1024 / 1024:.1f} MB melebihi batas {MAX_UPLOAD_BYTES / 1024 / 1024:.0f} MB"
+        )
+    if not name.lower().endswith(".xlsx") or not head.startswith(XLSX_MAGIC):
+        raise UploadRejected(f"{name}: bukan workbook Excel .xlsx")
+
+
+def prepare_upload(data: bytes, name: str, sha: str, policy: str = DEFAULT_POLICY) -> PreparedUpload:
+    """
+    Parse + normalisasi + cube, sama seperti ingest tetapi di memori.
+    """
+    try:
+        df_raw = read_workbook(io.BytesIO(data))
+    except Exception as e:
+        raise UploadRejected(f"{name}: workbook tidak bisa dibaca ({e})") from e
+    clean, stats = clean_frame(df_raw, policy)
+    if clean.empty:
+        raise UploadRejected(f"{name}: tidak ada baris data wilayah Cirebon yang valid")
+    try:
+        cube = build_cube(clean)
+    except ValueError as e:
+        # mis. kategori / jenis kelamin kosong: sel cube tidak bisa dipetakan
+        raise UploadRejected(f"{name}: isi workbook tidak valid ({e})") from e
+    manifest = {
+        "data_version": data_version_for(sha, policy),
+        "integrity_policy": policy,
+        "source": {"path": name, "sha256": sha, "size": len(data), "excel_engine": df_raw.attrs["excel_engine"]},
+        "stats": stats,
+        "last_period": clean["periode"].max().strftime("%Y-%m-%d"),
+    }
+    nbytes = int(clean.memory_usage(deep=True).sum()) + cube.values.nbytes + cube.rows.nbytes
+    return PreparedUpload(sha, clean, cube, manifest, nbytes)
+
+
+class UploadCache:
+    """
+    Cache PreparedUpload per hash isi file: LRU + TTL (sejak terakhir dipakai)
+    dengan batas total memori. Aman dipakai bersama oleh semua sesi.
+    """
+
+    def __init__(self, budget_bytes: int = CACHE_BUDGET_BYTES, ttl: float = UPLOAD_TTL):
+        self.budget_bytes = budget_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[PreparedUpload, float]] = OrderedDict()
+        # Upload yang sedang di-parse, per hash isi
+        self._pending: dict[str, Future] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self) -> int:
+        # Dibaca juga dari thread scrape /_stcore/metrics (memory.py)
+        with self._lock:
+            return self._bytes
+
+    # Helper di bawah ini dipanggil dengan self._lock sudah dipegang
+    def _drop(self, key: str) -> None:
+        entry, _ = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        self.evictions += 1
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, (_, used) in self._entries.items() if now - used > self.ttl]:
+            self._drop(key)
+
+    def _put(self, entry: PreparedUpload) -> None:
+        # Entri yang lebih besar dari seluruh anggaran tetap dipakai sesi
+        # pemanggil, hanya tidak disimpan
+        if entry.nbytes > self.budget_bytes or entry.sha256 in self._entries:
+            return
+        self._entries[entry.sha256] = (entry, time.monotonic())
+        self._bytes += entry.nbytes
+        while self._bytes > self.budget_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def get_or_prepare(self, data: bytes, name: str) -> PreparedUpload:
+        """
+        PreparedUpload untuk isi file; di-parse hanya kalau belum ada di cache
+        dan belum sedang di-parse oleh sesi lain (kalau sedang, hasilnya ditunggu).
+        Melempar UploadRejected / SchemaError / IntegrityError kalau file ditolak.
+        """
+        check_upload(name, len(data), data[:len(XLSX_MAGIC)])
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if sha in self._entries:
+                entry, _ = self._entries[sha]
+                self._entries[sha] = (entry, now)
+                self._entries.move_to_end(sha)
+                self.hits += 1
+                return entry
+            pending = self._pending.get(sha)
+            owner = pending is None
+            if owner:
+                pending = self._pending[sha] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            return pending.result()
+
+        # Di luar lock: upload lain tetap bisa dilayani selama parsing
+        try:
+            entry = prepare_upload(data, name, sha)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[sha]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._put(entry)
+            del self._pending[sha]
+        pending.set_result(entry)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }